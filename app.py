@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, Response, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_bcrypt import Bcrypt
 import pandas as pd
@@ -9,19 +9,28 @@ from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
 from sklearn.metrics import accuracy_score, classification_report, precision_score, recall_score, f1_score, confusion_matrix
 from imblearn.over_sampling import SMOTE
-from collections import Counter
 import os
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import warnings
-from supabase import create_client, Client
+from supabase import Client
+import httpx
+from postgrest.exceptions import APIError
+from supabase_http import create_pooled_client
+from local_db import LocalClient
 from dotenv import load_dotenv
 import pyttsx3
 import speech_recognition as sr
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import time
 import joblib
 import traceback
+from artifact_store import ArtifactStore
+from retrain_jobs import RetrainJobRunner
+from ttl_cache import TTLCache
+from write_behind import WriteBehindQueue
+import atexit
 
 warnings.filterwarnings('ignore')
 
@@ -31,11 +40,92 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'pashucare-secret-key-2024')
-
-# Initialize Supabase
+# Memory-map uncompressed model components instead of reading them into private memory
+app.config['MODEL_MMAP'] = os.getenv('MODEL_MMAP', '0') == '1'
+# Serve a distilled student (test2.py --distill) instead of the 3-model ensemble when its held-out
+# Top-3 accuracy is at most this far below the ensemble's; set negative to always use the ensemble
+app.config['STUDENT_MAX_ACCURACY_GAP'] = float(os.getenv('STUDENT_MAX_ACCURACY_GAP', '0.02'))
+# Accounts allowed to trigger retraining (comma-separated emails)
+app.config['ADMIN_EMAILS'] = {e.strip().lower() for e in os.getenv('ADMIN_EMAILS', '').split(',') if e.strip()}
+# Background retraining gets at most this many cores (the rest stay with the web server)
+app.config['RETRAIN_CPU_BUDGET'] = int(os.getenv('RETRAIN_CPU_BUDGET', str(max(1, (os.cpu_count() or 1) // 2))))
+app.config['RETRAIN_SPECIES_WORKERS'] = int(os.getenv('RETRAIN_SPECIES_WORKERS', '1'))
+app.config['RETRAIN_NICE'] = int(os.getenv('RETRAIN_NICE', '10'))
+
+# Supabase transport: one pooled keep-alive (HTTP/2 when available) connection pool shared by all threads
+app.config['SUPABASE_HTTP2'] = os.getenv('SUPABASE_HTTP2', '1') == '1'
+app.config['SUPABASE_POOL_SIZE'] = int(os.getenv('SUPABASE_POOL_SIZE', '20'))
+app.config['SUPABASE_KEEPALIVE'] = int(os.getenv('SUPABASE_KEEPALIVE', '10'))
+app.config['SUPABASE_TIMEOUT'] = float(os.getenv('SUPABASE_TIMEOUT', '15'))
+# Logged-in users are cached in-process for a short time so most requests skip the users query
+app.config['USER_CACHE_TTL'] = float(os.getenv('USER_CACHE_TTL', '60'))
+app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', '1024'))
+# Diseases, subsidies and veterinarians are served from memory; after REFERENCE_CACHE_TTL seconds they are
+# reloaded in the background while the old copy is still served for up to REFERENCE_CACHE_STALE seconds
+app.config['REFERENCE_CACHE_TTL'] = float(os.getenv('REFERENCE_CACHE_TTL', '300'))
+app.config['REFERENCE_CACHE_STALE'] = float(os.getenv('REFERENCE_CACHE_STALE', '3600'))
+# Predictions are journaled to this file and inserted in batches by a background writer
+app.config['PREDICTION_QUEUE_PATH'] = os.getenv('PREDICTION_QUEUE_PATH', './cache/prediction_queue.jsonl')
+app.config['PREDICTION_QUEUE_BATCH'] = int(os.getenv('PREDICTION_QUEUE_BATCH', '50'))
+app.config['PREDICTION_QUEUE_FSYNC'] = os.getenv('PREDICTION_QUEUE_FSYNC', '1') == '1'
+# Independent queries of one page run concurrently on this many threads (keep <= SUPABASE_POOL_SIZE)
+app.config['DB_FANOUT_WORKERS'] = int(os.getenv('DB_FANOUT_WORKERS', '8'))
+# Rows per page of the vet animal listing and vaccination history (keyset pagination)
+app.config['VET_ANIMALS_PAGE_SIZE'] = int(os.getenv('VET_ANIMALS_PAGE_SIZE', '20'))
+app.config['VACCINATIONS_PAGE_SIZE'] = int(os.getenv('VACCINATIONS_PAGE_SIZE', '50'))
+# Persistence backend: 'supabase' (hosted Postgres through PostgREST) or 'sqlite' (local_db.py: a database
+# file with the same schema, for offline deployments and load tests; no network needed)
+app.config['DB_BACKEND'] = os.getenv('DB_BACKEND', 'supabase').lower()
+app.config['SQLITE_PATH'] = os.getenv('SQLITE_PATH', './data/pashucare.db')
+
+# Initialize Supabase (or its local stand-in: DB and User only use the client's table()/rpc() builders)
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase: Client
+if app.config['DB_BACKEND'] == 'sqlite':
+    supabase = LocalClient(app.config['SQLITE_PATH'])
+    supabase_http = None
+    print(f"Using the local SQLite database {app.config['SQLITE_PATH']}")
+elif app.config['DB_BACKEND'] == 'supabase':
+    supabase, supabase_http = create_pooled_client(
+        SUPABASE_URL, SUPABASE_KEY,
+        http2=app.config['SUPABASE_HTTP2'],
+        max_connections=app.config['SUPABASE_POOL_SIZE'],
+        max_keepalive=app.config['SUPABASE_KEEPALIVE'],
+        read_timeout=app.config['SUPABASE_TIMEOUT'],
+    )
+else:
+    raise ValueError(f"DB_BACKEND must be 'supabase' or 'sqlite', not {app.config['DB_BACKEND']!r}")
+
+# user id -> User constructor fields (a fresh User is built per request, so edits never leak between threads)
+user_cache = TTLCache(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'], name='users')
+# reference table name -> all its rows (see DB.get_all_diseases and friends)
+reference_cache = TTLCache(maxsize=16, ttl=app.config['REFERENCE_CACHE_TTL'],
+                           stale_ttl=app.config['REFERENCE_CACHE_STALE'], name='reference')
+REFERENCE_TABLES = ('diseases', 'subsidies', 'veterinarians')
+
+# Prediction history is written behind the response: journaled locally, bulk-inserted in the background.
+# Only failures that can clear up on their own are retried: the network, 5xx/429 responses, PostgREST losing
+# its database connection and serialization/lock/statement timeouts. Anything else (bad data, constraint and
+# RLS violations, an unknown column, a bug while serializing) would block the queue forever, so those rows
+# go to <journal>.failed instead.
+TRANSIENT_DB_CODES = {'40001', '40P01', '55P03', '57014', 'PGRST000', 'PGRST001', 'PGRST002', 'PGRST003'}
+
+def is_rejected_row(exc):
+    if isinstance(exc, (httpx.TransportError, TimeoutError, ConnectionError)):
+        return False
+    if isinstance(exc, APIError):
+        code = str(exc.code or '')
+        # error bodies that aren't JSON carry the HTTP status; SQLSTATEs are five characters
+        http_status = int(code) if len(code) == 3 and code.isdigit() else None
+        return not (code in TRANSIENT_DB_CODES or http_status == 429 or (http_status or 0) >= 500)
+    return True
+
+prediction_queue = WriteBehindQueue(app.config['PREDICTION_QUEUE_PATH'], lambda rows: DB.insert_predictions(rows),
+                                    batch_size=app.config['PREDICTION_QUEUE_BATCH'],
+                                    is_permanent=is_rejected_row,
+                                    fsync=app.config['PREDICTION_QUEUE_FSYNC'], name='prediction-queue')
+atexit.register(prediction_queue.close)
 
 # Initialize extensions
 login_manager = LoginManager()
@@ -126,10 +216,13 @@ class User(UserMixin):
 
 # Database Helper Functions for Supabase
 class DB:
+    # False once the database reports that the vet_stats() function is missing
+    vet_stats_rpc = True
+    
     @staticmethod
-    def get_user_animals(user_id):
+    def get_user_animals(user_id, columns='*'):
         try:
-            response = supabase.table('animals').select('*').eq('user_id', user_id).execute()
+            response = supabase.table('animals').select(columns).eq('user_id', user_id).execute()
             return response.data if response.data else []
         except Exception as e:
             print(f"Error: {e}")
@@ -153,6 +246,44 @@ class DB:
             print(f"Error: {e}")
             return []
     
+    @staticmethod
+    def count_rows(table, filters):
+        """Number of rows in `table` matching the {column: value} filters; the database counts, no rows are sent"""
+        try:
+            query = supabase.table(table).select('id', count='exact', head=True)
+            for column, value in filters.items():
+                query = query.eq(column, value)
+            return query.execute().count or 0
+        except Exception as e:
+            print(f"Error: {e}")
+            return 0
+    
+    @staticmethod
+    def get_recent_animals(user_id, limit=5):
+        """Newest animals with only the columns the dashboard lists"""
+        try:
+            response = supabase.table('animals').select('id, animal_id, name, animal_type, breed, created_at').eq('user_id', user_id).order('created_at', desc=True, nullsfirst=False).limit(limit).execute()
+            return response.data if response.data else []
+        except Exception as e:
+            print(f"Error: {e}")
+            return []
+    
+    @staticmethod
+    def get_recent_predictions(user_id, limit=5, since=None):
+        """Newest predictions without the prediction_data/result JSON; optionally only those created at or after `since`"""
+        try:
+            query = supabase.table('predictions').select('id, animal_id, confidence, created_at').eq('user_id', user_id)
+            if since is not None:
+                query = query.gte('created_at', since.isoformat())
+            query = query.order('created_at', desc=True)
+            if limit:
+                query = query.limit(limit)
+            response = query.execute()
+            return response.data if response.data else []
+        except Exception as e:
+            print(f"Error: {e}")
+            return []
+    
     @staticmethod
     def add_animal(user_id, data):
         try:
@@ -189,32 +320,74 @@ class DB:
             print(f"Error: {e}")
             return None
     
+    @staticmethod
+    def queue_prediction(user_id, animal_id, prediction_data, result, confidence):
+        """Record a prediction without waiting for the database (see prediction_queue)"""
+        prediction_queue.enqueue({
+            'user_id': user_id,
+            'animal_id': animal_id,
+            'prediction_data': prediction_data,
+            'result': result,
+            'confidence': confidence
+        })
+    
+    @staticmethod
+    def insert_predictions(rows):
+        """Bulk insert for prediction_queue; raises so the queue can retry (same column encoding as add_prediction)"""
+        supabase.table('predictions').insert([
+            dict(row, prediction_data=json.dumps(row['prediction_data']), result=json.dumps(row['result']))
+            for row in rows
+        ], returning='minimal').execute()
+    
+    # Reference tables change rarely: reads go through reference_cache. Loaders return None on
+    # errors and empty results so neither is cached.
     @staticmethod
     def get_all_veterinarians():
+        return reference_cache.get_or_refresh('veterinarians', DB._load_all_veterinarians) or []
+    
+    @staticmethod
+    def _load_all_veterinarians():
         try:
             response = supabase.table('veterinarians').select('*').eq('is_available', True).execute()
-            return response.data if response.data else []
+            return response.data if response.data else None
         except Exception as e:
             print(f"Error: {e}")
-            return []
+            return None
     
     @staticmethod
     def get_all_diseases():
+        return reference_cache.get_or_refresh('diseases', DB._load_all_diseases) or []
+    
+    @staticmethod
+    def _load_all_diseases():
         try:
             response = supabase.table('diseases').select('*').execute()
-            return response.data if response.data else []
+            return response.data if response.data else None
         except Exception as e:
             print(f"Error: {e}")
-            return []
+            return None
     
     @staticmethod
     def get_all_subsidies():
+        return reference_cache.get_or_refresh('subsidies', DB._load_all_subsidies) or []
+    
+    @staticmethod
+    def _load_all_subsidies():
         try:
             response = supabase.table('subsidies').select('*').eq('is_active', True).execute()
-            return response.data if response.data else []
+            return response.data if response.data else None
         except Exception as e:
             print(f"Error: {e}")
-            return []
+            return None
+    
+    @staticmethod
+    def warm_reference_cache():
+        """Load every reference table into reference_cache (run in the background at startup)"""
+        fetch_concurrently(
+            diseases=(DB.get_all_diseases,),
+            subsidies=(DB.get_all_subsidies,),
+            veterinarians=(DB.get_all_veterinarians,),
+        )
     
     @staticmethod
     def get_animal(animal_id, user_id):
@@ -252,6 +425,18 @@ class DB:
             print(f"Error: {e}")
             return []
     
+    @staticmethod
+    def count_upcoming_vaccinations(user_id, days=30):
+        """Vaccinations of the user's animals due in the next `days` days, counted by the database in one query"""
+        try:
+            today = datetime.utcnow().date()
+            due_by = today + timedelta(days=days)
+            response = supabase.table('vaccinations').select('id, animals!inner(user_id)', count='exact', head=True).eq('animals.user_id', user_id).gte('next_due_date', today.isoformat()).lte('next_due_date', due_by.isoformat()).execute()
+            return response.count or 0
+        except Exception as e:
+            print(f"Error: {e}")
+            return 0
+    
     @staticmethod
     def add_vaccination(animal_id, data):
         try:
@@ -285,11 +470,20 @@ class DB:
     # ============================================
     
     @staticmethod
-    def get_all_animals_for_vet():
-        """Get all animals with owner information for vet dashboard"""
+    def get_all_animals_for_vet(limit=None, before_id=None):
+        """Get animals with owner information for vet dashboard
+
+        With a limit, returns the newest `limit` animals with id < before_id (keyset pagination:
+        each page is an index range scan on the primary key, however deep it is).
+        """
         try:
-            # Get all animals with user info
-            response = supabase.table('animals').select('*, users!animals_user_id_fkey(name, email, phone, location)').execute()
+            # Get animals with user info
+            query = supabase.table('animals').select('*, users!animals_user_id_fkey(name, email, phone, location)')
+            if before_id is not None:
+                query = query.lt('id', before_id)
+            if limit:
+                query = query.order('id', desc=True).limit(limit)
+            response = query.execute()
             return response.data if response.data else []
         except Exception as e:
             print(f"Error: {e}")
@@ -355,10 +549,21 @@ class DB:
             return False
     
     @staticmethod
-    def get_vaccinations_by_vet(vet_id):
-        """Get all vaccinations administered by a specific vet"""
+    def get_vaccinations_by_vet(vet_id, limit=None, before=None):
+        """Get vaccinations administered by a specific vet, newest first
+
+        `before` is a (vaccination_date, id) keyset cursor: only rows after it in
+        (vaccination_date desc, id desc) order are returned.
+        """
         try:
-            response = supabase.table('vaccinations').select('*, animals(name, animal_type), users!vaccinations_vet_id_fkey(name)').eq('vet_id', vet_id).order('vaccination_date', desc=True).execute()
+            query = supabase.table('vaccinations').select('*, animals(name, animal_type), users!vaccinations_vet_id_fkey(name)').eq('vet_id', vet_id)
+            if before is not None:
+                before_date, before_id = before
+                query = query.or_(f'vaccination_date.lt.{before_date},and(vaccination_date.eq.{before_date},id.lt.{before_id})')
+            query = query.order('vaccination_date', desc=True).order('id', desc=True)
+            if limit:
+                query = query.limit(limit)
+            response = query.execute()
             return response.data if response.data else []
         except Exception as e:
             print(f"Error: {e}")
@@ -399,14 +604,42 @@ class DB:
     
     @staticmethod
     def get_vet_stats(vet_id):
-        """Get statistics for vet dashboard"""
+        """Get statistics for vet dashboard
+
+        One call to the vet_stats() Postgres function (database_setup.sql), which counts
+        everything in the database. Databases without the function use the per-table queries.
+        """
+        if DB.vet_stats_rpc:
+            try:
+                response = supabase.rpc('vet_stats', {'p_vet_id': vet_id}).execute()
+                row = response.data[0] if response.data else {}
+                return {
+                    'total_vaccinations': row.get('total_vaccinations') or 0,
+                    'total_diagnoses': row.get('total_diagnoses') or 0,
+                    'unique_animals': row.get('unique_animals') or 0
+                }
+            except APIError as e:
+                if e.code != 'PGRST202':
+                    print(f"Error: {e}")
+                    return {'total_vaccinations': 0, 'total_diagnoses': 0, 'unique_animals': 0}
+                # function not installed: stop asking for it
+                print("vet_stats() is not installed; counting vet statistics with per-table queries")
+                DB.vet_stats_rpc = False
+            except Exception as e:
+                print(f"Error: {e}")
+                return {'total_vaccinations': 0, 'total_diagnoses': 0, 'unique_animals': 0}
+        return DB._get_vet_stats_by_table(vet_id)
+    
+    @staticmethod
+    def _get_vet_stats_by_table(vet_id):
+        """Fallback for get_vet_stats: two counts plus every vaccinated animal_id, deduplicated here"""
         try:
             # Count vaccinations
-            vac_response = supabase.table('vaccinations').select('id', count='exact').eq('vet_id', vet_id).execute()
+            vac_response = supabase.table('vaccinations').select('id', count='exact', head=True).eq('vet_id', vet_id).execute()
             total_vaccinations = vac_response.count if vac_response.count else 0
             
             # Count diagnoses
-            diag_response = supabase.table('animal_diseases').select('id', count='exact').eq('diagnosed_by_vet_id', vet_id).execute()
+            diag_response = supabase.table('animal_diseases').select('id', count='exact', head=True).eq('diagnosed_by_vet_id', vet_id).execute()
             total_diagnoses = diag_response.count if diag_response.count else 0
             
             # Count unique animals treated
@@ -442,10 +675,50 @@ class DB:
             print(f"Error: {e}")
             return []
 
+# Shared by all requests so concurrent page loads can't open more threads (or connections) than this
+db_executor = ThreadPoolExecutor(max_workers=app.config['DB_FANOUT_WORKERS'], thread_name_prefix='db-fanout')
+
+def fetch_concurrently(**calls):
+    """Run independent DB calls in parallel: fetch_concurrently(animals=(DB.get_user_animals, uid), ...)
+
+    Returns {name: result}. The page then waits for its slowest query instead of the sum of
+    all of them. DB methods catch their own errors, so one failed query doesn't cancel the rest.
+    """
+    if len(calls) <= 1:
+        return {name: fn(*args) for name, (fn, *args) in calls.items()}
+    futures = {name: db_executor.submit(fn, *args) for name, (fn, *args) in calls.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+def keyset_page(rows, page_size, cursor_of):
+    """Split rows fetched with limit=page_size + 1 into (page, cursor of the next page or None)"""
+    if len(rows) <= page_size:
+        return rows, None
+    page = rows[:page_size]
+    return page, cursor_of(page[-1])
+
+def vaccination_cursor(vac):
+    return f"{vac['vaccination_date']}_{vac['id']}"
+
+def parse_vaccination_cursor(value):
+    """'<vaccination_date>_<id>' -> (date, id); None (first page) for a missing or malformed cursor"""
+    try:
+        vac_date, vac_id = value.rsplit('_', 1)
+        return datetime.strptime(vac_date, '%Y-%m-%d').date().isoformat(), int(vac_id)
+    except (AttributeError, ValueError):
+        return None
+
 # Load user callback for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
-    return User.get(int(user_id))
+    user_id = int(user_id)
+    fields = user_cache.get(user_id)
+    if fields is None:
+        user = User.get(user_id)
+        if user is None:
+            return None
+        fields = vars(user).copy()
+        user_cache.set(user_id, fields)
+    return User(**fields)
 
 # Multi-language support
 LANGUAGES = {
@@ -1070,9 +1343,12 @@ class AnimalSpecificDiseasePredictor:
         self.feature_columns = []
         self.label_encoders = {}
         self.models_dir = './models'
+        self.store = ArtifactStore(self.models_dir, mmap=app.config['MODEL_MMAP'])  # content-addressed models written by test2.py
         self.animal_metrics = {}  # Store accuracy metrics for each animal type
         
-    def fit(self, df):
+    def fit(self, df, max_workers=None):
+        """Train one ensemble per animal type; animals train concurrently on a thread pool
+           (the estimators release the GIL), each capped to its share of the cores."""
         print("Building Animal-Specific Disease Models...")
         
         # Define feature columns
@@ -1098,140 +1374,164 @@ class AnimalSpecificDiseasePredictor:
             df[col] = le.fit_transform(df[col].astype(str))
             self.label_encoders[col] = le
         
-        # Train model for each animal type
+        animal_frames = {}
         for animal_type in df['Animal_Type'].unique():
             animal_data = df[df['Animal_Type'] == animal_type].copy()
-            
             if len(animal_data) < 5:
                 print(f"   Skipping {animal_type} (only {len(animal_data)} samples)")
                 continue
-            
-            diseases = animal_data['Disease_Prediction'].value_counts()
-            print(f"   Training {animal_type} model: {len(animal_data)} samples, {len(diseases)} diseases")
-            
-            # Handle single disease case
-            if len(diseases) == 1:
-                self.animal_models[animal_type] = {
-                    'type': 'single_disease',
-                    'disease': diseases.index[0],
-                    'confidence': 1.0
-                }
-                self.animal_metrics[animal_type] = {
-                    'accuracy': 1.0,
-                    'precision': 1.0,
-                    'recall': 1.0,
-                    'f1_score': 1.0,
-                    'samples': len(animal_data),
-                    'diseases': 1
-                }
-                continue
-            
-            # Prepare features and target
-            X_animal = animal_data[self.feature_columns]
-            y_animal = animal_data['Disease_Prediction']
-            
-            # Encode diseases for this animal
-            le_diseases = LabelEncoder()
-            y_encoded = le_diseases.fit_transform(y_animal)
-            self.animal_encoders[animal_type] = le_diseases
-            
-            # Scale features
-            scaler = StandardScaler()
-            X_scaled = scaler.fit_transform(X_animal)
-            self.animal_scalers[animal_type] = scaler
-            
-            # Apply SMOTE for better balance (if possible)
-            if len(animal_data) > 10 and len(np.unique(y_encoded)) > 1:
-                disease_counts = Counter(y_encoded)
-                min_samples = min(disease_counts.values())
-                
-                if min_samples > 1:
-                    k_neighbors = min(3, min_samples - 1)
-                    try:
-                        smote = SMOTE(random_state=42, k_neighbors=k_neighbors)
-                        X_scaled, y_encoded = smote.fit_resample(X_scaled, y_encoded)
-                    except:
-                        pass
-            
-            # Train ensemble of models for this animal
-            models = {}
-            
-            # Random Forest (primary model)
-            models['rf'] = RandomForestClassifier(
-                n_estimators=300, max_depth=None, min_samples_split=2,
-                min_samples_leaf=1, class_weight='balanced', random_state=42
-            )
-            models['rf'].fit(X_scaled, y_encoded)
-            
-            # XGBoost
-            models['xgb'] = XGBClassifier(
-                n_estimators=200, max_depth=6, learning_rate=0.1,
-                random_state=42, eval_metric='mlogloss'
-            )
-            models['xgb'].fit(X_scaled, y_encoded)
-            
-            # LightGBM  
-            models['lgb'] = LGBMClassifier(
-                n_estimators=200, max_depth=8, learning_rate=0.1,
-                random_state=42, verbose=-1
-            )
-            models['lgb'].fit(X_scaled, y_encoded)
-            
-            self.animal_models[animal_type] = {
-                'type': 'ensemble',
-                'models': models
+            animal_frames[animal_type] = animal_data
+        if not animal_frames:
+            print("All animal-specific models trained!")
+            return
+        
+        cpus = os.cpu_count() or 1
+        workers = max(1, min(max_workers or cpus, len(animal_frames)))
+        n_jobs = max(1, cpus // workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._fit_animal, animal_type, animal_data, n_jobs)
+                       for animal_type, animal_data in animal_frames.items()]
+            for future in futures:
+                animal_type, model_info, encoder, scaler, metrics = future.result()
+                self.animal_models[animal_type] = model_info
+                self.animal_metrics[animal_type] = metrics
+                if encoder is not None:
+                    self.animal_encoders[animal_type] = encoder
+                    self.animal_scalers[animal_type] = scaler
+        
+        print("All animal-specific models trained!")
+    
+    def _fit_animal(self, animal_type, animal_data, n_jobs=1):
+        """Train one animal's ensemble; returns (animal_type, model_info, disease_encoder, scaler, metrics)"""
+        diseases = animal_data['Disease_Prediction'].value_counts()
+        print(f"   Training {animal_type} model: {len(animal_data)} samples, {len(diseases)} diseases")
+        
+        # Handle single disease case
+        if len(diseases) == 1:
+            model_info = {
+                'type': 'single_disease',
+                'disease': diseases.index[0],
+                'confidence': 1.0
             }
-            
-            # Calculate comprehensive metrics for this animal
-            predictions = self._predict_for_animal(X_scaled, animal_type)
-            accuracy = accuracy_score(y_encoded, predictions)
-            precision = precision_score(y_encoded, predictions, average='weighted', zero_division=0)
-            recall = recall_score(y_encoded, predictions, average='weighted', zero_division=0)
-            f1 = f1_score(y_encoded, predictions, average='weighted', zero_division=0)
-            
-            self.animal_metrics[animal_type] = {
-                'accuracy': accuracy,
-                'precision': precision,
-                'recall': recall,
-                'f1_score': f1,
+            metrics = {
+                'accuracy': 1.0,
+                'precision': 1.0,
+                'recall': 1.0,
+                'f1_score': 1.0,
                 'samples': len(animal_data),
-                'diseases': len(np.unique(y_animal))
+                'diseases': 1
             }
+            return animal_type, model_info, None, None, metrics
+        
+        # Prepare features and target
+        X_animal = animal_data[self.feature_columns]
+        y_animal = animal_data['Disease_Prediction']
+        
+        # Encode diseases for this animal
+        le_diseases = LabelEncoder()
+        y_encoded = le_diseases.fit_transform(y_animal)
+        
+        # Scale features
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X_animal)
+        
+        # Apply SMOTE for better balance (if possible)
+        if len(animal_data) > 10 and len(np.unique(y_encoded)) > 1:
+            min_samples = np.bincount(y_encoded).min()
             
-            print(f"     {animal_type} Model Metrics:")
-            print(f"       Accuracy: {accuracy:.3f} ({accuracy*100:.1f}%)")
-            print(f"       Precision: {precision:.3f}")
-            print(f"       Recall: {recall:.3f}")
-            print(f"       F1-Score: {f1:.3f}")
+            if min_samples > 1:
+                k_neighbors = min(3, min_samples - 1)
+                try:
+                    smote = SMOTE(random_state=42, k_neighbors=k_neighbors)
+                    X_scaled, y_encoded = smote.fit_resample(X_scaled, y_encoded)
+                except:
+                    pass
         
-        print("All animal-specific models trained!")
+        # Train ensemble of models for this animal
+        models = {}
+        
+        # Random Forest (primary model)
+        models['rf'] = RandomForestClassifier(
+            n_estimators=300, max_depth=None, min_samples_split=2,
+            min_samples_leaf=1, class_weight='balanced', random_state=42, n_jobs=n_jobs
+        )
+        models['rf'].fit(X_scaled, y_encoded)
+        
+        # XGBoost
+        models['xgb'] = XGBClassifier(
+            n_estimators=200, max_depth=6, learning_rate=0.1,
+            random_state=42, eval_metric='mlogloss', n_jobs=n_jobs
+        )
+        models['xgb'].fit(X_scaled, y_encoded)
+        
+        # LightGBM  
+        models['lgb'] = LGBMClassifier(
+            n_estimators=200, max_depth=8, learning_rate=0.1,
+            random_state=42, verbose=-1, n_jobs=n_jobs
+        )
+        models['lgb'].fit(X_scaled, y_encoded)
+        
+        model_info = {
+            'type': 'ensemble',
+            'models': models
+        }
+        
+        # Calculate comprehensive metrics for this animal
+        predictions = self._vote(models, X_scaled)
+        accuracy = accuracy_score(y_encoded, predictions)
+        precision = precision_score(y_encoded, predictions, average='weighted', zero_division=0)
+        recall = recall_score(y_encoded, predictions, average='weighted', zero_division=0)
+        f1 = f1_score(y_encoded, predictions, average='weighted', zero_division=0)
+        
+        metrics = {
+            'accuracy': accuracy,
+            'precision': precision,
+            'recall': recall,
+            'f1_score': f1,
+            'samples': len(animal_data),
+            'diseases': len(np.unique(y_animal))
+        }
+        
+        print(f"     {animal_type} Model Metrics:")
+        print(f"       Accuracy: {accuracy:.3f} ({accuracy*100:.1f}%)")
+        print(f"       Precision: {precision:.3f}")
+        print(f"       Recall: {recall:.3f}")
+        print(f"       F1-Score: {f1:.3f}")
+        return animal_type, model_info, le_diseases, scaler, metrics
     
-    def _predict_for_animal(self, X_scaled, animal_type):
-        """Make predictions for a specific animal type"""
+    @staticmethod
+    def _vote(models, X_scaled):
+        """Hard majority vote over the ensemble, vectorized. Ties go to the earliest model's vote,
+           as Counter.most_common did."""
+        votes = np.stack([np.asarray(m.predict(X_scaled)).astype(np.int64).ravel() for m in models.values()])
+        n_models, n_rows = votes.shape
+        n_classes = int(votes.max()) + 1
+        # per-row class counts: one bincount over row-offset labels
+        counts = np.bincount((votes + np.arange(n_rows) * n_classes).ravel(),
+                             minlength=n_rows * n_classes).reshape(n_rows, n_classes)
+        support = counts[np.arange(n_rows), votes]              # (n_models, n_rows): votes for each model's pick
+        return votes[np.argmax(support, axis=0), np.arange(n_rows)]
+    
+    def _predict_proba_for_animal(self, X_scaled, animal_type):
+        """Averaged class probabilities of an animal's ensemble, or None without an ensemble"""
+        model_info = self.animal_models.get(animal_type)
+        if not model_info or model_info['type'] != 'ensemble':
+            return None
+        return np.mean(np.stack([m.predict_proba(X_scaled) for m in model_info['models'].values()]), axis=0)
+    
+    def _predict_for_animal(self, X_scaled, animal_type, voting='hard'):
+        """Make predictions for a specific animal type (voting='soft' averages probabilities instead)"""
         if animal_type not in self.animal_models:
-            return np.array([0] * len(X_scaled))
+            return np.zeros(len(X_scaled), dtype=int)
         
         model_info = self.animal_models[animal_type]
         
         if model_info['type'] == 'single_disease':
-            return np.array([0] * len(X_scaled))
+            return np.zeros(len(X_scaled), dtype=int)
         
-        # Ensemble prediction
-        models = model_info['models']
-        all_predictions = []
-        
-        for model in models.values():
-            pred = model.predict(X_scaled)
-            all_predictions.append(pred)
-        
-        # Majority voting
-        final_predictions = []
-        for i in range(len(X_scaled)):
-            votes = [pred[i] for pred in all_predictions]
-            majority_vote = Counter(votes).most_common(1)[0][0]
-            final_predictions.append(majority_vote)
-        
-        return np.array(final_predictions)
+        if voting == 'soft':
+            return np.argmax(self._predict_proba_for_animal(X_scaled, animal_type), axis=1)
+        return self._vote(model_info['models'], X_scaled)
     
     def get_metrics(self, animal_type=None):
         """Get accuracy metrics for specific animal or all animals"""
@@ -1276,10 +1576,15 @@ class AnimalSpecificDiseasePredictor:
                        body_temperature, heart_rate):
         """Hierarchical two-stage prediction: syndrome → disease"""
         
+        # Load artifacts (components shared between species come from the store's in-process cache)
+        try:
+            loaded = self.store.load_species(animal_type)
+        except Exception as e:
+            return {'prediction': f'Error loading model: {str(e)}', 'confidence': 0.0, 'model_metrics': {'accuracy': 'N/A', 'precision': 'N/A', 'recall': 'N/A', 'f1_score': 'N/A'}}
+        
         # Check if model artifacts exist for this animal
-        art_path = os.path.join(self.models_dir, animal_type, 'animal_artifacts.joblib')
-        if not os.path.exists(art_path):
-            available = [d for d in os.listdir(self.models_dir) if os.path.isdir(os.path.join(self.models_dir, d))]
+        if loaded is None:
+            available = self.store.available_species()
             return {
                 'prediction': f'No trained model for {animal_type}',
                 'confidence': 0.0,
@@ -1293,16 +1598,10 @@ class AnimalSpecificDiseasePredictor:
                 'message': f'Available animals: {", ".join(available)}'
             }
         
-        # Load artifacts
-        try:
-            import joblib
-            artifacts = joblib.load(art_path)
-            syndrome_bundle = joblib.load(os.path.join(self.models_dir, animal_type, 'syndrome_clf.joblib'))
-            
-            # Get stored metrics if available
-            stored_metrics = artifacts.get('model_metrics', {})
-        except Exception as e:
-            return {'prediction': f'Error loading model: {str(e)}', 'confidence': 0.0, 'model_metrics': {'accuracy': 'N/A', 'precision': 'N/A', 'recall': 'N/A', 'f1_score': 'N/A'}}
+        artifacts, syndrome_bundle = loaded
+        
+        # Get stored metrics if available
+        stored_metrics = artifacts.get('model_metrics', {})
         
         # Prepare input features
         input_data = self._prepare_input_features(
@@ -1326,13 +1625,15 @@ class AnimalSpecificDiseasePredictor:
         # Create input DataFrame
         feature_cols = artifacts.get('feature_columns', self.feature_columns)
         input_df = pd.DataFrame([input_data])[feature_cols]
+        # Tree-native artifacts (test2.py --tree-native) have no scalers: both stages share one raw array
+        X_raw = input_df.to_numpy(dtype=np.float64) if artifacts.get('tree_native') else None
         
         # STAGE 1: Predict syndrome
         synd_clf = syndrome_bundle['classifier']
         synd_scaler = syndrome_bundle['scaler']
         le_synd = syndrome_bundle['label_encoder']
         
-        X_scaled = synd_scaler.transform(input_df)
+        X_scaled = synd_scaler.transform(input_df) if synd_scaler is not None else X_raw
         
         try:
             synd_proba = synd_clf.predict_proba(X_scaled)[0]
@@ -1399,12 +1700,18 @@ class AnimalSpecificDiseasePredictor:
                 'message': 'Limited training data for this syndrome'
             }
         
-        # Ensemble prediction
+        # Ensemble prediction (or its distilled student when that stayed within the allowed accuracy gap)
         scaler = model_info['scaler']
         models = model_info['models']
         le_disease = model_info['label_encoder']
+        student_gap = (model_info.get('student_metrics') or {}).get('top3_gap')
+        served_by = 'ensemble'
+        if model_info.get('student') is not None and student_gap is not None \
+                and student_gap <= app.config['STUDENT_MAX_ACCURACY_GAP']:
+            models = {'student': model_info['student']}
+            served_by = 'student'
         
-        X_disease_scaled = scaler.transform(input_df)
+        X_disease_scaled = scaler.transform(input_df) if scaler is not None else X_raw
         
         # Collect probabilities from all models
         prob_list = []
@@ -1464,6 +1771,7 @@ class AnimalSpecificDiseasePredictor:
             'syndrome': syndrome_label,
             'syndrome_confidence': synd_conf,
             'top_3_predictions': top_predictions,
+            'served_by': served_by,
             'vital_signs_analysis': self._get_vital_signs_analysis(input_data),
             'syndrome_analysis': self._get_syndrome_analysis(input_data),
             'condition_severity': self._get_condition_severity(input_data)
@@ -1601,6 +1909,9 @@ class AnimalSpecificDiseasePredictor:
 
 # Global variables
 predictor = None
+retrain_runner = RetrainJobRunner('./models', cpu_budget=app.config['RETRAIN_CPU_BUDGET'],
+                                  species_workers=app.config['RETRAIN_SPECIES_WORKERS'],
+                                  nice=app.config['RETRAIN_NICE'])
 breed_data = {}
 breed_data_mr = {}  # Marathi breed names
 symptom_translations = {}  # Symptom translations
@@ -1893,7 +2204,7 @@ def load_and_train_model():
         # Verify models exist and display accuracy
         models_dir = './models'
         if os.path.exists(models_dir):
-            available_animals = [d for d in os.listdir(models_dir) if os.path.isdir(os.path.join(models_dir, d))]
+            available_animals = predictor.store.available_species()
             print(f"\nAvailable trained models: {', '.join(available_animals)}")
             
             # Load feature columns and display model statistics
@@ -1911,9 +2222,9 @@ def load_and_train_model():
             }
             
             for animal in available_animals:
-                art_path = os.path.join(models_dir, animal, 'animal_artifacts.joblib')
-                if os.path.exists(art_path):
-                    artifacts = joblib.load(art_path)
+                loaded = predictor.store.load_species(animal)
+                if loaded is not None:
+                    artifacts = loaded[0]
                     disease_models = artifacts.get('disease_models', {})
                     
                     # Get stored metrics
@@ -1985,9 +2296,9 @@ def load_and_train_model():
             # Load feature columns from first available animal
             if available_animals:
                 sample_animal = available_animals[0]
-                art_path = os.path.join(models_dir, sample_animal, 'animal_artifacts.joblib')
-                if os.path.exists(art_path):
-                    artifacts = joblib.load(art_path)
+                loaded = predictor.store.load_species(sample_animal)
+                if loaded is not None:
+                    artifacts = loaded[0]
                     predictor.feature_columns = artifacts.get('feature_columns', [])
                     predictor.label_encoders = artifacts.get('label_encoders_cat', {})
                     print(f"\nLoaded {len(predictor.feature_columns)} feature columns")
@@ -2483,6 +2794,7 @@ def register():
         )
         
         if user:
+            user_cache.invalidate(user.id)
             login_user(user)
             
             if request.is_json:
@@ -2555,35 +2867,29 @@ def farmer_dashboard():
         flash('Access denied. Farmers only.', 'error')
         return redirect(url_for('dashboard'))
     
-    # Get user statistics
-    animals = DB.get_user_animals(current_user.id)
-    lands = DB.get_user_lands(current_user.id)
-    predictions = DB.get_user_predictions(current_user.id)
-    
-    total_animals = len(animals)
-    total_lands = len(lands)
-    total_predictions = len(predictions)
-    
-    # Get recent animals (last 5)
-    recent_animals = sorted(animals, key=lambda x: x.get('created_at', ''), reverse=True)[:5]
-    
-    # Get recent predictions (last 5)
-    recent_predictions = predictions[:5]
-    
-    # Count sick animals
-    sick_animals = len([a for a in animals if a.get('health_status') == 'sick'])
+    # Get user statistics: counts are computed by the database and the recent lists are limited
+    # projections, so the page costs the same however long the farm's history gets
+    user_id = current_user.id
+    results = fetch_concurrently(
+        total_animals=(DB.count_rows, 'animals', {'user_id': user_id}),
+        total_lands=(DB.count_rows, 'farm_lands', {'user_id': user_id}),
+        total_predictions=(DB.count_rows, 'predictions', {'user_id': user_id}),
+        sick_animals=(DB.count_rows, 'animals', {'user_id': user_id, 'health_status': 'sick'}),
+        recent_animals=(DB.get_recent_animals, user_id, 5),
+        recent_predictions=(DB.get_recent_predictions, user_id, 5),
+    )
     
     stats = {
-        'total_animals': total_animals,
-        'total_lands': total_lands,
-        'total_predictions': total_predictions,
-        'sick_animals': sick_animals
+        'total_animals': results['total_animals'],
+        'total_lands': results['total_lands'],
+        'total_predictions': results['total_predictions'],
+        'sick_animals': results['sick_animals']
     }
     
     return render_template('dashboard/main.html', 
                          stats=stats, 
-                         recent_animals=recent_animals,
-                         recent_predictions=recent_predictions)
+                         recent_animals=results['recent_animals'],
+                         recent_predictions=results['recent_predictions'])
 
 @app.route('/vet/dashboard')
 @login_required
@@ -2596,19 +2902,23 @@ def vet_dashboard():
         flash('Access denied. Veterinarians only.', 'error')
         return redirect(url_for('dashboard'))
     
-    # Get vet statistics
-    stats = DB.get_vet_stats(current_user.id)
-    
-    # Get recent vaccinations by this vet
-    recent_vaccinations = DB.get_vaccinations_by_vet(current_user.id)[:10]
-    
-    # Get all animals (limited view for dashboard)
-    all_animals = DB.get_all_animals_for_vet()[:20]  # Show first 20
+    # Vet statistics, the 10 latest vaccinations by this vet and one page of animals (newest first;
+    # ?animals_before=<id> continues after that animal)
+    page_size = app.config['VET_ANIMALS_PAGE_SIZE']
+    animals_before = request.args.get('animals_before', type=int)
+    results = fetch_concurrently(
+        stats=(DB.get_vet_stats, current_user.id),
+        recent_vaccinations=(DB.get_vaccinations_by_vet, current_user.id, 10),
+        animals=(DB.get_all_animals_for_vet, page_size + 1, animals_before),
+    )
+    all_animals, next_animals_before = keyset_page(results['animals'], page_size, lambda animal: animal['id'])
     
     return render_template('vet/dashboard.html', 
-                         stats=stats,
-                         recent_vaccinations=recent_vaccinations,
-                         all_animals=all_animals)
+                         stats=results['stats'],
+                         recent_vaccinations=results['recent_vaccinations'],
+                         all_animals=all_animals,
+                         animals_before=animals_before,
+                         next_animals_before=next_animals_before)
 
 @app.route('/vet/animal/<int:animal_id>')
 @login_required
@@ -2618,26 +2928,23 @@ def vet_animal_detail(animal_id):
         flash('Access denied. Veterinarians only.', 'error')
         return redirect(url_for('dashboard'))
     
-    # Get animal with owner info
-    animal = DB.get_animal_by_id(animal_id)
-    if not animal:
+    # Animal with owner info, vaccination and diagnosis history, all diseases for the dropdown.
+    # Fetched together: an unknown animal id costs three wasted queries, every valid one saves three round trips
+    results = fetch_concurrently(
+        animal=(DB.get_animal_by_id, animal_id),
+        vaccinations=(DB.get_animal_vaccinations, animal_id),
+        diagnoses=(DB.get_animal_diagnoses, animal_id),
+        all_diseases=(DB.get_all_diseases,),
+    )
+    if not results['animal']:
         flash('Animal not found.', 'error')
         return redirect(url_for('vet_dashboard'))
     
-    # Get vaccination history
-    vaccinations = DB.get_animal_vaccinations(animal_id)
-    
-    # Get diagnosis history
-    diagnoses = DB.get_animal_diagnoses(animal_id)
-    
-    # Get all diseases for dropdown
-    all_diseases = DB.get_all_diseases()
-    
     return render_template('vet/animal_detail.html',
-                         animal=animal,
-                         vaccinations=vaccinations,
-                         diagnoses=diagnoses,
-                         all_diseases=all_diseases)
+                         animal=results['animal'],
+                         vaccinations=results['vaccinations'],
+                         diagnoses=results['diagnoses'],
+                         all_diseases=results['all_diseases'])
 
 @app.route('/vet/animal/search', methods=['GET', 'POST'])
 @login_required
@@ -2840,8 +3147,19 @@ def vet_vaccinations_list():
         flash('Access denied. Veterinarians only.', 'error')
         return redirect(url_for('dashboard'))
     
-    vaccinations = DB.get_vaccinations_by_vet(current_user.id)
-    return render_template('vet/vaccinations_list.html', vaccinations=vaccinations)
+    # One page at a time, newest first; ?before=<vaccination_date>_<id> continues after that record
+    page_size = app.config['VACCINATIONS_PAGE_SIZE']
+    before = parse_vaccination_cursor(request.args.get('before'))
+    results = fetch_concurrently(
+        vaccinations=(DB.get_vaccinations_by_vet, current_user.id, page_size + 1, before),
+        total=(DB.count_rows, 'vaccinations', {'vet_id': current_user.id}),
+    )
+    vaccinations, next_before = keyset_page(results['vaccinations'], page_size, vaccination_cursor)
+    return render_template('vet/vaccinations_list.html',
+                         vaccinations=vaccinations,
+                         total_vaccinations=results['total'],
+                         first_page=before is None,
+                         next_before=next_before)
 
 @app.route('/animals')
 @login_required
@@ -2995,6 +3313,7 @@ def update_profile():
         }
         
         supabase.table('users').update(update_data).eq('id', current_user.id).execute()
+        user_cache.invalidate(current_user.id)
         
         # Update current_user object
         current_user.name = update_data['name']
@@ -3081,7 +3400,7 @@ def predict():
         
         # Save prediction if user is logged in
         if current_user.is_authenticated:
-            DB.add_prediction(
+            DB.queue_prediction(
                 user_id=current_user.id,
                 animal_id=None,
                 prediction_data=request.form.to_dict(),
@@ -3141,12 +3460,11 @@ def model_status():
         animal_metrics = {}
         models_dir = './models'
         if os.path.exists(models_dir):
-            available_animals = [d for d in os.listdir(models_dir) if os.path.isdir(os.path.join(models_dir, d))]
-            for animal in available_animals:
-                art_path = os.path.join(models_dir, animal, 'animal_artifacts.joblib')
-                if os.path.exists(art_path):
-                    try:
-                        artifacts = joblib.load(art_path)
+            for animal in predictor.store.available_species():
+                try:
+                    loaded = predictor.store.load_species(animal)
+                    if loaded is not None:
+                        artifacts = loaded[0]
                         stored_metrics = artifacts.get('model_metrics', {})
                         if stored_metrics:
                             animal_metrics[animal] = {
@@ -3154,14 +3472,81 @@ def model_status():
                                 'samples': stored_metrics.get('samples', 0),
                                 'diseases': stored_metrics.get('disease_count', 0)
                             }
-                    except:
-                        pass
+                except:
+                    pass
         
         if animal_metrics:
             status['animal_metrics'] = animal_metrics
     
     return jsonify(status)
 
+def is_admin(user):
+    return user.is_authenticated and (user.email or '').lower() in app.config['ADMIN_EMAILS']
+
+@app.route('/admin/cache_stats')
+@login_required
+def admin_cache_stats():
+    """Hit ratios of the in-process caches"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    return jsonify({'success': True, 'caches': [user_cache.stats(), reference_cache.stats()],
+                    'queues': [prediction_queue.stats()]})
+
+@app.route('/admin/cache_invalidate', methods=['POST'])
+@login_required
+def admin_cache_invalidate():
+    """Drop cached reference data after editing it in the database: {"table": "diseases"}, or all tables"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    table = (request.get_json(silent=True) or {}).get('table') or request.form.get('table')
+    if table and table not in REFERENCE_TABLES:
+        return jsonify({'success': False, 'message': f'Unknown table {table}'}), 400
+    for name in ([table] if table else REFERENCE_TABLES):
+        reference_cache.invalidate(name)
+    return jsonify({'success': True, 'invalidated': [table] if table else list(REFERENCE_TABLES)})
+
+@app.route('/admin/retrain', methods=['POST'])
+@login_required
+def admin_retrain():
+    """Start a background retraining job (options: full_retrain, distill, tree_native, skip_profile)"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    options = request.get_json(silent=True) or request.form.to_dict()
+    options = {k: str(v).lower() in ('1', 'true', 'yes', 'on') for k, v in options.items()}
+    total = len(predictor.store.available_species()) if predictor else None
+    job, started = retrain_runner.start(options, total_species=total)
+    if not started and job is None:
+        return jsonify({'success': False, 'message': 'An online update or training run outside the app is '
+                                                     'writing models; try again when it finishes'}), 409
+    if not started:
+        return jsonify({'success': False, 'message': 'A retraining job is already running', 'job': job.to_dict()}), 409
+    return jsonify({'success': True, 'job': job.to_dict(),
+                    'status_url': url_for('admin_retrain_status', job_id=job.id),
+                    'stream_url': url_for('admin_retrain_stream', job_id=job.id)}), 202
+
+@app.route('/admin/retrain/<job_id>')
+@login_required
+def admin_retrain_status(job_id):
+    """Progress of a retraining job"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    job = retrain_runner.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/admin/retrain/<job_id>/stream')
+@login_required
+def admin_retrain_stream(job_id):
+    """Trainer output as server-sent events until the job finishes"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    job = retrain_runner.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    return Response(stream_with_context(retrain_runner.stream(job)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/animal/<int:animal_id>')
 @login_required
 def animal_detail(animal_id):
@@ -3264,7 +3649,7 @@ def predict_for_animal(animal_id):
             )
             
             # Save prediction linked to this animal
-            DB.add_prediction(
+            DB.queue_prediction(
                 user_id=current_user.id,
                 animal_id=animal_id,
                 prediction_data=data,
@@ -3362,7 +3747,12 @@ def dashboard_data():
     from dateutil import parser
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
     
-    predictions = DB.get_user_predictions(current_user.id)
+    results = fetch_concurrently(
+        predictions=(DB.get_recent_predictions, current_user.id, None, thirty_days_ago),
+        animals=(DB.get_user_animals, current_user.id, 'animal_type'),
+        upcoming_vaccinations=(DB.count_upcoming_vaccinations, current_user.id, 30),
+    )
+    predictions = results['predictions']
     
     health_trends = []
     for prediction in predictions:
@@ -3378,7 +3768,7 @@ def dashboard_data():
             pass
     
     # Get animal distribution
-    animals = DB.get_user_animals(current_user.id)
+    animals = results['animals']
     animal_types = {}
     for animal in animals:
         animal_types[animal.get('animal_type')] = animal_types.get(animal.get('animal_type'), 0) + 1
@@ -3388,30 +3778,12 @@ def dashboard_data():
         for animal_type, count in animal_types.items()
     ]
     
-    # Get upcoming vaccinations (next 30 days)
-    # For now, return 0 as we need to implement a more complex query
-    # or iterate through all animals and their vaccinations
-    upcoming_vaccinations = 0
-    animals = DB.get_user_animals(current_user.id)
-    thirty_days_later = datetime.utcnow().date() + timedelta(days=30)
-    today = datetime.utcnow().date()
-    
-    for animal in animals:
-        vaccinations = DB.get_animal_vaccinations(animal.get('id'))
-        for vacc in vaccinations:
-            next_due = vacc.get('next_due_date')
-            if next_due:
-                try:
-                    next_due_date = parser.parse(next_due).date()
-                    if today <= next_due_date <= thirty_days_later:
-                        upcoming_vaccinations += 1
-                except:
-                    pass
-    
+    # Upcoming vaccinations (next 30 days): one counted join over all of the user's animals
+    # instead of one vaccinations query per animal
     return jsonify({
         'health_trends': health_trends,
         'animal_distribution': animal_distribution,
-        'upcoming_vaccinations': upcoming_vaccinations
+        'upcoming_vaccinations': results['upcoming_vaccinations']
     })
 
 @app.route('/knowledge_base')
@@ -3649,6 +4021,7 @@ if __name__ == '__main__':
     # Initialize everything
     success = load_and_train_model()
     initialize_database()
+    threading.Thread(target=DB.warm_reference_cache, daemon=True, name='warm-reference-cache').start()
     
     if success:
         print("\nStarting PashuCare Complete System...")
@@ -0,0 +1,244 @@
+"""
+Content-addressed store for trained model components.
+
+Every fitted component (syndrome classifier bundle, one bundle per disease syndrome,
+the shared categorical label encoders) is serialized once and saved under its SHA-256:
+
+    models/objects/ab/ab12...ef.joblib
+    models/versions/<version>.json      # per-version manifest: species -> component digests
+    models/manifest.json                # training manifest; 'version' names the published one
+
+Identical components are written once, whether they repeat across species (the global
+label encoders) or across versions (species reused by incremental retraining).
+Readers keep a small in-process cache keyed by digest, since objects never change.
+
+Objects can be written in one of FORMATS: 'raw' (uncompressed joblib, loadable with mmap),
+'lz4' (fast decompression) or 'zlib' (smallest). The digest is always taken over the raw
+serialization, so a component keeps its address whatever format it is stored in, and the
+loader detects the format from the file's leading bytes.
+
+Writers (test2.py training runs, online_update.py) hold models/.lock for their whole run,
+from reading the published version to publishing and collecting garbage. Otherwise two
+writers could claim the same version number, and one's garbage collection would delete
+objects the other has put but not published yet. Readers never take the lock.
+"""
+import glob
+import hashlib
+import io
+import json
+import os
+from collections import OrderedDict
+
+import joblib
+
+try:
+    import fcntl
+    FLOCK_AVAILABLE = True
+except ImportError:                # Windows: writers are not serialized
+    FLOCK_AVAILABLE = False
+
+try:
+    import lz4.frame  # noqa: F401  (joblib's lz4 compressor)
+    LZ4_AVAILABLE = True
+except Exception:
+    LZ4_AVAILABLE = False
+
+STORE_LAYOUT_VERSION = 1
+OBJECT_CACHE_SIZE = 64   # deserialized components kept per process
+FORMATS = {'raw': None, 'lz4': ('lz4', 3), 'zlib': ('zlib', 3)}   # name -> joblib compress argument
+
+
+def detect_format(path):
+    """Serialization format of a stored object, from its magic bytes"""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    if head == b'\x04\x22\x4d\x18':
+        return 'lz4'
+    if head[:1] == b'\x78':
+        return 'zlib'
+    return 'raw'
+
+
+class ArtifactStore:
+    def __init__(self, root='./models', cache_size=OBJECT_CACHE_SIZE, fmt='raw', mmap=False):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown artifact format {fmt!r}; expected one of {sorted(FORMATS)}")
+        if fmt == 'lz4' and not LZ4_AVAILABLE:
+            raise ValueError("Artifact format 'lz4' needs the lz4 package (pip install lz4)")
+        self.root = root
+        self.fmt = fmt
+        self.mmap = mmap
+        self.objects_dir = os.path.join(root, 'objects')
+        self.versions_dir = os.path.join(root, 'versions')
+        self.lock_path = os.path.join(root, '.lock')
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    # --- objects -----------------------------------------------------------
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest + '.joblib')
+
+    def has(self, digest):
+        return os.path.exists(self.object_path(digest))
+
+    def put(self, obj):
+        """Serialize obj, store it under the SHA-256 of its raw bytes in this store's format and return the digest"""
+        buf = io.BytesIO()
+        joblib.dump(obj, buf)
+        data = buf.getvalue()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if os.path.exists(path) and detect_format(path) == self.fmt:
+            return digest
+        if self.fmt != 'raw':
+            buf = io.BytesIO()
+            joblib.dump(obj, buf, compress=FORMATS[self.fmt])
+            data = buf.getvalue()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # unique temp name: concurrent trainers may store the same object at the same time
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return digest
+
+    def get(self, digest):
+        if digest in self._cache:
+            self._cache.move_to_end(digest)
+            return self._cache[digest]
+        # joblib detects compression itself; mmap only applies to raw objects (ignored for compressed ones)
+        path = self.object_path(digest)
+        obj = joblib.load(path, mmap_mode='r' if self.mmap and detect_format(path) == 'raw' else None)
+        self._cache[digest] = obj
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return obj
+
+    def object_size(self, digest):
+        return os.path.getsize(self.object_path(digest))
+
+    # --- versions ----------------------------------------------------------
+    def version_path(self, version):
+        return os.path.join(self.versions_dir, f'{int(version)}.json')
+
+    def write_version(self, version, species):
+        """species: {animal: entry} where entry holds component digests (see put_species)"""
+        os.makedirs(self.versions_dir, exist_ok=True)
+        path = self.version_path(version)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'layout': STORE_LAYOUT_VERSION, 'version': int(version), 'species': species},
+                      f, indent=2, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    def read_version(self, version=None):
+        version = self.current_version() if version is None else version
+        if version is None or not os.path.exists(self.version_path(version)):
+            return None
+        with open(self.version_path(version)) as f:
+            return json.load(f)
+
+    def current_version(self):
+        """Version published in models/manifest.json, or None before the first store-backed training run"""
+        path = os.path.join(self.root, 'manifest.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            version = json.load(f).get('version')
+        return version if version and os.path.exists(self.version_path(version)) else None
+
+    def available_species(self, version=None):
+        manifest = self.read_version(version)
+        if manifest is not None:
+            return sorted(manifest['species'])
+        # pre-store layout: one directory per species
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, d, 'animal_artifacts.joblib')))
+
+    # --- species bundles ---------------------------------------------------
+    def put_species(self, syndrome_bundle, disease_models, label_encoders, feature_columns, tree_native=False):
+        """Store one species' components and return its version-manifest entry"""
+        return {
+            'syndrome': self.put(syndrome_bundle),
+            'disease_models': {synd: self.put(info) for synd, info in disease_models.items()},
+            'label_encoders_cat': self.put(label_encoders),
+            'feature_columns': list(feature_columns),
+            'tree_native': bool(tree_native),
+        }
+
+    def entry_digests(self, entry):
+        return [entry['syndrome'], entry['label_encoders_cat'], *entry['disease_models'].values()]
+
+    def entry_complete(self, entry):
+        return bool(entry) and all(self.has(d) for d in self.entry_digests(entry))
+
+    def load_species(self, animal, version=None):
+        """(artifacts, syndrome_bundle) in the shape of the old animal_artifacts.joblib / syndrome_clf.joblib,
+           or None when the species has no trained model"""
+        manifest = self.read_version(version)
+        if manifest is None:
+            legacy_dir = os.path.join(self.root, animal)
+            art_path = os.path.join(legacy_dir, 'animal_artifacts.joblib')
+            if not os.path.exists(art_path):
+                return None
+            return joblib.load(art_path), joblib.load(os.path.join(legacy_dir, 'syndrome_clf.joblib'))
+        entry = manifest['species'].get(animal)
+        return None if entry is None else self.load_entry(entry)
+
+    def load_entry(self, entry):
+        """Materialize one version-manifest entry into (artifacts, syndrome_bundle)"""
+        syndrome_bundle = self.get(entry['syndrome'])
+        artifacts = {
+            'disease_models': {synd: self.get(d) for synd, d in entry['disease_models'].items()},
+            'syndrome_encoder': syndrome_bundle['label_encoder'],
+            'syndrome_scaler': syndrome_bundle['scaler'],
+            'feature_columns': entry['feature_columns'],
+            'label_encoders_cat': self.get(entry['label_encoders_cat']),
+            'tree_native': entry.get('tree_native', False),
+        }
+        return artifacts, syndrome_bundle
+
+    # --- writer lock -------------------------------------------------------
+    def lock_writers(self):
+        """Take the writer lock without waiting. Returns the open lock file (the lock lasts until it is
+           closed or the process exits), or None when another process is writing."""
+        os.makedirs(self.root, exist_ok=True)
+        lock = open(self.lock_path, 'a')
+        if FLOCK_AVAILABLE:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                return None
+        return lock
+
+    def writer_active(self):
+        """Whether some process holds the writer lock right now"""
+        if not os.path.exists(self.lock_path):
+            return False
+        lock = self.lock_writers()
+        if lock is None:
+            return True
+        lock.close()
+        return False
+
+    # --- housekeeping ------------------------------------------------------
+    def collect_garbage(self, keep_versions=3):
+        """Delete objects not referenced by the newest keep_versions manifests; returns bytes freed"""
+        versions = sorted(int(os.path.basename(p)[:-5]) for p in glob.glob(os.path.join(self.versions_dir, '*.json')))
+        live = set()
+        for version in versions[-keep_versions:]:
+            for entry in self.read_version(version)['species'].values():
+                live.update(self.entry_digests(entry))
+        freed = 0
+        for path in glob.glob(os.path.join(self.objects_dir, '*', '*.joblib')):
+            if os.path.basename(path)[:-7] not in live:
+                freed += os.path.getsize(path)
+                os.remove(path)
+        for version in versions[:-keep_versions]:
+            os.remove(self.version_path(version))
+        return freed
+
+    def disk_usage(self):
+        return sum(os.path.getsize(p) for p in glob.glob(os.path.join(self.objects_dir, '*', '*.joblib')))
@@ -0,0 +1,130 @@
+"""
+Size and load time of the stored model components under each artifact format.
+
+Every object referenced by the published model version is rewritten into a scratch
+store per format (raw, lz4, zlib). Load times are measured in a fresh interpreter so
+the in-process object cache never helps:
+
+  cold  the object files are evicted from the page cache first (posix_fadvise DONTNEED,
+        best effort; Linux only) - the first request after a deploy or a restart
+  warm  the same load repeated with the files still in the page cache
+
+'raw+mmap' is the raw store loaded with ArtifactStore(mmap=True): arrays are mapped
+from the page cache instead of copied into the process.
+
+    python benchmarks/bench_artifact_formats.py                 # uses ./models
+    python benchmarks/bench_artifact_formats.py --models path/to/models --json formats.json
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from artifact_store import FORMATS, LZ4_AVAILABLE, ArtifactStore  # noqa: E402
+
+
+def published_digests(store):
+    version = store.read_version()
+    if version is None:
+        sys.exit(f"No published model version under {store.root}; run test2.py first")
+    digests = set()
+    for entry in version['species'].values():
+        digests.update(store.entry_digests(entry))
+    return sorted(digests)
+
+
+def evict_page_cache(root):
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for path in glob.glob(os.path.join(root, 'objects', '*', '*.joblib')):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def timed_load(root, digests, mmap):
+    """Load every digest in a fresh interpreter; returns seconds spent in ArtifactStore.get"""
+    code = (
+        "import json, sys, time\n"
+        f"sys.path.insert(0, {ROOT!r})\n"
+        "from artifact_store import ArtifactStore\n"
+        "root, mmap, digests = sys.argv[1], sys.argv[2] == '1', json.loads(sys.stdin.read())\n"
+        "store = ArtifactStore(root, mmap=mmap)\n"
+        "t0 = time.perf_counter()\n"
+        "for d in digests:\n"
+        "    store.get(d)\n"
+        "print(time.perf_counter() - t0)\n"
+    )
+    out = subprocess.run([sys.executable, '-c', code, root, '1' if mmap else '0'],
+                         input=json.dumps(digests), capture_output=True, text=True, check=True,
+                         env=dict(os.environ, PYTHONWARNINGS='ignore'))
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', default=os.path.join(ROOT, 'models'))
+    parser.add_argument('--repeats', type=int, default=3, help='best of N for each timing')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    source = ArtifactStore(args.models)
+    digests = published_digests(source)
+    objects = [source.get(d) for d in digests]
+    formats = [f for f in FORMATS if f != 'lz4' or LZ4_AVAILABLE]
+    print(f"{len(digests)} objects from model version {source.current_version()}")
+    if 'lz4' not in formats:
+        print("lz4 not installed; skipping that format")
+
+    workdir = tempfile.mkdtemp(prefix='bench_formats_')
+    results = {'objects': len(digests), 'runs': []}
+    try:
+        cases = []
+        for fmt in formats:
+            root = os.path.join(workdir, fmt)
+            store = ArtifactStore(root, fmt=fmt)
+            t0 = time.perf_counter()
+            # a round-tripped object may pickle to different bytes, so use the digests put() returns
+            stored = [store.put(obj) for obj in objects]
+            write_secs = time.perf_counter() - t0
+            cases.append((fmt, root, stored, False, store.disk_usage(), write_secs))
+            if fmt == 'raw':
+                cases.append(('raw+mmap', root, stored, True, store.disk_usage(), write_secs))
+
+        evicted = True
+        print(f"\n{'format':<9} {'MB':>7} {'write s':>8} {'cold s':>8} {'warm s':>8}")
+        for name, root, stored, mmap, size, write_secs in cases:
+            cold = []
+            for _ in range(args.repeats):
+                evicted = evict_page_cache(root) and evicted
+                cold.append(timed_load(root, stored, mmap))
+            warm = [timed_load(root, stored, mmap) for _ in range(args.repeats)]
+            run = {'format': name, 'bytes': size, 'write_seconds': write_secs,
+                   'cold_load_seconds': min(cold), 'warm_load_seconds': min(warm)}
+            results['runs'].append(run)
+            print(f"{name:<9} {size / 1e6:>7.2f} {write_secs:>8.3f} {min(cold):>8.3f} {min(warm):>8.3f}")
+        if not evicted:
+            print("\n(page cache eviction unavailable here: cold timings include cached reads)")
+        results['page_cache_evicted'] = evicted
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+Query latency of the two persistence backends (DB_BACKEND) on the same synthetic data.
+
+  sqlite     local_db.LocalClient: the embedded database file, queried in-process
+  supabase   the real supabase client over HTTP (pooled transport from supabase_http.py)
+             against a PostgREST stand-in that answers from the same SQLite file
+
+No Postgres is needed: the stand-in gives the supabase backend its real client-side cost
+(query building, HTTP, JSON) plus --rtt-ms of emulated network per request, while both
+backends read identical rows. Every workload entry is the query a DB.* / User.* method
+sends, and both backends must return the same result for it.
+
+    python benchmarks/bench_db_backends.py
+    python benchmarks/bench_db_backends.py --farmers 50 --herd 200 --rtt-ms 40 --repeats 100
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from local_db import APIError, LocalClient  # noqa: E402
+from supabase_http import create_pooled_client, make_http_client  # noqa: E402
+
+
+# --- synthetic data ------------------------------------------------------------
+def populate(client, farmers, herd, seed=0):
+    """farmers x herd animals, 3 vaccinations and 2 predictions per animal, a diagnosis for every 4th"""
+    rng = random.Random(seed)
+    today = date.today()
+    vets = [client.table('users').insert({'email': f'vet{v}@example.com', 'password_hash': 'x', 'name': f'Vet {v}',
+                                          'user_type': 'veterinarian'}).execute().data[0]['id'] for v in range(5)]
+    diseases = [d['id'] for d in client.table('diseases').select('id').execute().data]
+    farmer_ids = []
+    for f in range(farmers):
+        farmer = client.table('users').insert({'email': f'farmer{f}@example.com', 'password_hash': 'x',
+                                               'name': f'Farmer {f}', 'user_type': 'farmer'}).execute().data[0]
+        farmer_ids.append(farmer['id'])
+        animals = client.table('animals').insert([
+            {'user_id': farmer['id'], 'animal_type': rng.choice(['Cow', 'Goat', 'Sheep', 'Dog']), 'name': f'A{f}-{i}',
+             'breed': 'Local', 'age': rng.randint(1, 12), 'gender': rng.choice(['Male', 'Female']),
+             'weight': rng.uniform(20, 500), 'health_status': rng.choice(['healthy'] * 9 + ['sick'])}
+            for i in range(herd)]).execute().data
+        client.table('vaccinations').insert([
+            {'animal_id': a['id'], 'vet_id': rng.choice(vets), 'vaccine_name': 'FMD',
+             'vaccination_date': (today - timedelta(days=rng.randint(0, 700))).isoformat(),
+             'next_due_date': (today + timedelta(days=rng.randint(-90, 180))).isoformat()}
+            for a in animals for _ in range(3)], returning='minimal').execute()
+        client.table('predictions').insert([
+            {'user_id': farmer['id'], 'animal_id': a['id'], 'confidence': rng.random(),
+             'prediction_data': json.dumps({'symptom1': 'Fever', 'body_temperature': 39.5}),
+             'result': json.dumps({'predicted_disease': 'Mastitis', 'top_3_predictions': [['Mastitis', 0.5]] * 3})}
+            for a in animals for _ in range(2)], returning='minimal').execute()
+        client.table('animal_diseases').insert([
+            {'animal_id': a['id'], 'disease_id': rng.choice(diseases), 'diagnosed_by_vet_id': rng.choice(vets),
+             'date_diagnosed': (today - timedelta(days=rng.randint(0, 365))).isoformat()}
+            for a in animals[::4]], returning='minimal').execute()
+    return farmer_ids, vets
+
+
+# --- the queries DB.* / User.* send ---------------------------------------------
+def workload(farmer_id, vet_id, animal_id):
+    today = date.today()
+    return {
+        'User.get_by_email': lambda c: c.table('users').select('*').eq('email', 'farmer0@example.com').execute().data,
+        'DB.count_rows (animals)': lambda c: c.table('animals').select('id', count='exact', head=True)
+            .eq('user_id', farmer_id).execute().count,
+        'DB.get_recent_animals': lambda c: c.table('animals').select('id, animal_id, name, animal_type, breed, created_at')
+            .eq('user_id', farmer_id).order('created_at', desc=True, nullsfirst=False).order('id', desc=True)
+            .limit(5).execute().data,
+        'DB.get_user_predictions': lambda c: c.table('predictions').select('*').eq('user_id', farmer_id)
+            .order('created_at', desc=True).order('id', desc=True).execute().data,
+        'DB.count_upcoming_vaccinations': lambda c: c.table('vaccinations')
+            .select('id, animals!inner(user_id)', count='exact', head=True).eq('animals.user_id', farmer_id)
+            .gte('next_due_date', today.isoformat()).lte('next_due_date', (today + timedelta(days=30)).isoformat())
+            .execute().count,
+        'DB.get_vet_stats (rpc)': lambda c: c.rpc('vet_stats', {'p_vet_id': vet_id}).execute().data,
+        'DB.get_all_animals_for_vet (page)': lambda c: c.table('animals')
+            .select('*, users!animals_user_id_fkey(name, email, phone, location)')
+            .order('id', desc=True).limit(21).execute().data,
+        'DB.get_vaccinations_by_vet (page)': lambda c: c.table('vaccinations')
+            .select('*, animals(name, animal_type), users!vaccinations_vet_id_fkey(name)').eq('vet_id', vet_id)
+            .or_(f'vaccination_date.lt.{today},and(vaccination_date.eq.{today},id.lt.1000000)')
+            .order('vaccination_date', desc=True).order('id', desc=True).limit(51).execute().data,
+        'DB.get_animal_diagnoses': lambda c: c.table('animal_diseases')
+            .select('*, diseases(name, description, recommended_treatment, severity), '
+                    'users!animal_diseases_diagnosed_by_vet_id_fkey(name)')
+            .eq('animal_id', animal_id).order('date_diagnosed', desc=True).execute().data,
+        'DB.search_animals': lambda c: c.table('animals').select('*, users!animals_user_id_fkey(name, email, phone)')
+            .or_('name.ilike.%A0-1%,animal_type.ilike.%A0-1%').order('id').execute().data,
+    }
+
+def write_workload(farmer_id):
+    return {
+        'DB.insert_predictions (1 row)': lambda c: c.table('predictions').insert([
+            {'user_id': farmer_id, 'animal_id': None, 'confidence': 0.5, 'prediction_data': '{}', 'result': '{}'}],
+            returning='minimal').execute(),
+    }
+
+
+# --- PostgREST stand-in over the same SQLite file ------------------------------
+class PostgRESTHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _query(self, table):
+        query = self.server.db.table(table)
+        params = parse_qsl(urlsplit(self.path).query, keep_blank_values=True)
+        return query, params
+
+    def _apply_filters(self, query, params):
+        for key, value in params:
+            if key == 'select':
+                continue
+            if key == 'or':
+                query = query.or_(value[1:-1])
+            elif key == 'order':
+                for term in value.split(','):
+                    column, *flags = term.split('.')
+                    nulls = {'nullsfirst': True, 'nullslast': False}
+                    query = query.order(column, desc='desc' in flags,
+                                        nullsfirst=next((nulls[f] for f in flags if f in nulls), None))
+            elif key == 'limit':
+                query = query.limit(int(value))
+            elif key == 'offset':
+                query = query.offset(int(value))
+            elif key != 'columns':
+                op, _, operand = value.partition('.')
+                if op == 'in':
+                    operand = [v.strip('"') for v in operand.strip('()').split(',')]
+                query = query.filter(key, op, operand)
+        return query
+
+    def _send(self, status, body=None, headers=()):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(payload)
+
+    def _handle(self, action):
+        time.sleep(self.server.rtt)
+        self.server.requests += 1
+        path = urlsplit(self.path).path
+        body = None
+        if self.headers.get('Content-Length'):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'null')
+        prefer = self.headers.get('Prefer', '')
+        try:
+            if path.startswith('/rest/v1/rpc/'):
+                return self._send(200, self.server.db.rpc(path.rsplit('/', 1)[1], body).execute().data)
+            query, params = self._query(path.rsplit('/', 1)[1])
+            if action == 'select':
+                select = dict(params).get('select', '*')
+                query = query.select(select, count='exact' if 'count=exact' in prefer else None,
+                                     head=self.command == 'HEAD')
+            elif action == 'insert':
+                query = query.insert(body, returning='minimal' if 'return=minimal' in prefer else 'representation')
+            elif action == 'update':
+                query = query.update(body)
+            else:
+                query = query.delete()
+            result = self._apply_filters(query, params).execute()
+        except APIError as e:
+            return self._send(400, {'code': e.code, 'message': e.message, 'hint': e.hint, 'details': e.details})
+        headers = []
+        if result.count is not None:
+            headers.append(('Content-Range', f'*/{result.count}'))
+        if action == 'insert' and 'return=minimal' in prefer:
+            return self._send(201, None, headers)
+        self._send(201 if action == 'insert' else 200, result.data, headers)
+
+    def do_GET(self):
+        self._handle('select')
+
+    def do_HEAD(self):
+        self._handle('select')
+
+    def do_POST(self):
+        self._handle('insert')
+
+    def do_PATCH(self):
+        self._handle('update')
+
+    def do_DELETE(self):
+        self._handle('delete')
+
+    def log_message(self, *args):
+        pass
+
+
+def time_query(client, fn, repeats):
+    fn(client)                                       # warm caches / connections
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(client)
+        timings.append((time.perf_counter() - t0) * 1000.0)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--farmers', type=int, default=20)
+    parser.add_argument('--herd', type=int, default=100, help='animals per farmer')
+    parser.add_argument('--rtt-ms', type=float, default=20.0, help='emulated network round trip for supabase')
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_db_')
+    try:
+        local = LocalClient(os.path.join(workdir, 'bench.db'))
+        t0 = time.perf_counter()
+        farmer_ids, vets = populate(local, args.farmers, args.herd)
+        animal_id = local.table('animals').select('id').eq('user_id', farmer_ids[0]).limit(1).execute().data[0]['id']
+        print(f"{args.farmers} farmers x {args.herd} animals, {3 * args.farmers * args.herd} vaccinations, "
+              f"{2 * args.farmers * args.herd} predictions (loaded in {time.perf_counter() - t0:.1f}s); "
+              f"supabase RTT {args.rtt_ms:g} ms, {args.repeats} runs per query\n")
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), PostgRESTHandler)
+        server.daemon_threads = True
+        server.db = local
+        server.rtt = args.rtt_ms / 1000.0
+        server.requests = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        remote, http = create_pooled_client(f'http://127.0.0.1:{server.server_address[1]}', 'bench-key',
+                                            http_client=make_http_client(http2=False))
+
+        results = {'farmers': args.farmers, 'herd': args.herd, 'rtt_ms': args.rtt_ms, 'queries': {}}
+        print(f"{'query':<36} {'rows':>5} {'sqlite p50':>11} {'p95':>8} {'supabase p50':>13} {'p95':>8}")
+        queries = dict(workload(farmer_ids[0], vets[0], animal_id), **write_workload(farmer_ids[0]))
+        for name, fn in queries.items():
+            local_result, remote_result = fn(local), fn(remote)
+            data = getattr(local_result, 'data', local_result)
+            if name in write_workload(0):
+                data = None
+            elif data != remote_result:
+                raise SystemExit(f"backends disagree on {name}")
+            rows = len(data) if isinstance(data, list) else (data if isinstance(data, int) else '')
+            timings = {'sqlite': time_query(local, fn, args.repeats), 'supabase': time_query(remote, fn, args.repeats)}
+            results['queries'][name] = {backend: {'p50_ms': float(np.percentile(t, 50)),
+                                                  'p95_ms': float(np.percentile(t, 95))}
+                                        for backend, t in timings.items()}
+            r = results['queries'][name]
+            print(f"{name:<36} {rows!s:>5} {r['sqlite']['p50_ms']:>11.2f} {r['sqlite']['p95_ms']:>8.2f} "
+                  f"{r['supabase']['p50_ms']:>13.2f} {r['supabase']['p95_ms']:>8.2f}")
+        http.close()
+        server.shutdown()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Supabase round-trip time with and without the pooled transport (supabase_http.py).
+
+A local PostgREST-compatible stand-in serves /rest/v1/<table> over TLS, negotiating
+HTTP/2 or HTTP/1.1 through ALPN like the hosted API. The real supabase client runs
+the same `table('users').select('*').eq('id', 1)` query through three transports:
+
+  no-keepalive  max_keepalive=0: every request opens a new TCP + TLS connection
+  pooled-h1     shared keep-alive pool, HTTP/1.1
+  pooled-h2     shared keep-alive pool, HTTP/2 (concurrent requests share a connection)
+
+Loopback has no network latency, so --rtt-ms emulates it: the stand-in waits one RTT
+per request and two more per new connection (TCP + TLS 1.3 handshakes).
+
+    python benchmarks/bench_supabase_pool.py
+    python benchmarks/bench_supabase_pool.py --rtt-ms 40 --requests 100 --threads 8
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import h2.config
+import h2.connection
+import h2.events
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from supabase_http import create_pooled_client, make_http_client  # noqa: E402
+
+ROWS = [{'id': 1, 'email': 'farmer@example.com', 'name': 'Test Farmer', 'user_type': 'farmer',
+         'farm_name': 'Green Acres', 'location': 'Pune', 'phone': '0000000000'}]
+
+
+# --- stand-in server -------------------------------------------------------
+class StandIn:
+    def __init__(self, certfile, keyfile, rtt):
+        self.rtt = rtt
+        self.connections = 0
+        self.ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.ctx.load_cert_chain(certfile, keyfile)
+        self.ctx.set_alpn_protocols(['h2', 'http/1.1'])
+        self.sock = socket.create_server(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def body(self):
+        return json.dumps(ROWS).encode()
+
+    def _accept(self):
+        while True:
+            conn, addr = self.sock.accept()
+            # headers and body go out in separate writes; don't let Nagle + delayed ACK stall them
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn, addr), daemon=True).start()
+
+    def _serve(self, conn, addr):
+        time.sleep(2 * self.rtt)                       # TCP + TLS handshakes
+        try:
+            tls = self.ctx.wrap_socket(conn, server_side=True)
+        except (ssl.SSLError, OSError):
+            conn.close()
+            return
+        if tls.selected_alpn_protocol() == 'h2':
+            self._serve_h2(tls)
+        else:
+            H1Handler(tls, addr, self)
+
+    def _serve_h2(self, tls):
+        h2conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        lock = threading.Lock()
+        h2conn.initiate_connection()
+        tls.sendall(h2conn.data_to_send())
+
+        def respond(stream_id):
+            time.sleep(self.rtt)
+            body = self.body()
+            with lock:
+                h2conn.send_headers(stream_id, [(':status', '200'), ('content-type', 'application/json'),
+                                                ('content-length', str(len(body)))])
+                h2conn.send_data(stream_id, body, end_stream=True)
+                tls.sendall(h2conn.data_to_send())
+
+        try:
+            while True:
+                data = tls.recv(65536)
+                if not data:
+                    break
+                with lock:
+                    events = h2conn.receive_data(data)
+                    tls.sendall(h2conn.data_to_send())
+                for event in events:
+                    if isinstance(event, h2.events.RequestReceived):
+                        # each stream answers on its own thread, so requests multiplex
+                        threading.Thread(target=respond, args=(event.stream_id,), daemon=True).start()
+                    elif isinstance(event, h2.events.ConnectionTerminated):
+                        return
+        except (ssl.SSLError, OSError):
+            pass
+        finally:
+            tls.close()
+
+
+class H1Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(self.server.rtt)
+        body = self.server.body()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def self_signed_cert(workdir):
+    cert, key = os.path.join(workdir, 'cert.pem'), os.path.join(workdir, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'ec', '-pkeyopt', 'ec_paramgen_curve:prime256v1',
+                    '-nodes', '-keyout', key, '-out', cert, '-days', '1', '-subj', '/CN=localhost',
+                    '-addext', 'subjectAltName=IP:127.0.0.1'],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return cert, key
+
+
+# --- client side -----------------------------------------------------------
+TRANSPORTS = {
+    'no-keepalive': {'http2': False, 'max_keepalive': 0},
+    'pooled-h1': {'http2': False},
+    'pooled-h2': {'http2': True},
+}
+
+def query(client):
+    t0 = time.perf_counter()
+    client.table('users').select('*').eq('id', 1).execute()
+    return (time.perf_counter() - t0) * 1000.0
+
+def run_transport(server, url, cert, options, requests, threads):
+    server.connections = 0
+    client, http = create_pooled_client(url, 'bench-key', http_client=make_http_client(verify=cert, **options))
+    query(client)                                    # build the PostgREST client before timing
+    sequential = [query(client) for _ in range(requests)]
+
+    per_thread = max(1, requests // threads)
+    t0 = time.perf_counter()
+    workers = [threading.Thread(target=lambda: [query(client) for _ in range(per_thread)]) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - t0
+    version = http.get(f'{url}/rest/v1/users').http_version
+    http.close()
+    return {
+        'http_version': version,
+        'mean_ms': float(np.mean(sequential)),
+        'p50_ms': float(np.percentile(sequential, 50)),
+        'p95_ms': float(np.percentile(sequential, 95)),
+        'concurrent_rps': per_thread * threads / wall,
+        'connections_opened': server.connections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8, help='threads for the concurrent phase')
+    parser.add_argument('--rtt-ms', type=float, default=0.0, help='emulated network round trip')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_pool_')
+    try:
+        cert, key = self_signed_cert(workdir)
+        server = StandIn(cert, key, args.rtt_ms / 1000.0)
+        url = f'https://127.0.0.1:{server.port}'
+        results = {'rtt_ms': args.rtt_ms, 'requests': args.requests, 'threads': args.threads, 'runs': {}}
+        print(f"{args.requests} sequential + {args.threads}-thread concurrent queries, emulated RTT {args.rtt_ms:g} ms\n")
+        print(f"{'transport':<13} {'proto':<9} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'conc. req/s':>11} {'conns':>6}")
+        for name, options in TRANSPORTS.items():
+            r = run_transport(server, url, cert, options, args.requests, args.threads)
+            results['runs'][name] = r
+            print(f"{name:<13} {r['http_version']:<9} {r['mean_ms']:>8.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+                  f"{r['concurrent_rps']:>11.0f} {r['connections_opened']:>6}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Training wall time under different CPU budgets (test2.py --cpu-budget / --species-workers).
+
+Each configuration runs `test2.py --full-retrain` in a scratch directory so the real
+./models and ./cache are untouched. Speedups are relative to a single-core serial run.
+
+On Linux the trainer's process tree is sampled while it runs, and the peak number of
+runnable threads (state R: running or waiting for a core) across all its processes is
+reported next to the budget. Idle pool threads are not counted; runnable threads well
+above the budget are oversubscription (a couple over it are joblib's thread-pool handler
+threads, briefly runnable while a pool starts). The column checks the budget even on a machine with too
+few cores to show a speedup (run with --force there): the demand shows up as runnable
+threads queueing for the core.
+
+    python benchmarks/bench_thread_budget.py                # 4, 8 and 16 cores
+    python benchmarks/bench_thread_budget.py --cores 2 4    # custom core counts
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'test2.py')
+DATA = os.path.join(ROOT, 'cleaned_animal_disease_prediction.csv')
+
+
+def runnable_threads(pid):
+    """Runnable threads of pid and all its descendants (Linux /proc), or None where /proc is unavailable"""
+    if not os.path.isdir('/proc'):
+        return None
+    runnable, stack = 0, [pid]
+    while stack:
+        proc = stack.pop()
+        try:
+            tasks = os.listdir(f'/proc/{proc}/task')
+        except OSError:
+            continue                    # exited meanwhile
+        for task in tasks:
+            try:
+                with open(f'/proc/{proc}/task/{task}/stat') as f:
+                    # the state follows the parenthesised command name, which may contain spaces
+                    runnable += f.read().rsplit(')', 1)[1].split()[0] == 'R'
+                with open(f'/proc/{proc}/task/{task}/children') as f:
+                    stack.extend(int(c) for c in f.read().split())
+            except (OSError, IndexError):
+                continue
+    return runnable
+
+def run_training(workdir, cpu_budget, species_workers, sample_seconds=0.05):
+    """(wall seconds, peak runnable threads in the trainer's process tree or None)"""
+    # --skip-profile: time training only, not the serving-cost report that follows it by default
+    env = dict(os.environ, PYTHONWARNINGS='ignore')
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, SCRIPT, '--data', DATA, '--full-retrain',
+                             '--cpu-budget', str(cpu_budget), '--species-workers', str(species_workers),
+                             '--skip-profile'],
+                            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    peak = [0]
+
+    def sample():
+        # sampling runs in this (otherwise idle) process and is never counted: it is not in the trainer's tree
+        while proc.poll() is None:
+            threads = runnable_threads(proc.pid)
+            if threads is None:
+                peak[0] = None
+                return
+            peak[0] = max(peak[0], threads)
+            time.sleep(sample_seconds)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    returncode = proc.wait()
+    seconds = time.perf_counter() - t0
+    sampler.join()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, proc.args)
+    return seconds, peak[0]
+
+
+def layouts(cores):
+    """(species_workers, threads each) splits of a budget: all threads in one trainer, pairs, one per species"""
+    seen = []
+    for workers in (1, max(1, cores // 2), cores):
+        if workers not in seen:
+            seen.append(workers)
+    return [(w, max(1, cores // w)) for w in seen]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cores', type=int, nargs='+', default=[4, 8, 16])
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--force', action='store_true', help='also run budgets larger than this machine has')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    available = os.cpu_count() or 1
+    workdir = tempfile.mkdtemp(prefix='bench_threads_')
+    results = {'available_cores': available, 'runs': []}
+    try:
+        run_training(workdir, 1, 1)  # warm the preprocessing cache so every timed run trains only
+        serial = [run_training(workdir, 1, 1) for _ in range(args.repeats)]
+        baseline = min(secs for secs, _ in serial)
+        results['serial_seconds'] = baseline
+        results['serial_peak_runnable_threads'] = serial[0][1]
+        print(f"machine cores: {available}; serial single-thread training: {baseline:.1f}s, "
+              f"peak runnable threads {serial[0][1]}\n")
+        print(f"{'budget':>6} {'workers':>7} {'threads':>7} {'seconds':>8} {'speedup':>8} {'peak run':>8}")
+        for cores in args.cores:
+            if cores > available and not args.force:
+                print(f"{cores:>6}  skipped (only {available} cores here; --force to oversubscribe)")
+                continue
+            for workers, threads in layouts(cores):
+                runs = [run_training(workdir, cores, workers) for _ in range(args.repeats)]
+                secs = min(s for s, _ in runs)
+                peak = max((p for _, p in runs), default=None, key=lambda p: p or 0)
+                results['runs'].append({'cpu_budget': cores, 'species_workers': workers,
+                                        'threads_per_worker': threads, 'seconds': secs,
+                                        'speedup': baseline / secs, 'peak_runnable_threads': peak})
+                print(f"{cores:>6} {workers:>7} {threads:>7} {secs:>8.1f} {baseline / secs:>7.2f}x {peak!s:>8}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
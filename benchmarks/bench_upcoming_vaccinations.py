@@ -0,0 +1,195 @@
+"""
+Upcoming-vaccination count in /api/dashboard_data: per-animal queries vs one counted join.
+
+The route used to list the farmer's animals and then query each animal's vaccinations,
+parsing every next_due_date in Python (1 + N round trips). DB.count_upcoming_vaccinations
+asks PostgREST for the count of vaccinations joined to the farmer's animals inside the
+30-day window (1 round trip, no rows transferred).
+
+A local PostgREST stand-in serves the animals and vaccinations tables from memory and
+understands the filters both versions send (eq/gte/lte, !inner embeds, Prefer: count).
+Both run through the real supabase client on the pooled transport; --rtt-ms adds an
+emulated network round trip to every request.
+
+    python benchmarks/bench_upcoming_vaccinations.py
+    python benchmarks/bench_upcoming_vaccinations.py --herds 100 1000 5000 --rtt-ms 30
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+from dateutil import parser as date_parser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from supabase_http import create_pooled_client, make_http_client  # noqa: E402
+
+FARMER_ID = 1
+VACCINATIONS_PER_ANIMAL = 3
+
+
+# --- stand-in server -------------------------------------------------------
+class Tables:
+    def __init__(self, herd, seed=0):
+        rng = random.Random(seed)
+        today = date.today()
+        # the farmer's herd plus another farmer's animals, which must not be counted
+        self.animals = [{'id': i, 'user_id': FARMER_ID if i <= herd else 2, 'animal_type': 'Cow'}
+                        for i in range(1, 2 * herd + 1)]
+        self.vaccinations = [
+            {'id': n * VACCINATIONS_PER_ANIMAL + k + 1, 'animal_id': a['id'], 'vaccine_name': 'FMD',
+             'next_due_date': (today + timedelta(days=rng.randint(-90, 90))).isoformat()}
+            for n, a in enumerate(self.animals) for k in range(VACCINATIONS_PER_ANIMAL)
+        ]
+        self.by_id = {a['id']: a for a in self.animals}
+
+    def rows(self, table, params):
+        """params: (key, value) query pairs; a column may be filtered more than once"""
+        rows = getattr(self, table)
+        if any(key == 'select' and 'animals!inner' in value for key, value in params):
+            rows = [dict(r, animals={'user_id': self.by_id[r['animal_id']]['user_id']}) for r in rows]
+        for key, value in params:
+            if key in ('select', 'order', 'limit', 'offset'):
+                continue
+            op, _, operand = value.partition('.')
+            rows = [r for r in rows if self._match(self._field(r, key), op, operand)]
+        return rows
+
+    @staticmethod
+    def _field(row, key):
+        for part in key.split('.'):
+            row = row.get(part) if isinstance(row, dict) else None
+        return row
+
+    @staticmethod
+    def _match(field, op, operand):
+        if field is None:
+            return False
+        field = str(field)
+        if op == 'eq':
+            return field == operand
+        if op == 'gte':
+            return field >= operand
+        if op == 'lte':
+            return field <= operand
+        raise ValueError(f'unsupported operator {op}')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True     # headers and body are separate writes
+
+    def _respond(self, with_body):
+        server = self.server
+        server.requests += 1
+        time.sleep(server.rtt)
+        url = urlsplit(self.path)
+        rows = server.tables.rows(url.path.rsplit('/', 1)[-1], parse_qsl(url.query))
+        body = json.dumps(rows).encode() if with_body else b''
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if 'count=exact' in self.headers.get('Prefer', ''):
+            self.send_header('Content-Range', f"{'0-%d' % (len(rows) - 1) if rows and with_body else '*'}/{len(rows)}")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def log_message(self, *args):
+        pass
+
+
+# --- the two versions of the count -------------------------------------------
+def per_animal_queries(client, user_id):
+    """The old /api/dashboard_data loop"""
+    upcoming = 0
+    today = datetime.utcnow().date()
+    thirty_days_later = today + timedelta(days=30)
+    animals = client.table('animals').select('*').eq('user_id', user_id).execute().data
+    for animal in animals:
+        vaccinations = client.table('vaccinations').select('*').eq('animal_id', animal['id']) \
+            .order('vaccination_date', desc=True).execute().data
+        for vacc in vaccinations:
+            next_due = vacc.get('next_due_date')
+            if next_due and today <= date_parser.parse(next_due).date() <= thirty_days_later:
+                upcoming += 1
+    return upcoming
+
+def counted_join(client, user_id):
+    """DB.count_upcoming_vaccinations"""
+    today = datetime.utcnow().date()
+    due_by = today + timedelta(days=30)
+    response = client.table('vaccinations').select('id, animals!inner(user_id)', count='exact', head=True) \
+        .eq('animals.user_id', user_id).gte('next_due_date', today.isoformat()) \
+        .lte('next_due_date', due_by.isoformat()).execute()
+    return response.count or 0
+
+VERSIONS = {'per-animal': per_animal_queries, 'counted-join': counted_join}
+
+
+def time_version(server, client, fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        server.requests = 0
+        t0 = time.perf_counter()
+        count = fn(client, FARMER_ID)
+        timings.append((time.perf_counter() - t0) * 1000.0)
+    return count, server.requests, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--herds', type=int, nargs='+', default=[10, 100, 500, 2000], help='animals per farmer')
+    parser.add_argument('--rtt-ms', type=float, default=5.0, help='emulated network round trip')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    server.rtt = args.rtt_ms / 1000.0
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    client, http = create_pooled_client(url, 'bench-key', http_client=make_http_client(http2=False))
+
+    results = {'rtt_ms': args.rtt_ms, 'vaccinations_per_animal': VACCINATIONS_PER_ANIMAL, 'herds': {}}
+    print(f"{VACCINATIONS_PER_ANIMAL} vaccinations per animal, emulated RTT {args.rtt_ms:g} ms, "
+          f"best of {args.repeats}\n")
+    print(f"{'herd':>6} {'version':<13} {'requests':>8} {'best ms':>9} {'mean ms':>9} {'count':>6}")
+    for herd in args.herds:
+        server.tables = Tables(herd)
+        counts = set()
+        results['herds'][herd] = {}
+        for name, fn in VERSIONS.items():
+            count, requests, timings = time_version(server, client, fn, args.repeats)
+            counts.add(count)
+            results['herds'][herd][name] = {'count': count, 'requests': requests,
+                                            'best_ms': min(timings), 'mean_ms': float(np.mean(timings))}
+            print(f"{herd:>6} {name:<13} {requests:>8} {min(timings):>9.1f} {np.mean(timings):>9.1f} {count:>6}")
+        if len(counts) != 1:
+            raise SystemExit(f"versions disagree for a herd of {herd}: {sorted(counts)}")
+    http.close()
+    server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
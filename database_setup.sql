@@ -175,7 +175,10 @@ CREATE INDEX IF NOT EXISTS idx_predictions_animal_id ON predictions(animal_id);
 
 CREATE INDEX IF NOT EXISTS idx_vaccinations_animal_id ON vaccinations(animal_id);
 CREATE INDEX IF NOT EXISTS idx_vaccinations_vet_id ON vaccinations(vet_id);
+CREATE INDEX IF NOT EXISTS idx_vaccinations_vet_animal ON vaccinations(vet_id, animal_id);
+CREATE INDEX IF NOT EXISTS idx_vaccinations_vet_page ON vaccinations(vet_id, vaccination_date DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_vaccinations_date ON vaccinations(vaccination_date DESC);
+CREATE INDEX IF NOT EXISTS idx_vaccinations_next_due ON vaccinations(next_due_date);
 
 CREATE INDEX IF NOT EXISTS idx_animal_diseases_animal_id ON animal_diseases(animal_id);
 CREATE INDEX IF NOT EXISTS idx_animal_diseases_vet_id ON animal_diseases(diagnosed_by_vet_id);
@@ -189,6 +192,23 @@ CREATE INDEX IF NOT EXISTS idx_appointments_status ON vet_appointments(status);
 CREATE INDEX IF NOT EXISTS idx_diseases_name ON diseases(name);
 CREATE INDEX IF NOT EXISTS idx_diseases_severity ON diseases(severity);
 
+-- ============================================
+-- PART 3B: AGGREGATE FUNCTIONS (called through supabase.rpc)
+-- ============================================
+
+-- Vet dashboard statistics in one round trip (DB.get_vet_stats); the distinct count
+-- is answered from idx_vaccinations_vet_animal without sending rows to the app
+CREATE OR REPLACE FUNCTION vet_stats(p_vet_id INTEGER)
+RETURNS TABLE (total_vaccinations BIGINT, total_diagnoses BIGINT, unique_animals BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        (SELECT COUNT(*) FROM vaccinations WHERE vet_id = p_vet_id),
+        (SELECT COUNT(*) FROM animal_diseases WHERE diagnosed_by_vet_id = p_vet_id),
+        (SELECT COUNT(DISTINCT animal_id) FROM vaccinations WHERE vet_id = p_vet_id);
+$$;
+
+GRANT EXECUTE ON FUNCTION vet_stats(INTEGER) TO anon, authenticated;
+
 -- ============================================
 -- PART 4: ROW LEVEL SECURITY POLICIES
 -- ============================================
@@ -0,0 +1,619 @@
+"""
+Embedded SQLite backend exposing the part of the supabase-py client API that the app uses.
+
+With DB_BACKEND=sqlite, app.py builds a LocalClient in place of the Supabase client, so every
+DB.* and User.* method runs unchanged against a local database file: offline deployments
+need no network and load tests never touch the hosted project.
+
+The schema is read from database_setup.sql:
+
+- CREATE TABLE / CREATE INDEX statements are translated to SQLite types and applied on every
+  start (they are IF NOT EXISTS, so new indexes reach existing files)
+- the sample rows (INSERT ... ON CONFLICT) are loaded into a new database
+- `LANGUAGE sql` functions returning a table become rpc() calls
+- Postgres-only statements (row level security, comments, DO blocks) are skipped
+
+Query builder surface: select (columns, many-to-one embeds with !inner and !<fkey> hints,
+filters on embedded columns, count='exact', head=True), insert (one row or a list), update,
+delete, eq/neq/gt/gte/lt/lte/like/ilike/in_/is_, or_ (nested and()/or()), order (nullsfirst),
+limit, offset, range and rpc. JSONB columns round-trip JSON values and BOOLEAN columns come
+back as bools, as they do through PostgREST. Errors are raised as postgrest's APIError with
+Postgres-style codes (23xxx constraint violations, PGRST202 unknown function), so error
+handling written for Supabase behaves the same here.
+
+Each thread gets its own connection; the file runs in WAL mode so readers don't block the
+writer. Use a file path: ':memory:' would give every thread its own empty database.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+
+try:
+    from postgrest.exceptions import APIError
+except Exception:
+    class APIError(Exception):
+        def __init__(self, error):
+            self.message = error.get('message')
+            self.code = error.get('code')
+            self.hint = error.get('hint')
+            self.details = error.get('details')
+            Exception.__init__(self, f"{self.code}: {self.message}")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(ROOT, 'database_setup.sql')
+BUSY_TIMEOUT = 5.0             # seconds a writer waits for the database lock
+
+# Postgres DDL -> SQLite (applied in order)
+DDL_REWRITES = [
+    (r'\bSERIAL PRIMARY KEY\b', 'INTEGER PRIMARY KEY AUTOINCREMENT'),
+    (r'\bTIMESTAMP WITH TIME ZONE\b', 'TEXT'),
+    (r'\bVARCHAR\(\d+\)', 'TEXT'),
+    (r'\bJSONB\b', 'TEXT'),
+    (r'\bDEFAULT NOW\(\)', "DEFAULT (STRFTIME('%Y-%m-%dT%H:%M:%f+00:00', 'now'))"),
+]
+SKIPPED_STATEMENTS = ('ALTER ', 'DROP POLICY', 'CREATE POLICY', 'COMMENT ', 'DO ', 'SELECT ', 'GRANT ')
+
+OPERATORS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=', 'like': 'GLOB', 'ilike': 'LIKE'}
+
+SQLITE_ERROR_CODES = [         # sqlite3 message fragment -> Postgres SQLSTATE
+    ('UNIQUE constraint', '23505'),
+    ('FOREIGN KEY constraint', '23503'),
+    ('NOT NULL constraint', '23502'),
+    ('CHECK constraint', '23514'),
+    ('no such column', '42703'),
+    ('no such table', '42P01'),
+    ('has no column named', '42703'),
+    ('database is locked', '55P03'),      # busy_timeout ran out: lock_not_available, worth retrying
+]
+
+
+def like_to_glob(pattern):
+    """Postgres LIKE pattern as a (case-sensitive) GLOB; SQLite's own LIKE ignores ASCII case"""
+    glob, escaped = [], False
+    for ch in pattern:
+        if escaped:
+            glob.append(f'[{ch}]' if ch in '*?[' else ch)
+            escaped = False
+        elif ch == '\\':
+            escaped = True
+        elif ch in '%_':
+            glob.append('*' if ch == '%' else '?')
+        else:
+            glob.append(f'[{ch}]' if ch in '*?[' else ch)
+    return ''.join(glob)
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+@contextmanager
+def transaction(conn):
+    # connections run in autocommit mode; take the write lock up front so the statements apply atomically
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+def api_error(exc):
+    message = str(exc)
+    code = next((code for fragment, code in SQLITE_ERROR_CODES if fragment in message), 'XX000')
+    return APIError({'code': code, 'message': message, 'hint': None, 'details': 'sqlite'})
+
+
+# --- schema ------------------------------------------------------------------
+def split_sql(script):
+    """Statements of a Postgres script: '--' comments dropped, ';' inside quotes and $$ bodies kept"""
+    statements, buf, i, n = [], [], 0, len(script)
+    in_quote = in_dollar = False
+    while i < n:
+        if in_dollar:
+            if script.startswith('$$', i):
+                in_dollar = False
+                buf.append('$$')
+                i += 2
+            else:
+                buf.append(script[i])
+                i += 1
+            continue
+        c = script[i]
+        if c == "'":
+            in_quote = not in_quote     # '' escapes toggle twice
+        elif not in_quote and script.startswith('$$', i):
+            in_dollar = True
+            buf.append('$$')
+            i += 2
+            continue
+        elif not in_quote and script.startswith('--', i):
+            end = script.find('\n', i)
+            i = n if end < 0 else end
+            continue
+        elif not in_quote and c == ';':
+            statement = ''.join(buf).strip()
+            if statement:
+                statements.append(statement)
+            buf = []
+            i += 1
+            continue
+        buf.append(c)
+        i += 1
+    statement = ''.join(buf).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+FUNCTION_RE = re.compile(
+    r'CREATE\s+(?:OR\s+REPLACE\s+)?FUNCTION\s+(\w+)\s*\(([^)]*)\)\s*RETURNS\s+TABLE\s*\(([^)]*)\)'
+    r'.*?LANGUAGE\s+sql.*?AS\s+\$\$(.*?)\$\$', re.S | re.I)
+
+def parse_function(statement):
+    """(name, parameter names, result column names, SQLite body) of a `LANGUAGE sql` table function, else None"""
+    match = FUNCTION_RE.match(statement)
+    if not match:
+        return None
+    name, params, returns, body = match.groups()
+    param_names = [p.split()[0] for p in params.split(',') if p.strip()]
+    columns = [c.split()[0] for c in returns.split(',') if c.strip()]
+    for param in param_names:
+        body = re.sub(rf'\b{param}\b', f':{param}', body)
+    return name, param_names, columns, body.strip().rstrip(';')
+
+
+# --- select parsing ------------------------------------------------------------
+def split_top_level(text, sep=','):
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(text):
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+def parse_select(columns):
+    """'*, users!animals_user_id_fkey(name, email)' -> (['*'], [('users', hint, inner, ['name', 'email'])])"""
+    plain, embeds = [], []
+    for item in split_top_level(columns or '*'):
+        match = re.match(r'^(\w+)((?:!\w+)*)\((.*)\)$', item, re.S)
+        if not match:
+            plain.append(item)
+            continue
+        name, modifiers, inner_columns = match.groups()
+        modifiers = [m for m in modifiers.split('!') if m]
+        inner_columns = split_top_level(inner_columns)
+        if any('(' in c for c in inner_columns):
+            raise APIError({'code': 'PGRST100', 'message': f'nested embeds are not supported locally: {item}',
+                            'hint': None, 'details': 'sqlite'})
+        hint = next((m for m in modifiers if m != 'inner'), None)
+        embeds.append((name, hint, 'inner' in modifiers, inner_columns or ['*']))
+    return plain or ['*'], embeds
+
+def parse_logic_tree(filters):
+    """PostgREST or=/and= syntax 'a.lt.1,and(b.eq.2,c.lt.3)' -> [('a', 'lt', '1'), ('and', [...])]"""
+    nodes = []
+    for part in split_top_level(filters):
+        match = re.match(r'^(and|or)\((.*)\)$', part, re.S)
+        if match:
+            nodes.append((match.group(1), parse_logic_tree(match.group(2))))
+        else:
+            column, op, value = part.split('.', 2)
+            nodes.append((column, op, value))
+    return nodes
+
+
+class LocalResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class LocalQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = 'select'
+        self.columns = '*'
+        self.count_method = None
+        self.head = False
+        self.payload = None
+        self.returning = 'representation'
+        self.filters = []              # ('cond', column, op, value) | ('or'/'and', tree)
+        self.orders = []
+        self.limit_ = None
+        self.offset_ = None
+
+    # actions
+    def select(self, *columns, count=None, head=None):
+        self.action = 'select'
+        self.columns = ','.join(columns) or '*'
+        self.count_method = count
+        self.head = bool(head)
+        return self
+
+    def insert(self, json, *, count=None, returning='representation', upsert=False, default_to_null=True):
+        if upsert:
+            raise APIError({'code': 'PGRST100', 'message': 'upsert is not supported locally', 'hint': None,
+                            'details': 'sqlite'})
+        self.action, self.payload, self.returning = 'insert', json, str(getattr(returning, 'value', returning))
+        return self
+
+    def update(self, json, *, count=None, returning='representation'):
+        self.action, self.payload, self.returning = 'update', json, str(getattr(returning, 'value', returning))
+        return self
+
+    def delete(self, *, count=None, returning='representation'):
+        self.action, self.returning = 'delete', str(getattr(returning, 'value', returning))
+        return self
+
+    # filters
+    def filter(self, column, operator, criteria):
+        self.filters.append(('cond', column, operator, criteria))
+        return self
+
+    def eq(self, column, value):
+        return self.filter(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self.filter(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self.filter(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self.filter(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self.filter(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self.filter(column, 'lte', value)
+
+    def like(self, column, pattern):
+        return self.filter(column, 'like', pattern)
+
+    def ilike(self, column, pattern):
+        return self.filter(column, 'ilike', pattern)
+
+    def in_(self, column, values):
+        return self.filter(column, 'in', list(values))
+
+    def is_(self, column, value):
+        return self.filter(column, 'is', value)
+
+    def or_(self, filters, reference_table=None):
+        self.filters.append(('or', parse_logic_tree(filters)))
+        return self
+
+    # modifiers
+    def order(self, column, *, desc=False, nullsfirst=None, foreign_table=None):
+        self.orders.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        self.limit_ = size
+        return self
+
+    def offset(self, size):
+        self.offset_ = size
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        self.offset_, self.limit_ = start, end - start + 1
+        return self
+
+    def execute(self):
+        try:
+            return getattr(self, f'_{self.action}')()
+        except sqlite3.Error as e:
+            raise api_error(e) from e
+
+    # --- SQL generation ------------------------------------------------------
+    def _joins(self, embeds):
+        """FROM clause and {embed name: (alias, target table, marker column)}"""
+        sql = [f'"{self.table}" AS t']
+        aliases = {}
+        for n, (name, hint, inner, _) in enumerate(embeds):
+            column, ref_column = self.client.relation(self.table, name, hint)
+            alias = f'e{n}'
+            sql.append(f'{"JOIN" if inner else "LEFT JOIN"} "{name}" AS {alias} '
+                       f'ON {alias}."{ref_column}" = t."{column}"')
+            aliases[name] = (alias, ref_column)
+        return ' '.join(sql), aliases
+
+    def _column(self, column, aliases):
+        if '.' in column:
+            name, column = column.split('.', 1)
+            if name not in aliases:
+                raise APIError({'code': 'PGRST108', 'message': f'{name} is not embedded in the select',
+                                'hint': None, 'details': 'sqlite'})
+            return f'{aliases[name][0]}."{column}"'
+        return f't."{column}"'
+
+    def _condition(self, column, op, value, aliases, params):
+        target = self._column(column, aliases)
+        if op == 'in':
+            values = value if isinstance(value, list) else value.strip('()').split(',')
+            if not values:
+                return '0'
+            params.extend(self.client.to_sql(v) for v in values)
+            return f'{target} IN ({", ".join("?" * len(values))})'
+        if op == 'is':
+            keyword = {None: 'NULL', 'null': 'NULL', True: 'TRUE', 'true': 'TRUE', False: 'FALSE',
+                       'false': 'FALSE'}[value if not isinstance(value, str) else value.lower()]
+            return f'{target} IS {keyword}'
+        if op not in OPERATORS:
+            raise APIError({'code': 'PGRST100', 'message': f'unsupported operator {op}', 'hint': None,
+                            'details': 'sqlite'})
+        if op in ('like', 'ilike'):
+            value = str(value).replace('*', '%')
+            if op == 'like':
+                value = like_to_glob(value)
+            else:
+                params.append(self.client.to_sql(value))
+                return f"{target} LIKE ? ESCAPE '\\'"
+        elif isinstance(value, str) and value in ('true', 'false'):
+            value = value == 'true'
+        params.append(self.client.to_sql(value))
+        return f'{target} {OPERATORS[op]} ?'
+
+    def _tree(self, nodes, joiner, aliases, params):
+        parts = []
+        for node in nodes:
+            if node[0] in ('and', 'or') and len(node) == 2:
+                parts.append(self._tree(node[1], node[0].upper(), aliases, params))
+            else:
+                parts.append(self._condition(*node, aliases, params))
+        return '(' + f' {joiner} '.join(parts) + ')'
+
+    def _where(self, aliases):
+        clauses, params = [], []
+        for f in self.filters:
+            if f[0] == 'cond':
+                clauses.append(self._condition(f[1], f[2], f[3], aliases, params))
+            else:
+                clauses.append(self._tree(f[1], f[0].upper(), aliases, params))
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def _order_limit(self, aliases):
+        sql = ''
+        if self.orders:
+            # Postgres puts NULLs last ascending and first descending unless told otherwise
+            sql += ' ORDER BY ' + ', '.join(
+                f'{self._column(c, aliases)} {"DESC" if desc else "ASC"} '
+                f'NULLS {"FIRST" if (desc if nullsfirst is None else nullsfirst) else "LAST"}'
+                for c, desc, nullsfirst in self.orders)
+        if self.limit_ is not None or self.offset_ is not None:
+            sql += f' LIMIT {int(self.limit_) if self.limit_ is not None else -1}'
+            if self.offset_:
+                sql += f' OFFSET {int(self.offset_)}'
+        return sql
+
+    def _select(self):
+        plain, embeds = parse_select(self.columns)
+        from_sql, aliases = self._joins(embeds)
+        where, params = self._where(aliases)
+        conn = self.client.connection()
+        count = None
+        if self.count_method:
+            count = conn.execute(f'SELECT COUNT(*) FROM {from_sql}{where}', params).fetchone()[0]
+        if self.head:
+            return LocalResponse([], count)
+
+        select = ['t.*' if c == '*' else f't."{c}"' for c in plain]
+        for n, (name, _, _, inner_columns) in enumerate(embeds):
+            alias, marker = aliases[name]
+            if inner_columns == ['*']:
+                inner_columns = self.client.table_columns(name)
+            select.append(f'{alias}."{marker}" AS "__{n}__"')
+            select += [f'{alias}."{c}" AS "__{n}_{c}"' for c in inner_columns]
+        cursor = conn.execute(f'SELECT {", ".join(select)} FROM {from_sql}{where}{self._order_limit(aliases)}', params)
+        names = [d[0] for d in cursor.description]
+        data = []
+        for values in cursor:
+            row, nested = {}, {}
+            for key, value in zip(names, values):
+                match = re.match(r'^__(\d+)_(_|\w+)$', key)
+                if match:
+                    nested.setdefault(int(match.group(1)), {})[match.group(2)] = value
+                else:
+                    row[key] = value
+            row = self.client.from_sql(self.table, row)
+            for n, (name, *_rest) in enumerate(embeds):
+                fields = nested.get(n, {})
+                present = fields.pop('_', None) is not None
+                row[name] = self.client.from_sql(name, fields) if present else None
+            data.append(row)
+        return LocalResponse(data, count)
+
+    def _matching_rowids(self, conn):
+        where, params = self._where({})
+        return [r[0] for r in conn.execute(f'SELECT t.rowid FROM "{self.table}" AS t{where}', params)]
+
+    def _rows_by_rowid(self, conn, rowids):
+        if not rowids or self.returning == 'minimal':
+            return []
+        marks = ', '.join('?' * len(rowids))
+        rows = conn.execute(f'SELECT * FROM "{self.table}" WHERE rowid IN ({marks}) ORDER BY rowid', rowids)
+        return [self.client.from_sql(self.table, dict(r)) for r in rows]
+
+    def _insert(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        conn = self.client.connection()
+        rowids = []
+        with transaction(conn):
+            for row in rows:
+                row = self.client.to_sql_row(self.table, row)
+                columns = ', '.join(f'"{c}"' for c in row)
+                cursor = conn.execute(f'INSERT INTO "{self.table}" ({columns}) VALUES ({", ".join("?" * len(row))})',
+                                      list(row.values()))
+                rowids.append(cursor.lastrowid)
+        return LocalResponse(self._rows_by_rowid(conn, rowids))
+
+    def _update(self):
+        conn = self.client.connection()
+        row = self.client.to_sql_row(self.table, self.payload)
+        with transaction(conn):
+            rowids = self._matching_rowids(conn)
+            if rowids and row:
+                assignments = ', '.join(f'"{c}" = ?' for c in row)
+                conn.execute(f'UPDATE "{self.table}" SET {assignments} WHERE rowid IN ({", ".join("?" * len(rowids))})',
+                             list(row.values()) + rowids)
+        return LocalResponse(self._rows_by_rowid(conn, rowids))
+
+    def _delete(self):
+        conn = self.client.connection()
+        with transaction(conn):
+            rowids = self._matching_rowids(conn)
+            deleted = self._rows_by_rowid(conn, rowids)
+            if rowids:
+                conn.execute(f'DELETE FROM "{self.table}" WHERE rowid IN ({", ".join("?" * len(rowids))})', rowids)
+        return LocalResponse(deleted)
+
+
+class LocalRPC:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        if self.name not in self.client.functions:
+            raise APIError({'code': 'PGRST202', 'message': f'Could not find the function public.{self.name}',
+                            'hint': None, 'details': 'sqlite'})
+        param_names, columns, body = self.client.functions[self.name]
+        params = {p: self.client.to_sql(self.params.get(p)) for p in param_names}
+        try:
+            rows = self.client.connection().execute(body, params).fetchall()
+        except sqlite3.Error as e:
+            raise api_error(e) from e
+        return LocalResponse([dict(zip(columns, row)) for row in rows])
+
+
+class LocalClient:
+    """Drop-in for the supabase Client's table()/rpc() on an SQLite file"""
+
+    def __init__(self, path, schema_path=SCHEMA_PATH, sample_data=True):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.functions = {}            # name -> (parameter names, result columns, SQL)
+        self.column_kinds = {}         # table -> {column: 'boolean' | 'json'}
+        self.foreign_keys = {}         # table -> {column: (referenced table, referenced column)}
+        self._columns = {}
+        if os.path.dirname(os.path.abspath(path)):
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.apply_schema(schema_path, sample_data)
+
+    # --- connections ---------------------------------------------------------
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA foreign_keys = ON')
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.create_function('NOW', 0, utc_now)
+            self._local.conn = conn
+        return conn
+
+    # --- schema --------------------------------------------------------------
+    def apply_schema(self, schema_path, sample_data=True):
+        with open(schema_path, encoding='utf-8') as f:
+            statements = split_sql(f.read())
+        conn = self.connection()
+        new_database = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0] == 0
+        inserts = []
+        for statement in statements:
+            upper = statement.upper()
+            if upper.startswith('CREATE TABLE'):
+                self._record_column_kinds(statement)
+                for pattern, replacement in DDL_REWRITES:
+                    statement = re.sub(pattern, replacement, statement, flags=re.I)
+                conn.execute(statement)
+            elif upper.startswith('CREATE INDEX') or upper.startswith('CREATE UNIQUE INDEX'):
+                conn.execute(statement)
+            elif 'FUNCTION' in upper.split('(')[0]:
+                function = parse_function(statement)
+                if function:
+                    name, *definition = function
+                    self.functions[name] = tuple(definition)
+            elif upper.startswith('INSERT'):
+                inserts.append(statement)
+            elif not upper.startswith(SKIPPED_STATEMENTS):
+                print(f"local_db: skipping unsupported statement: {statement[:60]}...")
+        if new_database and sample_data:
+            with transaction(conn):
+                for statement in inserts:
+                    conn.execute(statement)
+        for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+            self._columns[table] = [r['name'] for r in conn.execute(f'PRAGMA table_info("{table}")')]
+            self.foreign_keys[table] = {r['from']: (r['table'], r['to'] or 'id')
+                                        for r in conn.execute(f'PRAGMA foreign_key_list("{table}")')}
+
+    def _record_column_kinds(self, statement):
+        table = re.match(r'CREATE TABLE (?:IF NOT EXISTS )?(\w+)', statement, re.I).group(1)
+        kinds = {}
+        for column, kind in re.findall(r'^\s*(\w+)\s+(BOOLEAN|JSONB)\b', statement, re.M | re.I):
+            kinds[column] = 'boolean' if kind.upper() == 'BOOLEAN' else 'json'
+        self.column_kinds[table] = kinds
+
+    def table_columns(self, table):
+        return self._columns[table]
+
+    def relation(self, table, target, hint=None):
+        """(column in `table`, column in `target`) of the many-to-one foreign key an embed follows"""
+        candidates = {col: ref for col, ref in self.foreign_keys.get(table, {}).items() if ref[0] == target}
+        if hint and hint.startswith(f'{table}_') and hint.endswith('_fkey'):
+            column = hint[len(table) + 1:-len('_fkey')]
+            candidates = {column: candidates[column]} if column in candidates else {}
+        if len(candidates) != 1:
+            raise APIError({'code': 'PGRST201' if candidates else 'PGRST200',
+                            'message': f"{'More than one' if candidates else 'No'} relationship between "
+                                       f"'{table}' and '{target}'",
+                            'hint': 'add a !<table>_<column>_fkey hint' if candidates else None,
+                            'details': 'sqlite'})
+        (column, (_, ref_column)), = candidates.items()
+        return column, ref_column
+
+    # --- values --------------------------------------------------------------
+    @staticmethod
+    def to_sql(value):
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+
+    def to_sql_row(self, table, row):
+        kinds = self.column_kinds.get(table, {})
+        return {c: json.dumps(v) if kinds.get(c) == 'json' and v is not None else self.to_sql(v)
+                for c, v in row.items()}
+
+    def from_sql(self, table, row):
+        for column, kind in self.column_kinds.get(table, {}).items():
+            value = row.get(column)
+            if value is None:
+                continue
+            row[column] = bool(value) if kind == 'boolean' else json.loads(value)
+        return row
+
+    # --- client surface ------------------------------------------------------
+    def table(self, name):
+        if name not in self._columns:
+            raise APIError({'code': '42P01', 'message': f'relation "{name}" does not exist', 'hint': None,
+                            'details': 'sqlite'})
+        return LocalQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None):
+        return LocalRPC(self, name, params)
@@ -0,0 +1,363 @@
+"""
+Online model updates from vet-confirmed diagnoses.
+
+test2.py trains every species from the static CSV. Between those runs, vets keep
+recording confirmed diagnoses (DB.add_diagnosis -> animal_diseases). This script pulls
+the diagnoses added since its checkpoint and joins each one with the animal's details
+and the inputs of its latest prediction, which together form a labelled row in the
+training CSV's schema. It then updates the published models of the affected species
+without refitting them from scratch:
+
+- RandomForest: ONLINE_RF_TREES more trees are grown (warm_start)
+- XGBoost / LightGBM: ONLINE_BOOST_ROUNDS more boosting rounds continue the saved booster
+
+The new trees are fitted on the species' original training split (replayed from the
+CSV, so every class the model knows is still present) plus the new cases, weighted
+by ONLINE_CASE_WEIGHT. The updated components go into the artifact store as a new
+model version, and the script reports how long each update took next to the species'
+last full training time.
+
+    python online_update.py                       # diagnoses since the checkpoint, from Supabase
+                                                  # (or the local database with DB_BACKEND=sqlite)
+    python online_update.py --cases cases.csv     # labelled rows in the training CSV's columns
+    python online_update.py --dry-run             # update and report, but store or publish nothing
+
+A test2.py run reuses the updated models of species whose CSV data is unchanged;
+--full-retrain starts again from the CSV alone.
+"""
+import argparse
+import copy
+import json
+import os
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from artifact_store import ArtifactStore
+import test2
+from test2 import (
+    CAT_COLS, KEEP_MODEL_VERSIONS, MODELS_DIR, VITAL_DEFAULTS, YESNO_COLS,
+    apply_scaler, categorical_indices, ensemble_proba, load_model_manifest, load_training_frame,
+    native_categorical_kwargs, parse_duration_to_days, parse_temperature, publish_model_manifest,
+    split_disease_rows, split_syndrome_rows, syndrome_label, top_k_accuracy, top_k_indices,
+)
+
+try:
+    from xgboost import XGBClassifier
+    XGB_AVAILABLE = True
+except Exception:
+    XGB_AVAILABLE = False
+
+try:
+    from lightgbm import LGBMClassifier
+    LGBM_AVAILABLE = True
+except Exception:
+    LGBM_AVAILABLE = False
+
+try:
+    from dotenv import load_dotenv
+    from supabase import create_client
+    SUPABASE_AVAILABLE = True
+except Exception:
+    SUPABASE_AVAILABLE = False
+
+# Settings
+ONLINE_CHECKPOINT_PATH = './models/online_checkpoint.json'
+ONLINE_RF_TREES = 50           # trees added to each random forest per update
+ONLINE_BOOST_ROUNDS = 20       # boosting rounds added to each XGBoost / LightGBM model per update
+ONLINE_CASE_WEIGHT = 5.0       # sample weight of a confirmed case relative to a replayed training row
+ONLINE_FETCH_PAGE = 1000       # diagnoses fetched per request
+
+# predict_for_animal's form fields -> training CSV columns (animal details come from the animals table)
+FORM_TO_CSV = {
+    'symptom1': 'Symptom_1', 'symptom2': 'Symptom_2', 'symptom3': 'Symptom_3', 'symptom4': 'Symptom_4',
+    'duration': 'Duration', 'body_temperature': 'Body_Temperature', 'heart_rate': 'Heart_Rate',
+    'appetite_loss': 'Appetite_Loss', 'vomiting': 'Vomiting', 'diarrhea': 'Diarrhea', 'coughing': 'Coughing',
+    'labored_breathing': 'Labored_Breathing', 'lameness': 'Lameness', 'skin_lesions': 'Skin_Lesions',
+    'nasal_discharge': 'Nasal_Discharge', 'eye_discharge': 'Eye_Discharge',
+}
+
+
+# Checkpoint: id of the last animal_diseases row folded into the models
+def load_checkpoint(path=ONLINE_CHECKPOINT_PATH):
+    if not os.path.exists(path):
+        return {'last_diagnosis_id': 0}
+    with open(path) as f:
+        return json.load(f)
+
+def save_checkpoint(checkpoint, path=ONLINE_CHECKPOINT_PATH):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+# Fetching labelled cases
+def supabase_client():
+    """The app's database: Supabase, or the local SQLite file when DB_BACKEND=sqlite (same as app.py)"""
+    if not SUPABASE_AVAILABLE:
+        raise RuntimeError("supabase and python-dotenv are needed to fetch diagnoses (or pass --cases)")
+    load_dotenv()
+    if os.getenv('DB_BACKEND', 'supabase').lower() == 'sqlite':
+        from local_db import LocalClient
+        return LocalClient(os.getenv('SQLITE_PATH', './data/pashucare.db'))
+    return create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'))
+
+def case_row(diagnosis, prediction_data):
+    """One training-CSV row from a diagnosis (with its animal and disease) and the inputs of a prediction"""
+    animal = diagnosis.get('animals') or {}
+    row = {
+        'Animal_Type': animal.get('animal_type'),
+        'Breed': prediction_data.get('breed') or animal.get('breed'),
+        'Age': animal.get('age'),
+        'Gender': animal.get('gender'),
+        'Weight': animal.get('weight'),
+        'Disease_Prediction': (diagnosis.get('diseases') or {}).get('name'),
+    }
+    for field, col in FORM_TO_CSV.items():
+        row[col] = prediction_data.get(field)
+    return row
+
+def fetch_confirmed_cases(client, after_id=0, page_size=ONLINE_FETCH_PAGE):
+    """Diagnoses recorded after `after_id`, each joined with its animal and the latest prediction made for
+       that animal before the diagnosis. Returns (cases frame in the CSV schema, last diagnosis id seen,
+       number of diagnoses without a prediction to take symptoms from)."""
+    diagnoses = []
+    last_id = after_id
+    while True:
+        response = (client.table('animal_diseases')
+                    .select('id, animal_id, created_at, diseases(name), animals(animal_type, breed, age, gender, weight)')
+                    .gt('id', last_id).order('id').limit(page_size).execute())
+        batch = response.data or []
+        diagnoses.extend(batch)
+        if batch:
+            last_id = batch[-1]['id']
+        if len(batch) < page_size:
+            break
+    if not diagnoses:
+        return pd.DataFrame(), last_id, 0
+
+    animal_ids = sorted({d['animal_id'] for d in diagnoses})
+    response = (client.table('predictions').select('animal_id, prediction_data, created_at')
+                .in_('animal_id', animal_ids).order('created_at', desc=True).execute())
+    predictions = {}
+    for p in response.data or []:
+        predictions.setdefault(p['animal_id'], []).append(p)   # newest first
+
+    rows, missing = [], 0
+    for d in diagnoses:
+        earlier = [p for p in predictions.get(d['animal_id'], []) if p['created_at'] <= d['created_at']]
+        if not earlier:
+            missing += 1
+            continue
+        data = earlier[0]['prediction_data']
+        rows.append(case_row(d, json.loads(data) if isinstance(data, str) else (data or {})))
+    return pd.DataFrame(rows), last_id, missing
+
+def prepare_cases(cases):
+    """Parse raw case fields the way test2.preprocess_frame does; categoricals stay as strings"""
+    df = cases.copy()
+    for c in YESNO_COLS:
+        df[c] = df[c].map(lambda v: 1 if str(v).strip().lower() in ('yes', '1', 'true') else 0)
+    df['Duration_days'] = df['Duration'].apply(parse_duration_to_days).fillna(VITAL_DEFAULTS['Duration_days'])
+    df['Body_Temperature'] = df['Body_Temperature'].apply(parse_temperature).fillna(VITAL_DEFAULTS['Body_Temperature'])
+    df['Heart_Rate'] = pd.to_numeric(df['Heart_Rate'], errors='coerce').fillna(VITAL_DEFAULTS['Heart_Rate'])
+    df['Age'] = pd.to_numeric(df['Age'], errors='coerce').fillna(0).astype(float)
+    df['Weight'] = pd.to_numeric(df['Weight'], errors='coerce').fillna(0).astype(float)
+    df['Syndrome_Label'] = df.apply(syndrome_label, axis=1)
+    for c in CAT_COLS:
+        df[c] = df[c].astype(str)
+    return df[df['Animal_Type'].notna() & df['Disease_Prediction'].notna()]
+
+def encode_categoricals(df, label_encoders):
+    """Label-encode with a species' stored encoders; unseen values map to 0 as in app.py"""
+    df = df.copy()
+    for c in CAT_COLS:
+        le = label_encoders.get(c)
+        index = {v: i for i, v in enumerate(le.classes_)} if le is not None else {}
+        df[c] = df[c].map(lambda v: index.get(v, 0))
+    return df
+
+
+# Growing saved models
+def grow_model(model, X, y, weights, lgbm_fit_kwargs):
+    """Add trees / boosting rounds to a fitted model; returns (model, grown?). The update set must
+       contain exactly the classes the model was trained on, so the new trees line up with the old ones."""
+    if set(np.unique(y)) != set(np.asarray(model.classes_).tolist()):
+        return model, False
+    if isinstance(model, RandomForestClassifier):
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + ONLINE_RF_TREES)
+        with warnings.catch_warnings():
+            # 'balanced' class weights are safe here: the update set replays the whole training split
+            warnings.simplefilter('ignore', UserWarning)
+            model.fit(X, y, sample_weight=weights)
+        model.set_params(warm_start=False)
+        return model, True
+    if XGB_AVAILABLE and isinstance(model, XGBClassifier):
+        grown = XGBClassifier(**dict(model.get_params(), n_estimators=ONLINE_BOOST_ROUNDS))
+        grown.fit(X, y, sample_weight=weights, xgb_model=model.get_booster())
+        return grown, True
+    if LGBM_AVAILABLE and isinstance(model, LGBMClassifier):
+        grown = LGBMClassifier(**dict(model.get_params(), n_estimators=ONLINE_BOOST_ROUNDS))
+        grown.fit(X, y, sample_weight=weights, init_model=model.booster_, **lgbm_fit_kwargs)
+        return grown, True
+    # calibrated wrappers would need their calibrators refitted too; they wait for a full retrain
+    return model, False
+
+def held_out_top3(models, X, y, n_classes):
+    if len(y) == 0 or not models:
+        return None
+    return top_k_accuracy(y, top_k_indices(ensemble_proba(models, X, n_classes), k=3), k=3)
+
+def update_species(animal, entry, base, cases, store):
+    """Grow one species' syndrome classifier and disease ensembles on replayed training rows plus
+       `cases`. Returns (syndrome bundle, disease models, report); nothing is written."""
+    artifacts, syndrome_bundle = copy.deepcopy(store.load_entry(entry))
+    feature_cols = entry['feature_columns']
+    cat_idx = categorical_indices(feature_cols, entry.get('tree_native', False))
+    _, lgbm_fit_kwargs = native_categorical_kwargs(cat_idx, len(feature_cols))
+    cases = encode_categoricals(cases, artifacts['label_encoders_cat'])
+    report = {'cases': int(len(cases)), 'used': 0, 'unseen_disease': 0, 'grown': 0, 'kept': 0, 'syndromes': {}}
+
+    # syndrome classifier: replay its training split
+    le_synd = syndrome_bundle['label_encoder']
+    X_train_s, _, _, y_train_s, _, _ = split_syndrome_rows(base[feature_cols], le_synd.transform(base['Syndrome_Label'].astype(str)))
+    known = cases['Syndrome_Label'].isin(le_synd.classes_)
+    if known.any():
+        X = apply_scaler(syndrome_bundle['scaler'], pd.concat([X_train_s, cases.loc[known, feature_cols]]))
+        y = np.concatenate([y_train_s, le_synd.transform(cases.loc[known, 'Syndrome_Label'])])
+        w = np.concatenate([np.ones(len(y_train_s)), np.full(int(known.sum()), ONLINE_CASE_WEIGHT)])
+        syndrome_bundle['classifier'], grown = grow_model(syndrome_bundle['classifier'], X, y, w, lgbm_fit_kwargs)
+        report['grown' if grown else 'kept'] += 1
+
+    disease_models = artifacts['disease_models']
+    for synd, new_rows in cases.groupby('Syndrome_Label'):
+        info = disease_models.get(synd)
+        if not info or info.get('type') != 'ensemble' or not info['models']:
+            report['unseen_disease'] += len(new_rows)
+            continue
+        le_d = info['label_encoder']
+        classes = set(le_d.classes_)
+        # labels merged into 'Other' at training time land there too
+        labels = new_rows['Disease_Prediction'].map(
+            lambda d: d if d in classes else ('Other' if 'Other' in classes else None))
+        usable = labels.notna()
+        report['unseen_disease'] += int((~usable).sum())
+        if not usable.any():
+            continue
+
+        rows = base[base['Syndrome_Label'] == synd]
+        Xtr, _, Xte, ytr, _, yte = split_disease_rows(animal, synd, rows[feature_cols],
+                                                      le_d.transform(rows['Disease_Merged'].astype(str)))
+        Xte_sc = apply_scaler(info['scaler'], Xte)
+        before = held_out_top3(info['models'], Xte_sc, yte, len(le_d.classes_))
+
+        X = apply_scaler(info['scaler'], pd.concat([Xtr, new_rows.loc[usable, feature_cols]]))
+        y = np.concatenate([ytr, le_d.transform(labels[usable])])
+        w = np.concatenate([np.ones(len(ytr)), np.full(int(usable.sum()), ONLINE_CASE_WEIGHT)])
+        for name, model in list(info['models'].items()):
+            info['models'][name], grown = grow_model(model, X, y, w, lgbm_fit_kwargs)
+            report['grown' if grown else 'kept'] += 1
+        # a distilled student no longer matches its teacher
+        info.pop('student', None)
+        info.pop('student_metrics', None)
+
+        report['used'] += int(usable.sum())
+        report['syndromes'][synd] = {'cases': int(usable.sum()), 'top3_before': before,
+                                     'top3_after': held_out_top3(info['models'], Xte_sc, yte, len(le_d.classes_))}
+    return syndrome_bundle, disease_models, report
+
+
+def print_update_report(results):
+    print("\nOnline update summary:")
+    print(f"  {'Species':<10} {'Cases':>5} {'Used':>5} {'Grown':>5} {'Update (s)':>10} {'Full train (s)':>14}")
+    for animal, r in sorted(results.items()):
+        full = r.get('full_train_seconds')
+        print(f"  {animal:<10} {r['cases']:>5} {r['used']:>5} {r['grown']:>5} {r['seconds']:>10.2f} "
+              f"{'n/a' if full is None else f'{full:.2f}':>14}")
+        for synd, s in sorted(r['syndromes'].items()):
+            fmt = lambda v: 'n/a' if v is None else f'{v:.3f}'
+            print(f"    {synd:<12} {s['cases']:>3} cases, held-out Top-3 {fmt(s['top3_before'])} -> {fmt(s['top3_after'])}")
+        if r['unseen_disease']:
+            print(f"    {r['unseen_disease']} case(s) with a disease or syndrome the model has not seen (needs a full retrain)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Fold vet-confirmed diagnoses into the published models')
+    parser.add_argument('--data', default=test2.DATA_PATH, help='training CSV the published models were built from')
+    parser.add_argument('--cases', help='CSV of labelled cases in the training CSV schema, instead of Supabase')
+    parser.add_argument('--dry-run', action='store_true', help='update and report, but do not store, publish or checkpoint')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    checkpoint = load_checkpoint()
+    if args.cases:
+        cases, last_id, missing = pd.read_csv(args.cases), checkpoint['last_diagnosis_id'], 0
+    else:
+        cases, last_id, missing = fetch_confirmed_cases(supabase_client(), checkpoint['last_diagnosis_id'])
+        print(f"Fetched diagnoses {checkpoint['last_diagnosis_id'] + 1}..{last_id}"
+              + (f"; {missing} without a prior prediction to take symptoms from" if missing else ""))
+    if cases.empty:
+        print("No new confirmed cases.")
+        return
+    cases = prepare_cases(cases)
+
+    store = ArtifactStore(MODELS_DIR, fmt=test2.ARTIFACT_FORMAT)
+    # held until garbage collection, like a training run (see artifact_store)
+    writer_lock = store.lock_writers()
+    if writer_lock is None:
+        raise SystemExit(f"A training run or another online update is writing to {MODELS_DIR}; try again when it finishes.")
+    manifest = load_model_manifest()
+    df, _, _, _ = load_training_frame(args.data)
+    version = manifest['version'] + 1
+    species = dict(manifest['species'])
+    results = {}
+    for animal, new_cases in cases.groupby('Animal_Type'):
+        prev = species.get(animal)
+        if not prev or not store.entry_complete(prev.get('artifacts')):
+            print(f"  {animal}: no published model, {len(new_cases)} case(s) left for the next full training run")
+            continue
+        t0 = time.perf_counter()
+        try:
+            syndrome_bundle, disease_models, report = update_species(
+                animal, prev['artifacts'], df[df['Animal_Type'] == animal], new_cases, store)
+        except ValueError as e:
+            # the CSV no longer matches what the published model was trained on
+            print(f"  {animal}: cannot replay its training data ({e}); run test2.py instead")
+            continue
+        report['seconds'] = round(time.perf_counter() - t0, 3)
+        report['full_train_seconds'] = prev.get('train_seconds')
+        results[animal] = report
+        if args.dry_run or not report['grown']:
+            continue                    # nothing to store: a dry run, or every model kept as it was
+        # the entry holds the encoders' digest; put_species wants the objects (same content, same digest)
+        entry = store.put_species(syndrome_bundle, disease_models, store.get(prev['artifacts']['label_encoders_cat']),
+                                  prev['artifacts']['feature_columns'], tree_native=prev['artifacts'].get('tree_native', False))
+        info = {k: v for k, v in prev.items() if k != 'profile'}   # profiled artifacts are being replaced
+        species[animal] = dict(info, artifacts=entry, model_version=version, status='updated_online',
+                               online_update=report)
+
+    print_update_report(results)
+    if args.dry_run:
+        return
+    if not any(r['grown'] for r in results.values()):
+        print("\nNo model grew; nothing to publish.")
+        return
+    entries = {a: info['artifacts'] for a, info in species.items() if info.get('artifacts')}
+    store.write_version(version, entries)
+    publish_model_manifest(dict(manifest, version=version, species=species,
+                                published_at=datetime.now().isoformat(timespec='seconds')))
+    store.collect_garbage(KEEP_MODEL_VERSIONS)
+    writer_lock.close()
+    if not args.cases:
+        save_checkpoint({'last_diagnosis_id': last_id, 'model_version': version,
+                         'updated_at': datetime.now().isoformat(timespec='seconds')})
+    print(f"\nPublished model version {version} with {sum(r['used'] for r in results.values())} new case(s)")
+
+
+if __name__ == '__main__':
+    main()
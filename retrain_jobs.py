@@ -0,0 +1,188 @@
+"""
+Background retraining for the web app.
+
+A RetrainJobRunner starts test2.py in a child process, so training never runs on a
+request thread. The child gets a capped CPU share:
+
+- --cpu-budget limits every estimator, BLAS and OpenMP pool in the trainer (and its
+  species process pool) to `cpu_budget` threads in total
+- on Linux the child is pinned to the last `cpu_budget` cores, leaving the first ones
+  to the web server, and it runs at a lower scheduling priority (nice)
+
+The trainer's output is collected line by line so routes can stream it. test2.py
+publishes by atomically replacing models/manifest.json, and ArtifactStore reads the
+published version on every load, so the next prediction after a successful job is
+served by the new models without a restart.
+
+Jobs live in this process's memory: one job at a time per app process.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+from artifact_store import ArtifactStore
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TRAINER = os.path.join(ROOT, 'test2.py')
+LOG_LINES = 2000               # trainer output kept per job
+TRAINER_FLAGS = {              # job option -> test2.py flag (booleans only)
+    'full_retrain': '--full-retrain',
+    'distill': '--distill',
+    'tree_native': '--tree-native',
+    'skip_profile': '--skip-profile',
+}
+# progress lines test2.py prints once it knows which species need training, and per finished species
+PROGRESS_SCHEDULED = re.compile(r'Species to train: (\d+)')
+PROGRESS_FINISHED = re.compile(r'Species finished (\d+)/(\d+):')
+
+
+class RetrainJob:
+    def __init__(self, options, total_species):
+        self.id = uuid.uuid4().hex[:12]
+        self.options = options
+        self.state = 'queued'          # queued -> running -> succeeded | failed
+        self.started_at = None
+        self.finished_at = None
+        self.returncode = None
+        self.published_version = None
+        self.total_species = total_species     # estimate until the trainer reports how many it will train
+        self.species_done = 0
+        self.lines = deque(maxlen=LOG_LINES)
+        self.lines_seen = 0            # total lines ever appended, so streams can resume after the deque wraps
+
+    def append(self, line):
+        self.lines.append(line)
+        self.lines_seen += 1
+        scheduled = PROGRESS_SCHEDULED.match(line)
+        if scheduled:
+            self.total_species = int(scheduled.group(1))
+        finished = PROGRESS_FINISHED.match(line)
+        if finished:
+            self.species_done, self.total_species = int(finished.group(1)), int(finished.group(2))
+
+    def lines_since(self, seen):
+        """(new lines after the first `seen`, new seen count); older lines may have been dropped"""
+        missed = self.lines_seen - seen
+        if missed <= 0:
+            return [], self.lines_seen
+        return list(self.lines)[-min(missed, len(self.lines)):], self.lines_seen
+
+    @property
+    def done(self):
+        return self.state in ('succeeded', 'failed')
+
+    def to_dict(self, tail=20):
+        elapsed = None
+        if self.started_at:
+            elapsed = round((self.finished_at or time.time()) - self.started_at, 1)
+        return {
+            'id': self.id,
+            'state': self.state,
+            'options': self.options,
+            'species_done': self.species_done,
+            'total_species': self.total_species,
+            'elapsed_seconds': elapsed,
+            'returncode': self.returncode,
+            'published_version': self.published_version,
+            'log_tail': list(self.lines)[-tail:] if tail else [],
+        }
+
+
+class RetrainJobRunner:
+    def __init__(self, models_dir='./models', cpu_budget=1, species_workers=1, nice=10, data_path=None):
+        self.models_dir = models_dir
+        self.cpu_budget = max(1, int(cpu_budget))
+        self.species_workers = max(1, min(int(species_workers), self.cpu_budget))
+        self.nice = nice
+        self.data_path = data_path
+        self.jobs = {}
+        self.current = None
+        self._lock = threading.Lock()
+
+    def command(self, options):
+        cmd = [sys.executable, TRAINER, '--cpu-budget', str(self.cpu_budget),
+               '--species-workers', str(self.species_workers)]
+        if self.data_path:
+            cmd += ['--data', self.data_path]
+        cmd += [flag for name, flag in TRAINER_FLAGS.items() if options.get(name)]
+        return cmd
+
+    def _limit_child(self, pid):
+        # applied from the parent right after exec: a preexec_fn would run Python between fork and exec,
+        # which can deadlock in a threaded server. The trainer is still starting the interpreter at this
+        # point, so its BLAS/OpenMP threads and species workers are all created under these limits.
+        try:
+            if self.nice and hasattr(os, 'setpriority'):
+                os.setpriority(os.PRIO_PROCESS, pid, os.getpriority(os.PRIO_PROCESS, 0) + self.nice)
+            if hasattr(os, 'sched_setaffinity'):
+                cores = sorted(os.sched_getaffinity(0))
+                if len(cores) > self.cpu_budget:
+                    os.sched_setaffinity(pid, cores[-self.cpu_budget:])
+        except OSError as e:
+            print(f"Retraining: could not limit trainer process {pid}: {e}")
+
+    def published_version(self):
+        try:
+            with open(os.path.join(self.models_dir, 'manifest.json')) as f:
+                return json.load(f).get('version')
+        except (OSError, ValueError):
+            return None
+
+    def start(self, options=None, total_species=None):
+        """Start a job unless one is running; returns (job, started?). The job is None when another
+           process (online_update.py, a manual test2.py run) holds the model store's writer lock."""
+        options = {k: bool(v) for k, v in (options or {}).items() if k in TRAINER_FLAGS}
+        with self._lock:
+            if self.current is not None and not self.current.done:
+                return self.current, False
+            if ArtifactStore(self.models_dir).writer_active():
+                return None, False
+            job = RetrainJob(options, total_species)
+            self.jobs[job.id] = job
+            self.current = job
+        threading.Thread(target=self._run, args=(job,), daemon=True, name=f'retrain-{job.id}').start()
+        return job, True
+
+    def _run(self, job):
+        job.state = 'running'
+        job.started_at = time.time()
+        env = dict(os.environ, PYTHONUNBUFFERED='1', PYTHONWARNINGS='ignore')
+        try:
+            proc = subprocess.Popen(self.command(job.options), cwd=ROOT, env=env, text=True, bufsize=1,
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            self._limit_child(proc.pid)
+            for line in proc.stdout:
+                job.append(line.rstrip('\n'))
+            job.returncode = proc.wait()
+        except Exception as e:
+            job.append(f"Retraining could not start: {e}")
+            job.returncode = -1
+        job.finished_at = time.time()
+        if job.returncode == 0:
+            job.published_version = self.published_version()
+            job.state = 'succeeded'
+        else:
+            job.state = 'failed'
+        print(f"Retraining job {job.id} {job.state} in {job.finished_at - job.started_at:.1f}s"
+              + (f", serving model version {job.published_version}" if job.published_version else ""))
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def stream(self, job, poll_seconds=0.5):
+        """Server-sent events: one 'data:' event per trainer line, then a final 'done' event with the job status"""
+        seen = 0
+        while True:
+            lines, seen = job.lines_since(seen)
+            for line in lines:
+                yield f"data: {line}\n\n"
+            if job.done and job.lines_since(seen)[1] == seen:
+                yield f"event: done\ndata: {json.dumps(job.to_dict(tail=0))}\n\n"
+                return
+            time.sleep(poll_seconds)
@@ -0,0 +1,49 @@
+"""
+Shared HTTP transport for the Supabase client.
+
+Every DB.* / User.* call is a synchronous PostgREST round trip. Routing them all through
+one explicitly configured httpx.Client means:
+
+- connections are kept alive and reused across requests and threads (httpx.Client is
+  thread-safe), so most calls skip the TCP and TLS handshakes
+- with HTTP/2 (needs the h2 package) concurrent requests from Flask's threads are
+  multiplexed over a few connections instead of opening one each
+- pool size and timeouts are bounded, so a slow database makes requests fail fast
+  instead of piling up threads
+"""
+import httpx
+
+try:
+    import h2  # noqa: F401  (httpx's HTTP/2 support)
+    H2_AVAILABLE = True
+except Exception:
+    H2_AVAILABLE = False
+
+POOL_MAX_CONNECTIONS = 20      # open connections across all threads
+POOL_MAX_KEEPALIVE = 10        # idle connections kept for reuse
+KEEPALIVE_EXPIRY = 30.0        # seconds an idle connection stays open
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 15.0
+WRITE_TIMEOUT = 15.0
+POOL_TIMEOUT = 5.0             # seconds to wait for a free connection when the pool is full
+
+
+def make_http_client(http2=True, max_connections=POOL_MAX_CONNECTIONS, max_keepalive=POOL_MAX_KEEPALIVE,
+                     keepalive_expiry=KEEPALIVE_EXPIRY, connect_timeout=CONNECT_TIMEOUT,
+                     read_timeout=READ_TIMEOUT, verify=True):
+    """Pooled keep-alive client; HTTP/2 is negotiated (ALPN) when requested and h2 is installed"""
+    return httpx.Client(
+        http2=bool(http2) and H2_AVAILABLE,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                            keepalive_expiry=keepalive_expiry),
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout, write=WRITE_TIMEOUT, pool=POOL_TIMEOUT),
+        follow_redirects=True,
+        verify=verify,
+    )
+
+
+def create_pooled_client(url, key, http_client=None, **pool_options):
+    """(supabase Client, httpx.Client) with PostgREST, storage and functions all on the shared pool"""
+    from supabase import ClientOptions, create_client
+    http_client = http_client or make_http_client(**pool_options)
+    return create_client(url, key, options=ClientOptions(httpx_client=http_client)), http_client
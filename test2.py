@@ -1,33 +1,56 @@
-
 """
 HIERARCHICAL ANIMAL DISEASE PREDICTOR
 - Reads cleaned_animal_disease_prediction.csv
 - Preprocesses fields robustly (duration, temperature)
+- Caches the preprocessed frame + encoders in ./cache (parquet, keyed by CSV hash and settings)
+- --chunked-ingest streams large CSVs into per-species parquet partitions with compact dtypes
 - Merges rare disease labels per-animal (threshold=5)
 - Trains two-stage pipeline:
     1) Syndrome classifier (per-animal)
     2) Disease classifier per (animal, syndrome)
-- Balances with undersampling + SMOTE where possible (safe fallbacks)
+- Balances with undersampling + SMOTE where possible (safe fallbacks); resampled rows are cached under
+  ./cache/resample so reruns that only change model hyperparameters skip it
 - Calibrates classifiers using a held-out calibration set via CalibratedClassifierCV(cv='prefit')
 - Evaluates Top-1 and Top-3 accuracy and per-class reports
-- Saves models to ./models/<Animal>/
+- Saves models into a content-addressed store under ./models (see artifact_store.py) and publishes
+  models/manifest.json (version + per-species fingerprints)
+- --artifact-format stores components raw (mmap-able), lz4 or zlib compressed; loaders detect the format
+- Only retrains species whose data or hyperparameters changed (--full-retrain to rebuild everything)
+- --search tunes each (animal, syndrome) ensemble by successive halving under a time budget
+- A global CPU budget is split across concurrent species; every estimator and BLAS/OpenMP pool is capped to its share
+- --cv-folds K adds stratified k-fold metrics with 95% intervals to the model manifest
+- --distill fits a compact student per syndrome on the ensemble's soft labels for cheaper serving
+- --tree-native drops StandardScaler and gives XGBoost/LightGBM the categorical columns natively
+- Profiles bytes, load time, memory and latency of every saved model into a serving cost report
 """
+import argparse
+import contextlib
+import hashlib
+import json
 import os
+import pickle
 import re
+import sys
+import time
 import warnings
 from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from datetime import datetime
 
 import joblib
 import numpy as np
 import pandas as pd
-from imblearn.over_sampling import SMOTE
+import imblearn
+from imblearn.over_sampling import SMOTE, SMOTENC
 from imblearn.under_sampling import RandomUnderSampler
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
-from sklearn.model_selection import StratifiedShuffleSplit, train_test_split
+from sklearn.model_selection import KFold, StratifiedKFold, StratifiedShuffleSplit, train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 
+from artifact_store import FORMATS as ARTIFACT_FORMATS, ArtifactStore
+
 # Try imports for XGBoost, LightGBM; handle absence gracefully
 try:
     from xgboost import XGBClassifier
@@ -41,12 +64,78 @@ try:
 except Exception:
     LGBM_AVAILABLE = False
 
+try:
+    import pyarrow  # noqa: F401  (parquet engine for the preprocessed-data cache)
+    PARQUET_AVAILABLE = True
+except Exception:
+    PARQUET_AVAILABLE = False
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except Exception:
+    PSUTIL_AVAILABLE = False
+
+try:
+    from threadpoolctl import threadpool_info, threadpool_limits
+    THREADPOOLCTL_AVAILABLE = True
+except Exception:
+    THREADPOOLCTL_AVAILABLE = False
+
 # Settings
 RANDOM_STATE = 42
 RARE_LABEL_THRESHOLD = 3      # merge disease labels with count < this into 'Other' (lowered from 5 to keep more diseases)
 TEST_SIZE = 0.15
 CALIB_SIZE = 0.15              # portion of full dataset (we will do stratified splits accordingly)
 VERBOSE = True
+DATA_PATH = 'cleaned_animal_disease_prediction.csv'
+CACHE_DIR = './cache'
+USE_PREPROCESS_CACHE = True    # reuse parsed/encoded frame across runs (keyed by CSV hash + settings)
+PREPROCESS_CACHE_VERSION = 1   # bump when preprocessing logic changes
+PARTITION_DIR = './cache/partitions'
+USE_RESAMPLE_CACHE = True      # reuse undersampled+SMOTE training matrices across runs (keyed by input rows + sampler settings)
+RESAMPLE_CACHE_DIR = './cache/resample'
+RESAMPLE_CACHE_VERSION = 1     # bump when balance_training_set changes
+RESAMPLE_CACHE_MAX_BYTES = 512 * 1024 * 1024   # least recently used entries are evicted beyond this after each run
+INGEST_CHUNKSIZE = 100_000     # rows per chunk for --chunked-ingest
+INGEST_VERSION = 1             # bump when the partition layout changes
+MODELS_DIR = './models'
+MODEL_FORMAT_VERSION = 2       # bump when train_animal changes what it produces (forces a full retrain)
+KEEP_MODEL_VERSIONS = 3        # artifact-store versions kept for rollback; older unreferenced objects are deleted
+ARTIFACT_FORMAT = 'raw'        # 'raw' (mmap-able), 'lz4' (fast to decompress) or 'zlib' (smallest)
+CPU_BUDGET = os.cpu_count() or 1   # total threads a training run may use (--cpu-budget)
+SPECIES_WORKERS = 1            # species trained concurrently; each gets CPU_BUDGET // SPECIES_WORKERS threads
+
+# Base-estimator hyperparameters (part of each species' fingerprint)
+RF_PARAMS = {'n_estimators': 300, 'max_depth': 15, 'min_samples_split': 2, 'class_weight': 'balanced'}
+XGB_PARAMS = {'n_estimators': 150, 'use_label_encoder': False, 'eval_metric': 'mlogloss'}
+LGBM_PARAMS = {'n_estimators': 150, 'class_weight': 'balanced', 'verbosity': -1}
+
+# Hyperparameter search (--search); winners are written to TUNED_PARAMS_PATH and picked up by training
+TUNED_PARAMS_PATH = './models/tuned_params.json'
+SEARCH_SPACE = {
+    'rf': {'n_estimators': [50, 100, 200, 300], 'max_depth': [6, 10, 15, None]},
+    'xgb': {'n_estimators': [50, 100, 150, 300], 'max_depth': [3, 6, 8], 'learning_rate': [0.05, 0.1, 0.3]},
+    'lgbm': {'n_estimators': [50, 100, 150, 300], 'max_depth': [-1, 6, 10], 'learning_rate': [0.05, 0.1, 0.3]},
+}
+SEARCH_CANDIDATES = 27         # configs entering the first rung
+SEARCH_ETA = 3                 # keep the best 1/ETA of candidates per rung, ETA x more data next rung
+SEARCH_RUNGS = 3               # data fractions 1/9, 1/3, 1
+SEARCH_BUDGET_SECONDS = 600
+SEARCH_LATENCY_WEIGHT = 0.002  # objective penalty per ms of single-row ensemble latency
+SEARCH_SIZE_WEIGHT = 0.01      # objective penalty per MB of pickled ensemble
+SEARCH_LATENCY_REPEATS = 20
+
+# Distillation (--distill): a compact student per syndrome, served only within DISTILL_MAX_GAP Top-3 accuracy
+DISTILL_MAX_GAP = 0.02
+STUDENT_LGBM_PARAMS = {'n_estimators': 40, 'num_leaves': 7, 'learning_rate': 0.15, 'min_child_samples': 5, 'verbosity': -1}
+STUDENT_RF_PARAMS = {'n_estimators': 50, 'max_depth': 8}   # used when LightGBM is unavailable
+
+# Serving cost report written after training (--skip-profile to disable)
+SERVING_REPORT_PATH = './models/serving_report.json'
+PROFILE_SINGLE_REPEATS = 100
+PROFILE_BATCH_ROWS = 1000
+PROFILE_BATCH_REPEATS = 10
 
 # Suppress repeated warnings and LightGBM native spam (one-time notice)
 warnings.filterwarnings("once")
@@ -88,66 +177,61 @@ def parse_temperature(x):
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
+def thread_budget(cpu_budget, workers):
+    """Threads each of `workers` concurrent trainers may use without exceeding cpu_budget in total"""
+    return max(1, int(cpu_budget) // max(1, int(workers)))
+
+def pool_limits(n_threads):
+    """Per-API thread caps of at most n_threads that never raise a pool above its current size.
+
+    threadpool_limits(limits=n) also *grows* smaller pools: with numpy's and scipy's OpenBLAS both
+    loaded, a budget above the machine's cores (or above a user's OPENBLAS_NUM_THREADS) would start
+    two extra pools of n spinning threads each.
+    """
+    limits = {}
+    for pool in threadpool_info():
+        api = pool['user_api']
+        limits[api] = min(limits.get(api, n_threads), pool['num_threads'])
+    return limits
+
+def limit_threads(n_threads):
+    """Cap BLAS and OpenMP pools (numpy, SMOTE's neighbour search, XGBoost/LightGBM) inside a with-block"""
+    if THREADPOOLCTL_AVAILABLE:
+        return threadpool_limits(limits=pool_limits(n_threads))
+    return contextlib.nullcontext()
+
+def init_worker_threads(n_threads):
+    """Process-pool initializer: pin a worker's native thread pools to its share of the budget"""
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(n_threads)
+    if THREADPOOLCTL_AVAILABLE:
+        threadpool_limits(limits=pool_limits(n_threads))
+
 def top_k_accuracy(y_true, y_pred_topk, k=3):
     """y_pred_topk: array-like shape (n_samples, k) — top-k predicted labels"""
     if len(y_true) == 0:
         return 0.0
-    correct = 0
-    for yt, preds in zip(y_true, y_pred_topk):
-        if yt in preds[:k]:
-            correct += 1
-    return correct / len(y_true)
-
-# Load data
-df = pd.read_csv('cleaned_animal_disease_prediction.csv')
-print(f"Loaded {len(df)} rows. Columns: {list(df.columns)}\n")
-
-# Basic cleaning and parsing
-# Binary encode known yes/no symptom columns if present
-yesno_cols = ['Appetite_Loss', 'Vomiting', 'Diarrhea', 'Coughing', 'Labored_Breathing',
+    hits = np.asarray(y_pred_topk)[:, :k] == np.asarray(y_true)[:, None]
+    return float(np.mean(np.any(hits, axis=1)))
+
+def top_k_indices(proba, k=3):
+    """Column indices of the k largest probabilities per row, best first (argpartition, then sort only k)"""
+    k = min(k, proba.shape[1])
+    part = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(proba, part, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1)
+
+# Columns shared by preprocessing, caching and training
+YESNO_COLS = ['Appetite_Loss', 'Vomiting', 'Diarrhea', 'Coughing', 'Labored_Breathing',
               'Lameness', 'Skin_Lesions', 'Nasal_Discharge', 'Eye_Discharge']
-for c in yesno_cols:
-    if c in df.columns:
-        df[c] = df[c].map({'Yes': 1, 'No': 0, 'yes': 1, 'no': 0}).fillna(df[c])
-        # if still non-numeric, coerce
-        df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0).astype(int)
-
-# Parse duration and temperature and heart rate
-if 'Duration' in df.columns:
-    df['Duration_days'] = df['Duration'].apply(parse_duration_to_days)
-    # fill missing with median of parsed values
-    med = float(np.nanmedian(df['Duration_days'].values))
-    if np.isnan(med):
-        med = 3.0
-    df['Duration_days'] = df['Duration_days'].fillna(med)
-else:
-    df['Duration_days'] = 0.0
-
-if 'Body_Temperature' in df.columns:
-    df['Body_Temperature'] = df['Body_Temperature'].apply(parse_temperature)
-    med = float(np.nanmedian(df['Body_Temperature'].values))
-    if np.isnan(med):
-        med = 39.0
-    df['Body_Temperature'] = df['Body_Temperature'].fillna(med)
-else:
-    df['Body_Temperature'] = 39.0
-
-if 'Heart_Rate' in df.columns:
-    df['Heart_Rate'] = pd.to_numeric(df['Heart_Rate'], errors='coerce')
-    med = float(np.nanmedian(df['Heart_Rate'].values))
-    if np.isnan(med):
-        med = 80.0
-    df['Heart_Rate'] = df['Heart_Rate'].fillna(med)
-else:
-    df['Heart_Rate'] = 80.0
-
-# Ensure Age, Weight exist
-df['Age'] = pd.to_numeric(df.get('Age', 0), errors='coerce').fillna(0).astype(float)
-df['Weight'] = pd.to_numeric(df.get('Weight', 0), errors='coerce').fillna(0).astype(float)
-
-# Columns present
-print("After parsing fields sample:")
-print(df[['Duration_days', 'Body_Temperature', 'Heart_Rate']].head())
+CAT_COLS = ['Breed', 'Gender', 'Symptom_1', 'Symptom_2', 'Symptom_3', 'Symptom_4']
+FEATURE_COLS = [
+    'Breed', 'Age', 'Gender', 'Weight',
+    'Symptom_1', 'Symptom_2', 'Symptom_3', 'Symptom_4',
+    'Duration_days', 'Body_Temperature', 'Heart_Rate',
+    'Appetite_Loss', 'Vomiting', 'Diarrhea', 'Coughing', 'Labored_Breathing',
+    'Lameness', 'Skin_Lesions', 'Nasal_Discharge', 'Eye_Discharge'
+]
 
 # Create simple syndrome mapping based on symptom columns (same logic you used earlier)
 def syndrome_label(row):
@@ -166,11 +250,6 @@ def syndrome_label(row):
         return nonzero[0]
     return 'Multi'
 
-df['Syndrome_Label'] = df.apply(syndrome_label, axis=1)
-
-print("\nSyndrome label distribution:")
-print(df['Syndrome_Label'].value_counts())
-
 # Merge rare disease labels per animal into 'Other'
 def merge_rare_labels(df, threshold=RARE_LABEL_THRESHOLD):
     df = df.copy()
@@ -187,42 +266,347 @@ def merge_rare_labels(df, threshold=RARE_LABEL_THRESHOLD):
         merged_counts[animal] = (len(sub), len(to_keep))
     return df, merged_counts
 
-df, merged_counts = merge_rare_labels(df, threshold=RARE_LABEL_THRESHOLD)
-print("\nAfter merging rare labels (per-animal):")
-for animal, (samples, kept) in merged_counts.items():
-    print(f"  {animal}: samples {samples}, kept disease labels {kept}")
+def preprocess_frame(df):
+    """Parse raw CSV fields, add syndrome labels, merge rare diseases and label-encode categoricals.
+       Returns (df, label_encoders, merged_counts, feature_cols)."""
+    # Basic cleaning and parsing
+    # Binary encode known yes/no symptom columns if present
+    for c in YESNO_COLS:
+        if c in df.columns:
+            df[c] = df[c].map({'Yes': 1, 'No': 0, 'yes': 1, 'no': 0}).fillna(df[c])
+            # if still non-numeric, coerce
+            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0).astype(int)
 
-# Label encoding of categorical features used as model inputs
-cat_cols = []
-for c in ['Breed', 'Gender', 'Symptom_1', 'Symptom_2', 'Symptom_3', 'Symptom_4']:
-    if c in df.columns:
-        cat_cols.append(c)
+    # Parse duration and temperature and heart rate
+    if 'Duration' in df.columns:
+        df['Duration_days'] = df['Duration'].apply(parse_duration_to_days)
+        # fill missing with median of parsed values
+        med = float(np.nanmedian(df['Duration_days'].values))
+        if np.isnan(med):
+            med = 3.0
+        df['Duration_days'] = df['Duration_days'].fillna(med)
     else:
-        # create placeholder column if not present to keep consistent features
-        df[c] = 'NA'
-        cat_cols.append(c)
-
-label_encoders = {}
-for c in cat_cols:
-    le = LabelEncoder()
-    df[c] = df[c].astype(str).fillna('NA')
-    df[c] = le.fit_transform(df[c])
-    label_encoders[c] = le
-
-# Useful numeric features list
-feature_cols = [
-    'Breed', 'Age', 'Gender', 'Weight',
-    'Symptom_1', 'Symptom_2', 'Symptom_3', 'Symptom_4',
-    'Duration_days', 'Body_Temperature', 'Heart_Rate',
-    'Appetite_Loss', 'Vomiting', 'Diarrhea', 'Coughing', 'Labored_Breathing',
-    'Lameness', 'Skin_Lesions', 'Nasal_Discharge', 'Eye_Discharge'
-]
+        df['Duration_days'] = 0.0
+
+    if 'Body_Temperature' in df.columns:
+        df['Body_Temperature'] = df['Body_Temperature'].apply(parse_temperature)
+        med = float(np.nanmedian(df['Body_Temperature'].values))
+        if np.isnan(med):
+            med = 39.0
+        df['Body_Temperature'] = df['Body_Temperature'].fillna(med)
+    else:
+        df['Body_Temperature'] = 39.0
+
+    if 'Heart_Rate' in df.columns:
+        df['Heart_Rate'] = pd.to_numeric(df['Heart_Rate'], errors='coerce')
+        med = float(np.nanmedian(df['Heart_Rate'].values))
+        if np.isnan(med):
+            med = 80.0
+        df['Heart_Rate'] = df['Heart_Rate'].fillna(med)
+    else:
+        df['Heart_Rate'] = 80.0
+
+    # Ensure Age, Weight exist
+    df['Age'] = pd.to_numeric(df.get('Age', 0), errors='coerce').fillna(0).astype(float)
+    df['Weight'] = pd.to_numeric(df.get('Weight', 0), errors='coerce').fillna(0).astype(float)
+
+    # Columns present
+    print("After parsing fields sample:")
+    print(df[['Duration_days', 'Body_Temperature', 'Heart_Rate']].head())
+
+    df['Syndrome_Label'] = df.apply(syndrome_label, axis=1)
+
+    print("\nSyndrome label distribution:")
+    print(df['Syndrome_Label'].value_counts())
+
+    df, merged_counts = merge_rare_labels(df, threshold=RARE_LABEL_THRESHOLD)
+
+    # Label encoding of categorical features used as model inputs
+    for c in CAT_COLS:
+        if c not in df.columns:
+            # create placeholder column if not present to keep consistent features
+            df[c] = 'NA'
+
+    label_encoders = {}
+    for c in CAT_COLS:
+        le = LabelEncoder()
+        df[c] = df[c].astype(str).fillna('NA')
+        df[c] = le.fit_transform(df[c])
+        label_encoders[c] = le
+
+    # Keep only those columns that exist
+    feature_cols = [c for c in FEATURE_COLS if c in df.columns]
+    return df, label_encoders, merged_counts, feature_cols
+
+# Preprocessed-data cache: parquet frame + joblib sidecar for the fitted encoders
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def settings_cache_key(path, settings):
+    """Short hash of the source file contents plus the settings that shape the derived data"""
+    h = hashlib.sha256()
+    h.update(file_sha256(path).encode())
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+def preprocess_cache_key(path):
+    """Hash of the source file plus every setting that changes the preprocessed output"""
+    return settings_cache_key(path, {
+        'version': PREPROCESS_CACHE_VERSION,
+        'rare_label_threshold': RARE_LABEL_THRESHOLD,
+        'yesno_cols': YESNO_COLS,
+        'cat_cols': CAT_COLS,
+        'feature_cols': FEATURE_COLS,
+    })
+
+def load_training_frame(path=DATA_PATH):
+    """Return (df, label_encoders, merged_counts, feature_cols), reusing the on-disk cache when valid."""
+    use_cache = USE_PREPROCESS_CACHE and PARQUET_AVAILABLE
+    if USE_PREPROCESS_CACHE and not PARQUET_AVAILABLE:
+        print("Note: pyarrow not installed, preprocessed-data cache disabled.")
+    if use_cache:
+        key = preprocess_cache_key(path)
+        frame_path = os.path.join(CACHE_DIR, f'preprocessed_{key}.parquet')
+        meta_path = os.path.join(CACHE_DIR, f'preprocessed_{key}.joblib')
+        if os.path.exists(frame_path) and os.path.exists(meta_path):
+            try:
+                df = pd.read_parquet(frame_path)
+                meta = joblib.load(meta_path)
+                print(f"Loaded preprocessed data from cache ({frame_path}): {len(df)} rows\n")
+                return df, meta['label_encoders'], meta['merged_counts'], meta['feature_cols']
+            except Exception as e:
+                print(f"  Preprocessed cache unreadable, rebuilding. Reason: {e}")
+
+    df = pd.read_csv(path)
+    print(f"Loaded {len(df)} rows. Columns: {list(df.columns)}\n")
+    df, label_encoders, merged_counts, feature_cols = preprocess_frame(df)
+
+    if use_cache:
+        ensure_dir(CACHE_DIR)
+        # write to temp names first so an interrupted run never leaves a half-written cache entry
+        df.to_parquet(frame_path + '.tmp', engine='pyarrow')
+        joblib.dump({
+            'label_encoders': label_encoders,
+            'merged_counts': merged_counts,
+            'feature_cols': feature_cols,
+            'source': os.path.abspath(path),
+        }, meta_path + '.tmp')
+        os.replace(frame_path + '.tmp', frame_path)
+        os.replace(meta_path + '.tmp', meta_path)
+        if VERBOSE:
+            print(f"Preprocessed data cached to {frame_path}")
+    return df, label_encoders, merged_counts, feature_cols
+
+# Out-of-core ingest: stream the CSV in chunks with compact dtypes and write one parquet
+# partition per species, so each species' trainer only ever loads its own rows.
+VITAL_COLS = ['Duration_days', 'Body_Temperature', 'Heart_Rate']
+VITAL_DEFAULTS = {'Duration_days': 3.0, 'Body_Temperature': 39.0, 'Heart_Rate': 80.0}
+
+def ingest_dtypes(columns):
+    """Explicit read_csv dtypes: categoricals for text, float32 for numeric vitals"""
+    dtypes = {}
+    for c in columns:
+        if c in ('Age', 'Weight', 'Heart_Rate'):
+            dtypes[c] = 'float32'
+        else:
+            # free-text, yes/no flags, '3 days', '39.5°C' ... all low-cardinality strings
+            dtypes[c] = 'category'
+    return dtypes
 
-# Keep only those columns that exist
-feature_cols = [c for c in feature_cols if c in df.columns]
+def _map_categories(series, func, dtype):
+    """Apply func once per category instead of once per row; NaN rows -> func(np.nan)"""
+    cats = series.cat.categories
+    codes = series.cat.codes.to_numpy()
+    values = np.asarray([func(c) for c in cats] + [func(np.nan)], dtype=np.float64)
+    # code -1 (missing) picks the trailing func(np.nan) slot
+    return values[np.where(codes >= 0, codes, len(cats))].astype(dtype)
+
+def _yesno_to_int(x):
+    if pd.isna(x):
+        return 0
+    if x in ('Yes', 'yes'):
+        return 1
+    if x in ('No', 'no'):
+        return 0
+    v = pd.to_numeric(x, errors='coerce')
+    return 0 if pd.isna(v) else int(v)
+
+def _median_from_counts(counts, default):
+    """Exact median from a {value: count} tally (same result as np.nanmedian over all rows)"""
+    n = sum(counts.values())
+    if n == 0:
+        return default
+    lo_pos, hi_pos = (n - 1) // 2, n // 2
+    lo = hi = None
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        if lo is None and seen > lo_pos:
+            lo = value
+        if seen > hi_pos:
+            hi = value
+            break
+    return float((lo + hi) / 2.0)
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where the resource module is unavailable)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return rss / (1024.0 * 1024.0) if sys.platform == 'darwin' else rss / 1024.0
+
+def partition_schema(yesno_present):
+    import pyarrow as pa
+    fields = [('Animal_Type', pa.string()), ('Disease_Prediction', pa.string())]
+    fields += [(c, pa.string()) for c in CAT_COLS]
+    fields += [(c, pa.int8()) for c in yesno_present]
+    fields += [(c, pa.float32()) for c in ['Age', 'Weight'] + VITAL_COLS]
+    return pa.schema(fields)
+
+def ingest_csv_chunked(path=DATA_PATH, chunksize=INGEST_CHUNKSIZE):
+    """Stream `path` into PARTITION_DIR/<key>/<Animal>.parquet and return the ingest manifest.
+       Medians and categorical vocabularies are accumulated across chunks so loading a
+       partition later reproduces the in-memory preprocessing exactly."""
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("Chunked ingest requires pyarrow (pip install pyarrow)")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    key = settings_cache_key(path, {'version': INGEST_VERSION, 'yesno_cols': YESNO_COLS, 'cat_cols': CAT_COLS})
+    out_dir = os.path.join(PARTITION_DIR, key)
+    manifest_path = os.path.join(out_dir, 'manifest.joblib')
+    if os.path.exists(manifest_path):
+        manifest = joblib.load(manifest_path)
+        print(f"Reusing species partitions in {out_dir} ({sum(s['rows'] for s in manifest['species'].values())} rows)")
+        return manifest
+
+    ensure_dir(out_dir)
+    header = pd.read_csv(path, nrows=0).columns.tolist()
+    yesno_present = [c for c in YESNO_COLS if c in header]
+    schema = partition_schema(yesno_present)
+    writers = {}
+    rows_by_species = Counter()
+    vital_counts = {c: Counter() for c in VITAL_COLS}
+    vocab = {c: set() for c in CAT_COLS}
+    peak_chunk_bytes = 0
+    total_rows = 0
+
+    try:
+        for i, chunk in enumerate(pd.read_csv(path, dtype=ingest_dtypes(header), chunksize=chunksize)):
+            peak_chunk_bytes = max(peak_chunk_bytes, int(chunk.memory_usage(deep=True).sum()))
+            total_rows += len(chunk)
+            out = pd.DataFrame({
+                'Animal_Type': chunk['Animal_Type'].astype(str),
+                'Disease_Prediction': chunk['Disease_Prediction'].astype(str),
+            })
+            for c in CAT_COLS:
+                out[c] = chunk[c].astype(str) if c in chunk.columns else 'NA'
+                vocab[c].update(out[c].unique())
+            for c in yesno_present:
+                out[c] = _map_categories(chunk[c], _yesno_to_int, np.int8)
+            for c in ['Age', 'Weight']:
+                out[c] = chunk[c].fillna(0).astype(np.float32) if c in chunk.columns else np.float32(0)
+
+            # vitals stay NaN in the partition; the global median is filled in at load time
+            if 'Duration' in chunk.columns:
+                out['Duration_days'] = _map_categories(chunk['Duration'], parse_duration_to_days, np.float64)
+            else:
+                out['Duration_days'] = 0.0
+            if 'Body_Temperature' in chunk.columns:
+                out['Body_Temperature'] = _map_categories(chunk['Body_Temperature'], parse_temperature, np.float64)
+            else:
+                out['Body_Temperature'] = 39.0
+            out['Heart_Rate'] = chunk['Heart_Rate'].astype(np.float64) if 'Heart_Rate' in chunk.columns else 80.0
+            for c in VITAL_COLS:
+                values, counts = np.unique(out[c].dropna().to_numpy(), return_counts=True)
+                vital_counts[c].update(dict(zip(values.tolist(), counts.tolist())))
+                out[c] = out[c].astype(np.float32)
+
+            for animal, part in out.groupby('Animal_Type', sort=False):
+                if animal not in writers:
+                    writers[animal] = pq.ParquetWriter(os.path.join(out_dir, f'{animal}.parquet'), schema)
+                writers[animal].write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+                rows_by_species[animal] += len(part)
+            if VERBOSE:
+                print(f"  chunk {i}: {total_rows} rows ingested, peak RSS {peak_rss_mb() or 0:.0f} MB")
+    finally:
+        for w in writers.values():
+            w.close()
+
+    label_encoders = {}
+    for c in CAT_COLS:
+        le = LabelEncoder()
+        le.fit(sorted(vocab[c]))
+        label_encoders[c] = le
+
+    manifest = {
+        'key': key,
+        'source': os.path.abspath(path),
+        'species': {a: {'path': os.path.join(out_dir, f'{a}.parquet'), 'rows': n} for a, n in rows_by_species.items()},
+        'medians': {c: _median_from_counts(vital_counts[c], VITAL_DEFAULTS[c]) for c in VITAL_COLS},
+        'label_encoders': label_encoders,
+        'feature_cols': [c for c in FEATURE_COLS if c in schema.names],
+        'total_rows': total_rows,
+        'peak_chunk_bytes': peak_chunk_bytes,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    joblib.dump(manifest, manifest_path)
+    print(f"Ingested {total_rows} rows into {len(writers)} species partitions under {out_dir}")
+    print(f"  Largest chunk in memory: {peak_chunk_bytes / 1e6:.2f} MB, process peak RSS: {manifest['peak_rss_mb'] or 0:.0f} MB")
+    return manifest
+
+def load_species_partition(manifest, animal):
+    """Load one species partition and finish preprocessing it (median fill, syndrome, rare-label merge, encoding)"""
+    sub = pd.read_parquet(manifest['species'][animal]['path'], engine='pyarrow')
+    for c in VITAL_COLS:
+        sub[c] = sub[c].fillna(np.float32(manifest['medians'][c]))
+    sub['Syndrome_Label'] = sub.apply(syndrome_label, axis=1)
+    sub, counts = merge_rare_labels(sub, threshold=RARE_LABEL_THRESHOLD)
+    for c, le in manifest['label_encoders'].items():
+        sub[c] = le.transform(sub[c].astype(str))
+    if VERBOSE:
+        samples, kept = counts[animal]
+        print(f"  {animal}: samples {samples}, kept disease labels {kept} (partition peak RSS {peak_rss_mb() or 0:.0f} MB)")
+    return sub
+
+# Command line
+def parse_args():
+    parser = argparse.ArgumentParser(description='Train hierarchical per-animal disease models into ./models')
+    parser.add_argument('--data', default=DATA_PATH, help='training CSV (default: %(default)s)')
+    parser.add_argument('--chunked-ingest', action='store_true',
+                        help='stream the CSV in chunks into per-species parquet partitions (bounded memory)')
+    parser.add_argument('--chunksize', type=int, default=INGEST_CHUNKSIZE, help='rows per chunk for --chunked-ingest')
+    parser.add_argument('--full-retrain', action='store_true',
+                        help='retrain every species even when its data and hyperparameters are unchanged')
+    parser.add_argument('--search', action='store_true',
+                        help='run the hyperparameter search and write tuned configs instead of training '
+                             '(with --tree-native, tunes for tree-native training)')
+    parser.add_argument('--search-budget', type=float, default=SEARCH_BUDGET_SECONDS, help='search wall-clock budget in seconds')
+    parser.add_argument('--search-workers', type=int, default=CPU_BUDGET, help='search process pool size')
+    parser.add_argument('--tree-native', action='store_true',
+                        help='train on raw features (no StandardScaler) with native categorical splits for '
+                             'Breed, Gender and Symptom_1..4')
+    parser.add_argument('--artifact-format', choices=sorted(ARTIFACT_FORMATS), default=ARTIFACT_FORMAT,
+                        help='serialization for stored model components (loaders detect it automatically)')
+    parser.add_argument('--skip-profile', action='store_true',
+                        help='do not benchmark the saved models (serving cost report)')
+    parser.add_argument('--distill', action='store_true',
+                        help='distill each disease ensemble into a single small student model')
+    parser.add_argument('--cv-folds', type=int, default=0,
+                        help='also evaluate each species with K-fold cross-validation and record it in the manifest')
+    parser.add_argument('--cv-workers', type=int, default=CPU_BUDGET, help='cross-validation process pool size')
+    parser.add_argument('--cpu-budget', type=int, default=CPU_BUDGET, help='total threads training may use')
+    parser.add_argument('--species-workers', type=int, default=SPECIES_WORKERS,
+                        help='species trained concurrently in a process pool (threads are split between them)')
+    return parser.parse_args()
 
-# Prepare model output directory
-ensure_dir('./models')
 
 # Helper: safe stratified split (if stratify not possible fallback)
 def safe_train_calib_test_split(X, y, test_size=TEST_SIZE, calib_size=CALIB_SIZE, random_state=RANDOM_STATE):
@@ -275,24 +659,16 @@ def safe_train_calib_test_split(X, y, test_size=TEST_SIZE, calib_size=CALIB_SIZE
     
     return X_train, X_calib, X_test, y_train, y_calib, y_test
 
-# Model training loop per animal
-report_summary = {}
-for animal in sorted(df['Animal_Type'].unique()):
-    sub = df[df['Animal_Type'] == animal].copy()
-    n = len(sub)
-    if n < 8:
-        print(f"\nSkipping {animal} (too few samples: {n})")
-        continue
-    print(f"\n==> Animal: {animal}")
-    print(f"  samples={n}, unique diseases={sub['Disease_Merged'].nunique()}")
-    
-    # Syndrome classifier first (multi-class small set)
-    Xs = sub[feature_cols]
-    ys_synd = sub['Syndrome_Label'].astype(str)
-    le_synd = LabelEncoder()
-    y_synd_enc = le_synd.fit_transform(ys_synd)
-    
-    # split into train/calib/test safely
+# Helpers shared by training and the hyperparameter search
+def syndrome_row_groups(sub):
+    """Row index labels of `sub` grouped by Syndrome_Label"""
+    disease_by_synd = defaultdict(list)
+    for idx, row in sub.iterrows():
+        disease_by_synd[row['Syndrome_Label']].append(idx)
+    return disease_by_synd
+
+def split_syndrome_rows(Xs, y_synd_enc):
+    """Train/calib/test split for one animal's syndrome classifier, keeping at least one test row when possible"""
     X_train_s, X_calib_s, X_test_s, y_train_s, y_calib_s, y_test_s = safe_train_calib_test_split(Xs, y_synd_enc, test_size=TEST_SIZE, calib_size=CALIB_SIZE)
     
     # Check if we have test samples
@@ -308,17 +684,356 @@ for animal in sorted(df['Animal_Type'].unique()):
             X_train_s, X_test_s, y_train_s, y_test_s = Xs, Xs[:0], y_synd_enc, y_synd_enc[:0]
             X_calib_s = X_train_s[:0]
             y_calib_s = y_train_s[:0]
+    return X_train_s, X_calib_s, X_test_s, y_train_s, y_calib_s, y_test_s
+
+def split_disease_rows(animal, synd, X_local, y_local_enc):
+    """Train/calib/test split for one (animal, syndrome) disease model, with fallbacks for tiny classes"""
+    # safe split (but may fail if classes too small)
+    try:
+        Xtr, Xcal, Xte, ytr, ycal, yte = safe_train_calib_test_split(X_local, y_local_enc, test_size=TEST_SIZE, calib_size=CALIB_SIZE)
+    except Exception as e:
+        # fallback: simple split with careful handling
+        n_samples = len(X_local)
+        if n_samples < 4:
+            # Too few samples, use all for training
+            Xtr, ytr = X_local, y_local_enc
+            Xte, yte = X_local[:0], y_local_enc[:0]
+            Xcal, ycal = X_local[:0], y_local_enc[:0]
+            if VERBOSE:
+                print(f"      WARNING: Only {n_samples} samples for {animal}/{synd}, using all for training")
+        else:
+            # Try simple split
+            try:
+                Xtr, Xte, ytr, yte = train_test_split(X_local, y_local_enc, test_size=0.2, random_state=RANDOM_STATE)
+            except Exception:
+                # Last resort: use 80% train, 20% test if possible
+                split_idx = int(0.8 * n_samples)
+                Xtr, Xte = X_local.iloc[:split_idx], X_local.iloc[split_idx:]
+                ytr, yte = y_local_enc[:split_idx], y_local_enc[split_idx:]
+            # split small portion for calibration
+            if len(Xtr) >= 3:
+                try:
+                    Xtr, Xcal, ytr, ycal = train_test_split(Xtr, ytr, test_size=0.15, random_state=RANDOM_STATE)
+                except Exception:
+                    Xcal = Xtr[:0]
+                    ycal = ytr[:0]
+            else:
+                Xcal = Xtr[:0]
+                ycal = ytr[:0]
+    return Xtr, Xcal, Xte, ytr, ycal, yte
+
+def make_scaler(tree_native=False):
+    """StandardScaler, or None in tree-native mode where every model consumes the raw features"""
+    return None if tree_native else StandardScaler()
+
+def apply_scaler(scaler, X, fit=False):
+    """Scale X; a None scaler (tree-native mode) passes the raw values through as a float array"""
+    if scaler is None:
+        return np.asarray(X, dtype=np.float64)
+    if fit:
+        return scaler.fit_transform(X)
+    return scaler.transform(X) if len(X) > 0 else X
+
+def categorical_indices(feature_cols, tree_native=False):
+    """Positions of the label-encoded categorical columns, for native categorical splits"""
+    if not tree_native:
+        return None
+    return [i for i, c in enumerate(feature_cols) if c in CAT_COLS]
+
+def native_categorical_kwargs(cat_idx, n_features):
+    """(XGBClassifier kwargs, LGBMClassifier.fit kwargs) that mark cat_idx as categorical"""
+    if not cat_idx:
+        return {}, {}
+    feature_types = ['c' if i in cat_idx else 'q' for i in range(n_features)]
+    return ({'enable_categorical': True, 'tree_method': 'hist', 'feature_types': feature_types},
+            {'categorical_feature': list(cat_idx)})
+
+# Resampling cache: RUS + SMOTE output depends only on the training rows and the sampler
+# settings, so runs that only change model hyperparameters load it from disk instead.
+RESAMPLE_CACHE_STATS = {'hits': 0, 'misses': 0, 'seconds_saved': 0.0}
+
+def resample_cache_key(Xtr_sc, ytr, cat_idx):
+    """Hash of the exact training matrix (so the data and split seed) plus every sampler setting"""
+    X = np.ascontiguousarray(Xtr_sc, dtype=np.float64)
+    h = hashlib.sha256()
+    h.update(str(X.shape).encode())
+    h.update(X.tobytes())
+    h.update(np.ascontiguousarray(ytr, dtype=np.int64).tobytes())
+    h.update(json.dumps({
+        'version': RESAMPLE_CACHE_VERSION,
+        'imblearn': imblearn.__version__,
+        'random_state': RANDOM_STATE,
+        'undersample': 'auto',
+        'smote': 'smotenc' if cat_idx else 'smote',
+        'k_neighbors': 5,
+        'cat_idx': list(cat_idx or []),
+    }, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+def balance_training_set(animal, synd, Xtr_sc, ytr, cat_idx=None):
+    """resample_training_rows through the on-disk cache; logs hits with the time they saved"""
+    if not USE_RESAMPLE_CACHE:
+        return resample_training_rows(animal, synd, Xtr_sc, ytr, cat_idx)
+    path = os.path.join(RESAMPLE_CACHE_DIR, f'{resample_cache_key(Xtr_sc, ytr, cat_idx)}.npz')
+    if os.path.exists(path):
+        t0 = time.perf_counter()
+        try:
+            with np.load(path) as cached:
+                X_res, y_res, cost = cached['X'], cached['y'], float(cached['seconds'])
+            os.utime(path)             # mtime is the LRU clock for prune_resample_cache
+            saved = max(0.0, cost - (time.perf_counter() - t0))
+            RESAMPLE_CACHE_STATS['hits'] += 1
+            RESAMPLE_CACHE_STATS['seconds_saved'] += saved
+            if VERBOSE:
+                print(f"      Resample cache hit for {animal}/{synd} ({len(y_res)} rows, saved {saved:.2f}s)")
+            return X_res, y_res
+        except Exception as e:
+            print(f"      Resample cache entry unreadable, recomputing. Reason: {e}")
+
+    t0 = time.perf_counter()
+    X_res, y_res = resample_training_rows(animal, synd, Xtr_sc, ytr, cat_idx)
+    cost = time.perf_counter() - t0
+    RESAMPLE_CACHE_STATS['misses'] += 1
+    if VERBOSE:
+        print(f"      Resample cache miss for {animal}/{synd} (resampled in {cost:.2f}s)")
+    ensure_dir(RESAMPLE_CACHE_DIR)
+    # unique temp name: CV folds and species workers may write the same entry concurrently
+    tmp = f'{path[:-4]}.{os.getpid()}.tmp.npz'
+    np.savez(tmp, X=np.asarray(X_res), y=np.asarray(y_res), seconds=cost)
+    os.replace(tmp, path)
+    return X_res, y_res
+
+def prune_resample_cache(max_bytes=RESAMPLE_CACHE_MAX_BYTES):
+    """Evict least recently used entries (oldest mtime; hits touch theirs) until the cache fits max_bytes.
+       Returns (entries kept, bytes kept, entries evicted)."""
+    if not os.path.isdir(RESAMPLE_CACHE_DIR):
+        return 0, 0, 0
+    entries = []
+    for name in os.listdir(RESAMPLE_CACHE_DIR):
+        path = os.path.join(RESAMPLE_CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if '.tmp.' in name:
+            # left behind by a writer that died mid-save; live temp files are seconds old
+            if time.time() - st.st_mtime > 3600:
+                os.remove(path)
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        evicted += 1
+    return len(entries) - evicted, total, evicted
+
+def resample_training_rows(animal, synd, Xtr_sc, ytr, cat_idx=None):
+    """Undersample the majority classes then SMOTE the minorities; falls back to the raw split.
+       With cat_idx, SMOTENC keeps synthetic categorical values on real category codes."""
+    rus = RandomUnderSampler(sampling_strategy='auto', random_state=RANDOM_STATE)
+    try:
+        X_res, y_res = rus.fit_resample(Xtr_sc, ytr)
+        # Then SMOTE if multiple classes and small minorities
+        if len(np.unique(y_res)) > 1 and min(np.bincount(y_res)) > 1:
+            if cat_idx:
+                sm = SMOTENC(categorical_features=cat_idx, random_state=RANDOM_STATE)
+            else:
+                sm = SMOTE(random_state=RANDOM_STATE)
+            X_res, y_res = sm.fit_resample(X_res, y_res)
+    except Exception as e:
+        # fallback: no resampling
+        X_res, y_res = Xtr_sc, ytr
+        if VERBOSE:
+            print(f"      (resampling fallback for {animal}/{synd}: {e})")
+    return X_res, y_res
+
+def fit_disease_ensemble(X_res, y_res, Xcal_sc, ycal, cfg, n_threads=1, verbose=VERBOSE, cat_idx=None):
+    """Fit RF/XGB/LGBM on the resampled rows, each calibrated on the held-out split when there is one"""
+    models = {}
+    xgb_native, lgbm_fit_native = native_categorical_kwargs(cat_idx, np.shape(X_res)[1])
+    # RandomForest - increased complexity for better confidence
+    rf = RandomForestClassifier(**cfg['rf'], random_state=RANDOM_STATE, n_jobs=n_threads)
+    rf.fit(X_res, y_res)
+    # Calibrate RF with held-out calibration set if possible
+    try:
+        if len(Xcal_sc) > 0 and len(ycal) > 0:
+            calib = CalibratedClassifierCV(estimator=rf, cv='prefit')
+            calib.fit(Xcal_sc, ycal)
+            rf_clf = calib
+            if verbose:
+                print("      RandomForest calibrated using held-out calibration set.")
+        else:
+            rf_clf = rf
+            if verbose:
+                print("      RandomForest calibration skipped (no calibration data).")
+    except Exception:
+        rf_clf = rf
+        if verbose:
+            print("      RandomForest calibration skipped/fallback to uncalibrated.")
+
+    models['rf'] = rf_clf
+
+    # XGBoost
+    if XGB_AVAILABLE:
+        try:
+            xgb = XGBClassifier(**cfg['xgb'], **xgb_native, random_state=RANDOM_STATE, n_jobs=n_threads)
+            xgb.fit(X_res, y_res)
+            try:
+                if len(Xcal_sc) > 0 and len(ycal) > 0:
+                    calib = CalibratedClassifierCV(estimator=xgb, cv='prefit')
+                    calib.fit(Xcal_sc, ycal)
+                    xgb_clf = calib
+                    if verbose:
+                        print("      XGBoost calibrated using held-out calibration set.")
+                else:
+                    xgb_clf = xgb
+                    if verbose:
+                        print("      XGBoost calibration skipped (no calibration data).")
+            except Exception:
+                xgb_clf = xgb
+                if verbose:
+                    print("      XGBoost calibration skipped/fallback.")
+            models['xgb'] = xgb_clf
+        except Exception as e:
+            if verbose:
+                print(f"      XGBoost train failed: {e}")
+    else:
+        if verbose:
+            print("      XGBoost not available, skipping.")
+
+    # LightGBM
+    if LGBM_AVAILABLE:
+        try:
+            # Suppress LightGBM native verbosity (C++ side)
+            lgb = LGBMClassifier(**cfg['lgbm'], random_state=RANDOM_STATE, n_jobs=n_threads)
+            lgb.fit(X_res, y_res, **lgbm_fit_native)
+            try:
+                if len(Xcal_sc) > 0 and len(ycal) > 0:
+                    calib = CalibratedClassifierCV(estimator=lgb, cv='prefit')
+                    calib.fit(Xcal_sc, ycal)
+                    lgb_clf = calib
+                    if verbose:
+                        print("      LightGBM calibrated using held-out calibration set.")
+                else:
+                    lgb_clf = lgb
+                    if verbose:
+                        print("      LightGBM calibration skipped (no calibration data).")
+            except Exception:
+                lgb_clf = lgb
+                if verbose:
+                    print("      LightGBM calibration skipped/fallback.")
+            models['lgb'] = lgb_clf
+        except Exception as e:
+            if verbose:
+                print(f"      LightGBM train failed: {e}")
+    else:
+        if verbose:
+            print("      LightGBM not available, skipping.")
+    return models
+
+# Distillation: one small student per syndrome, fit to the ensemble's soft probabilities
+def median_latency_ms(fn, X, repeats=SEARCH_LATENCY_REPEATS):
+    """Median wall time of fn(X) in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - t0)
+    return float(np.median(timings)) * 1000.0
+
+def make_student(n_threads=1):
+    if LGBM_AVAILABLE:
+        return LGBMClassifier(**STUDENT_LGBM_PARAMS, random_state=RANDOM_STATE, n_jobs=n_threads)
+    return RandomForestClassifier(**STUDENT_RF_PARAMS, random_state=RANDOM_STATE, n_jobs=n_threads)
+
+def distill_ensemble(models, X_transfer, n_classes, Xte_sc, yte, n_threads=1, cat_idx=None):
+    """Fit a student on the teacher's soft labels over the transfer set (training rows plus SMOTE points).
+       Each transfer row is repeated once per class and weighted by the teacher's probability for it.
+       Returns (student, metrics); metrics compare teacher and student on the test split."""
+    soft = ensemble_proba(models, X_transfer, n_classes)
+    X_rep = np.repeat(X_transfer, n_classes, axis=0)
+    y_rep = np.tile(np.arange(n_classes), len(X_transfer))
+    student = make_student(n_threads)
+    fit_native = native_categorical_kwargs(cat_idx, X_rep.shape[1])[1] if LGBM_AVAILABLE else {}
+    student.fit(X_rep, y_rep, sample_weight=soft.ravel(), **fit_native)
+    students = {'student': student}
+
+    metrics = {'student_type': type(student).__name__, 'transfer_rows': int(len(X_transfer))}
+    if len(yte) > 0:
+        teacher_p = ensemble_proba(models, Xte_sc, n_classes)
+        student_p = ensemble_proba(students, Xte_sc, n_classes)
+        for name, p in (('teacher', teacher_p), ('student', student_p)):
+            metrics[f'{name}_top1'] = float(accuracy_score(yte, np.argmax(p, axis=1)))
+            metrics[f'{name}_top3'] = top_k_accuracy(yte, top_k_indices(p, 3), k=3)
+        metrics['top3_gap'] = metrics['teacher_top3'] - metrics['student_top3']
+        row = Xte_sc[:1]
+    else:
+        metrics['top3_gap'] = None
+        row = X_transfer[:1]
+    metrics['teacher_ms'] = median_latency_ms(lambda X: ensemble_proba(models, X, n_classes), row)
+    metrics['student_ms'] = median_latency_ms(lambda X: ensemble_proba(students, X, n_classes), row)
+    metrics['teacher_bytes'] = len(pickle.dumps(models, protocol=pickle.HIGHEST_PROTOCOL))
+    metrics['student_bytes'] = len(pickle.dumps(student, protocol=pickle.HIGHEST_PROTOCOL))
+    # only validated students are eligible to serve
+    metrics['within_gap'] = metrics['top3_gap'] is not None and metrics['top3_gap'] <= DISTILL_MAX_GAP
+    return student, metrics
+
+def print_distill_report(species_report):
+    rows = [(a, s, m['distill']) for a, info in sorted(species_report.items()) if info.get('status') == 'retrained'
+            for s, m in sorted(((info.get('metrics') or {}).get('syndromes') or {}).items()) if 'distill' in m]
+    if not rows:
+        return
+    print(f"\nDistillation (teacher vs student, Top-3 gap allowed {DISTILL_MAX_GAP:.3f}):")
+    print(f"  {'Species':<8} {'Syndrome':<12} {'Top-3 T/S':>13} {'Latency ms T/S':>16} {'Size KB T/S':>15} {'Serve':>6}")
+    for animal, synd, d in rows:
+        acc = f"{d['teacher_top3']:.3f}/{d['student_top3']:.3f}" if d['top3_gap'] is not None else 'n/a'
+        print(f"  {animal:<8} {synd:<12} {acc:>13} {d['teacher_ms']:>7.2f}/{d['student_ms']:<8.2f} "
+              f"{d['teacher_bytes'] / 1024:>7.0f}/{d['student_bytes'] / 1024:<7.0f} {'yes' if d['within_gap'] else 'no':>6}")
+
+# Per-animal training: syndrome classifier, then one calibrated ensemble per syndrome
+def train_animal(animal, sub, feature_cols, label_encoders, tuned=None, n_threads=1, distill=False, tree_native=False,
+                 artifact_format=ARTIFACT_FORMAT):
+    """Train one animal and put its components into the artifact store under MODELS_DIR.
+       `tuned` maps syndrome -> search winner overrides (see --search); every estimator uses n_threads.
+       With distill, each ensemble also gets a student model (see distill_ensemble).
+       With tree_native, no scalers are fitted (saved as None) and categoricals are split natively.
+       Returns (metrics summary, store entry), or (None, None) when the animal has too few samples."""
+    n = len(sub)
+    if n < 8:
+        print(f"\nSkipping {animal} (too few samples: {n})")
+        return None, None
+    print(f"\n==> Animal: {animal}")
+    print(f"  samples={n}, unique diseases={sub['Disease_Merged'].nunique()}")
+    summary = {'samples': int(n), 'diseases': int(sub['Disease_Merged'].nunique()), 'syndrome_accuracy': None, 'syndromes': {}}
+    cache_before = dict(RESAMPLE_CACHE_STATS)
+    
+    # Syndrome classifier first (multi-class small set)
+    Xs = sub[feature_cols]
+    ys_synd = sub['Syndrome_Label'].astype(str)
+    le_synd = LabelEncoder()
+    y_synd_enc = le_synd.fit_transform(ys_synd)
+    
+    # split into train/calib/test safely
+    X_train_s, X_calib_s, X_test_s, y_train_s, y_calib_s, y_test_s = split_syndrome_rows(Xs, y_synd_enc)
     
     # scale
-    scaler_synd = StandardScaler()
-    X_train_s_sc = scaler_synd.fit_transform(X_train_s)
-    X_calib_s_sc = scaler_synd.transform(X_calib_s) if len(X_calib_s) > 0 else X_calib_s
-    X_test_s_sc = scaler_synd.transform(X_test_s) if len(X_test_s) > 0 else X_test_s
+    cat_idx = categorical_indices(feature_cols, tree_native)
+    scaler_synd = make_scaler(tree_native)
+    X_train_s_sc = apply_scaler(scaler_synd, X_train_s, fit=True)
+    X_calib_s_sc = apply_scaler(scaler_synd, X_calib_s)
+    X_test_s_sc = apply_scaler(scaler_synd, X_test_s)
 
     # Train base syndrome model (RandomForest) — simple & robust
     # Increased n_estimators and added max_depth for better confidence
-    rf_synd = RandomForestClassifier(n_estimators=300, max_depth=15, min_samples_split=2, 
-                                      class_weight='balanced', random_state=RANDOM_STATE)
+    rf_synd = RandomForestClassifier(**RF_PARAMS, random_state=RANDOM_STATE, n_jobs=n_threads)
     rf_synd.fit(X_train_s_sc, y_train_s)
     
     # Calibrate using held-out calibration set (cv='prefit')
@@ -341,6 +1056,7 @@ for animal in sorted(df['Animal_Type'].unique()):
     if len(X_test_s_sc) > 0 and len(y_test_s) > 0:
         ypred_s = synd_clf.predict(X_test_s_sc)
         acc_s = accuracy_score(y_test_s, ypred_s)
+        summary['syndrome_accuracy'] = float(acc_s)
         print(f"    Syndrome test accuracy: {acc_s:.3f}")
         try:
             print("    Syndrome classification report:")
@@ -350,15 +1066,8 @@ for animal in sorted(df['Animal_Type'].unique()):
     else:
         print("    No test samples for syndrome evaluation")
 
-    # Save syndrome artifacts
-    animal_dir = os.path.join('models', animal)
-    ensure_dir(animal_dir)
-    joblib.dump({'classifier': synd_clf, 'scaler': scaler_synd, 'label_encoder': le_synd}, os.path.join(animal_dir, 'syndrome_clf.joblib'))
-
     # Now train disease classifiers per-syndrome for this animal
-    disease_by_synd = defaultdict(list)
-    for idx, row in sub.iterrows():
-        disease_by_synd[row['Syndrome_Label']].append(idx)
+    disease_by_synd = syndrome_row_groups(sub)
 
     disease_models = {}
     # For easier mapping ensure label encoders for disease within this animal+syndrome
@@ -382,38 +1091,7 @@ for animal in sorted(df['Animal_Type'].unique()):
         y_local_enc = le_d.fit_transform(y_local)
         X_local = rows[feature_cols]
         
-        # safe split (but may fail if classes too small)
-        try:
-            Xtr, Xcal, Xte, ytr, ycal, yte = safe_train_calib_test_split(X_local, y_local_enc, test_size=TEST_SIZE, calib_size=CALIB_SIZE)
-        except Exception as e:
-            # fallback: simple split with careful handling
-            n_samples = len(X_local)
-            if n_samples < 4:
-                # Too few samples, use all for training
-                Xtr, ytr = X_local, y_local_enc
-                Xte, yte = X_local[:0], y_local_enc[:0]
-                Xcal, ycal = X_local[:0], y_local_enc[:0]
-                if VERBOSE:
-                    print(f"      WARNING: Only {n_samples} samples for {animal}/{synd}, using all for training")
-            else:
-                # Try simple split
-                try:
-                    Xtr, Xte, ytr, yte = train_test_split(X_local, y_local_enc, test_size=0.2, random_state=RANDOM_STATE)
-                except Exception:
-                    # Last resort: use 80% train, 20% test if possible
-                    split_idx = int(0.8 * n_samples)
-                    Xtr, Xte = X_local.iloc[:split_idx], X_local.iloc[split_idx:]
-                    ytr, yte = y_local_enc[:split_idx], y_local_enc[split_idx:]
-                # split small portion for calibration
-                if len(Xtr) >= 3:
-                    try:
-                        Xtr, Xcal, ytr, ycal = train_test_split(Xtr, ytr, test_size=0.15, random_state=RANDOM_STATE)
-                    except Exception:
-                        Xcal = Xtr[:0]
-                        ycal = ytr[:0]
-                else:
-                    Xcal = Xtr[:0]
-                    ycal = ytr[:0]
+        Xtr, Xcal, Xte, ytr, ycal, yte = split_disease_rows(animal, synd, X_local, y_local_enc)
 
         # Check if we have training data
         if len(Xtr) == 0:
@@ -422,106 +1100,17 @@ for animal in sorted(df['Animal_Type'].unique()):
             continue
             
         # scaling
-        scaler = StandardScaler()
-        Xtr_sc = scaler.fit_transform(Xtr)
-        Xcal_sc = scaler.transform(Xcal) if len(Xcal) > 0 else Xcal
-        Xte_sc = scaler.transform(Xte) if len(Xte) > 0 else Xte
+        scaler = make_scaler(tree_native)
+        Xtr_sc = apply_scaler(scaler, Xtr, fit=True)
+        Xcal_sc = apply_scaler(scaler, Xcal)
+        Xte_sc = apply_scaler(scaler, Xte)
 
         # Balance: undersample majority then SMOTE
-        rus = RandomUnderSampler(sampling_strategy='auto', random_state=RANDOM_STATE)
-        try:
-            X_res, y_res = rus.fit_resample(Xtr_sc, ytr)
-            # Then SMOTE if multiple classes and small minorities
-            if len(np.unique(y_res)) > 1 and min(np.bincount(y_res)) > 1:
-                sm = SMOTE(random_state=RANDOM_STATE)
-                X_res, y_res = sm.fit_resample(X_res, y_res)
-        except Exception as e:
-            # fallback: no resampling
-            X_res, y_res = Xtr_sc, ytr
-            if VERBOSE:
-                print(f"      (resampling fallback for {animal}/{synd}: {e})")
+        X_res, y_res = balance_training_set(animal, synd, Xtr_sc, ytr, cat_idx=cat_idx)
 
         # Train ensemble of 3 base estimators (RF, XGB, LGBM) and average predicted probabilities
-        models = {}
-        # RandomForest - increased complexity for better confidence
-        rf = RandomForestClassifier(n_estimators=300, max_depth=15, min_samples_split=2,
-                                     class_weight='balanced', random_state=RANDOM_STATE)
-        rf.fit(X_res, y_res)
-        # Calibrate RF with held-out calibration set if possible
-        try:
-            if len(Xcal_sc) > 0 and len(ycal) > 0:
-                calib = CalibratedClassifierCV(estimator=rf, cv='prefit')
-                calib.fit(Xcal_sc, ycal)
-                rf_clf = calib
-                if VERBOSE:
-                    print("      RandomForest calibrated using held-out calibration set.")
-            else:
-                rf_clf = rf
-                if VERBOSE:
-                    print("      RandomForest calibration skipped (no calibration data).")
-        except Exception:
-            rf_clf = rf
-            if VERBOSE:
-                print("      RandomForest calibration skipped/fallback to uncalibrated.")
-
-        models['rf'] = rf_clf
-
-        # XGBoost
-        if XGB_AVAILABLE:
-            try:
-                xgb = XGBClassifier(n_estimators=150, use_label_encoder=False, eval_metric='mlogloss', random_state=RANDOM_STATE)
-                xgb.fit(X_res, y_res)
-                try:
-                    if len(Xcal_sc) > 0 and len(ycal) > 0:
-                        calib = CalibratedClassifierCV(estimator=xgb, cv='prefit')
-                        calib.fit(Xcal_sc, ycal)
-                        xgb_clf = calib
-                        if VERBOSE:
-                            print("      XGBoost calibrated using held-out calibration set.")
-                    else:
-                        xgb_clf = xgb
-                        if VERBOSE:
-                            print("      XGBoost calibration skipped (no calibration data).")
-                except Exception:
-                    xgb_clf = xgb
-                    if VERBOSE:
-                        print("      XGBoost calibration skipped/fallback.")
-                models['xgb'] = xgb_clf
-            except Exception as e:
-                if VERBOSE:
-                    print(f"      XGBoost train failed: {e}")
-        else:
-            if VERBOSE:
-                print("      XGBoost not available, skipping.")
-
-        # LightGBM
-        if LGBM_AVAILABLE:
-            try:
-                # Suppress LightGBM native verbosity (C++ side)
-                lgb = LGBMClassifier(n_estimators=150, class_weight='balanced', random_state=RANDOM_STATE, verbosity=-1)
-                lgb.fit(X_res, y_res)
-                try:
-                    if len(Xcal_sc) > 0 and len(ycal) > 0:
-                        calib = CalibratedClassifierCV(estimator=lgb, cv='prefit')
-                        calib.fit(Xcal_sc, ycal)
-                        lgb_clf = calib
-                        if VERBOSE:
-                            print("      LightGBM calibrated using held-out calibration set.")
-                    else:
-                        lgb_clf = lgb
-                        if VERBOSE:
-                            print("      LightGBM calibration skipped (no calibration data).")
-                except Exception:
-                    lgb_clf = lgb
-                    if VERBOSE:
-                        print("      LightGBM calibration skipped/fallback.")
-                models['lgb'] = lgb_clf
-            except Exception as e:
-                if VERBOSE:
-                    print(f"      LightGBM train failed: {e}")
-        else:
-            if VERBOSE:
-                print("      LightGBM not available, skipping.")
+        cfg = estimator_params((tuned or {}).get(synd))
+        models = fit_disease_ensemble(X_res, y_res, Xcal_sc, ycal, cfg, n_threads=n_threads, cat_idx=cat_idx)
 
         # Evaluate only if we have test data
         if len(yte) > 0 and len(Xte_sc) > 0:
@@ -553,8 +1142,9 @@ for animal in sorted(df['Animal_Type'].unique()):
             preds_top1 = np.argmax(avgp, axis=1)
             acc_top1 = accuracy_score(yte, preds_top1)
             # top-3
-            top3 = np.argsort(avgp, axis=1)[:, ::-1][:, :3]
+            top3 = top_k_indices(avgp, 3)
             acc_top3 = top_k_accuracy(yte, top3, k=3)
+            summary['syndromes'][synd] = {'top1': float(acc_top1), 'top3': float(acc_top3), 'test_samples': int(len(yte))}
             print(f"      Syndrome '{synd}': disease Top-1={acc_top1:.3f}, Top-3={acc_top3:.3f} (test_samples={len(yte)})")
         else:
             # No test data, but we still want to save the model
@@ -569,36 +1159,47 @@ for animal in sorted(df['Animal_Type'].unique()):
             'scaler': scaler
         }
 
-        # Save per-syndrome artifact
-        joblib.dump({
-            'models': models,
-            'label_encoder': le_d,
-            'scaler': scaler
-        }, os.path.join(animal_dir, f'disease_models_{synd}.joblib'))
+        if distill and models:
+            student, distill_metrics = distill_ensemble(models, np.vstack([X_res, Xtr_sc]), len(le_d.classes_),
+                                                        Xte_sc, yte, n_threads=n_threads, cat_idx=cat_idx)
+            disease_models[synd]['student'] = student
+            disease_models[synd]['student_metrics'] = distill_metrics
+            summary['syndromes'].setdefault(synd, {})['distill'] = distill_metrics
+            if VERBOSE:
+                gap = distill_metrics['top3_gap']
+                print(f"      Student {distill_metrics['student_type']}: Top-3 gap "
+                      f"{'n/a' if gap is None else f'{gap:+.3f}'}, {distill_metrics['student_ms']:.2f} ms "
+                      f"vs {distill_metrics['teacher_ms']:.2f} ms per row")
+
+    # Each component is stored once under its content hash; the shared encoders dedupe across species
+    entry = ArtifactStore(MODELS_DIR, fmt=artifact_format).put_species(
+        {'classifier': synd_clf, 'scaler': scaler_synd, 'label_encoder': le_synd},
+        disease_models, label_encoders, feature_cols, tree_native=tree_native)
 
-    # Save per-animal disease_models mapping & encoders
-    joblib.dump({
-        'disease_models': disease_models,
-        'syndrome_encoder': le_synd,
-        'syndrome_scaler': scaler_synd,
-        'feature_columns': feature_cols,
-        'label_encoders_cat': label_encoders
-    }, os.path.join(animal_dir, 'animal_artifacts.joblib'))
+    summary['resample_cache'] = {k: RESAMPLE_CACHE_STATS[k] - cache_before[k] for k in cache_before}
+    return summary, entry
 
-print("\n✅ Finished training for all animals.")
-print("All artifacts saved to ./models\n")
+def train_animal_timed(animal, sub, feature_cols, label_encoders, tuned, n_threads, distill=False, tree_native=False,
+                       artifact_format=ARTIFACT_FORMAT):
+    """train_animal under a thread cap, returning (summary, store entry, seconds); also the species-pool task"""
+    t0 = time.time()
+    with limit_threads(n_threads):
+        summary, entry = train_animal(animal, sub, feature_cols, label_encoders, tuned=tuned, n_threads=n_threads,
+                                      distill=distill, tree_native=tree_native, artifact_format=artifact_format)
+    return summary, entry, round(time.time() - t0, 3)
 
 # Example predict function to use artifacts
 def predict_animal(animal, sample_dict):
     """sample_dict must contain feature fields used in feature_cols (or will be defaulted)"""
-    art_path = os.path.join('models', animal, 'animal_artifacts.joblib')
-    if not os.path.exists(art_path):
+    loaded = ArtifactStore(MODELS_DIR).load_species(animal)
+    if loaded is None:
         return {'error': f'No model for {animal}'}
-    art = joblib.load(art_path)
-    sy_clf_bundle = joblib.load(os.path.join('models', animal, 'syndrome_clf.joblib'))
+    art, sy_clf_bundle = loaded
     synd_clf = sy_clf_bundle['classifier']
     synd_scaler = sy_clf_bundle['scaler']
     le_synd = art['syndrome_encoder']
+    feature_cols = art['feature_columns']
+    label_encoders = art['label_encoders_cat']
     # build input df
     row = {}
     for c in feature_cols:
@@ -614,13 +1215,14 @@ def predict_animal(animal, sample_dict):
                 val = 0
         row[c] = val
     X = pd.DataFrame([row])[feature_cols]
-    Xs = synd_scaler.transform(X)
+    X_raw = X.to_numpy(dtype=np.float64) if art.get('tree_native') else None
+    Xs = synd_scaler.transform(X) if synd_scaler is not None else X_raw
     synd_proba = synd_clf.predict_proba(Xs)[0] if hasattr(synd_clf, 'predict_proba') else None
     synd_idx = synd_proba.argmax() if synd_proba is not None else synd_clf.predict(Xs)[0]
     synd_label = le_synd.inverse_transform([synd_idx])[0]
     synd_conf = float(synd_proba.max()) if synd_proba is not None else 1.0
     # disease stage
-    dm = joblib.load(os.path.join('models', animal, 'animal_artifacts.joblib'))['disease_models']
+    dm = art['disease_models']
     # find disease model for that syndrome (fallback to 'Multi' if not present)
     if synd_label not in dm:
         chosen = 'Multi' if 'Multi' in dm else list(dm.keys())[0]
@@ -633,7 +1235,7 @@ def predict_animal(animal, sample_dict):
         return {'animal_type': animal, 'syndrome': chosen, 'syndrome_conf': synd_conf, 'predicted_disease': 'Other', 'confidence': 1.0, 'top_3': [{'disease': 'Other', 'probability': 1.0}]}
     # otherwise ensemble
     scaler = model_info['scaler']
-    X_sc = scaler.transform(X)
+    X_sc = scaler.transform(X) if scaler is not None else X_raw
     models = model_info['models']
     prob_list = []
     le_d = model_info['label_encoder']
@@ -648,24 +1250,721 @@ def predict_animal(animal, sample_dict):
     avgp = np.mean(np.stack(prob_list, axis=0), axis=0)
     best_idx = int(np.argmax(avgp))
     predicted = le_d.inverse_transform([best_idx])[0]
-    top_idx = np.argsort(avgp)[::-1][:3]
+    top_idx = top_k_indices(avgp[np.newaxis, :], 3)[0]
     top3 = [{'disease': le_d.inverse_transform([int(i)])[0], 'probability': float(avgp[int(i)])} for i in top_idx]
     return {'animal_type': animal, 'syndrome': chosen, 'syndrome_conf': synd_conf, 'predicted_disease': predicted, 'confidence': float(avgp[best_idx]), 'top_3': top3}
 
-# Example usage (sample)
-sample = {
-    'Breed': 'Labrador', 'Age': 5, 'Gender': 'Male', 'Weight': 30,
-    'Symptom_1': 'Cough', 'Symptom_2': 'Lethargy', 'Symptom_3': 'Loss of appetite', 'Symptom_4': 'Nasal discharge',
-    'Duration_days': 7, 'Appetite_Loss': 1, 'Vomiting': 0, 'Diarrhea': 0, 'Coughing': 1, 'Labored_Breathing': 1,
-    'Lameness': 0, 'Skin_Lesions': 0, 'Nasal_Discharge': 1, 'Eye_Discharge': 0, 'Body_Temperature': 39.8, 'Heart_Rate': 110
-}
-# Ensure categorical fields transformed to encoded ints where possible
-for c in ['Breed','Gender','Symptom_1','Symptom_2','Symptom_3','Symptom_4']:
-    if c in sample and c in label_encoders:
+# Incremental retraining: a species is rebuilt only when its fingerprint changes
+def training_hyperparams(tuned=None, distill=False, tree_native=False):
+    """Everything besides the data that determines a species' trained artifacts"""
+    return {
+        'tree_native': bool(tree_native),
+        'distill': {'max_gap': DISTILL_MAX_GAP, 'lgbm': STUDENT_LGBM_PARAMS if LGBM_AVAILABLE else None,
+                    'rf': STUDENT_RF_PARAMS} if distill else None,
+        'tuned': {synd: {est: cfg.get(est, {}) for est in ('rf', 'xgb', 'lgbm')} for synd, cfg in (tuned or {}).items()},
+        'format_version': MODEL_FORMAT_VERSION,
+        'random_state': RANDOM_STATE,
+        'test_size': TEST_SIZE,
+        'calib_size': CALIB_SIZE,
+        'rare_label_threshold': RARE_LABEL_THRESHOLD,
+        'rf': RF_PARAMS,
+        'xgb': XGB_PARAMS if XGB_AVAILABLE else None,
+        'lgbm': LGBM_PARAMS if LGBM_AVAILABLE else None,
+    }
+
+def species_fingerprint(sub, feature_cols, hyperparams):
+    """Hash of one species' preprocessed training rows plus the hyperparameters used on them"""
+    cols = list(feature_cols) + ['Syndrome_Label', 'Disease_Merged']
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(sub[cols], index=False).values.tobytes())
+    h.update(json.dumps({'columns': cols, 'hyperparams': hyperparams}, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:16]
+
+def load_model_manifest():
+    path = os.path.join(MODELS_DIR, 'manifest.json')
+    if not os.path.exists(path):
+        return {'version': 0, 'species': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def publish_model_manifest(manifest):
+    """Atomically replace models/manifest.json so readers never see a half-written version"""
+    path = os.path.join(MODELS_DIR, 'manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def refresh_label_encoders(store, entry, label_encoders):
+    """A reused species keeps its models, but must point at the current categorical encoders
+       (storing them again is free when they are unchanged: same content, same digest)"""
+    return dict(entry, label_encoders_cat=store.put(label_encoders))
+
+def store_usage(store, species_entries):
+    """(component references, unique objects, referenced bytes, stored bytes) for one version"""
+    refs = [d for entry in species_entries for d in store.entry_digests(entry)]
+    unique = set(refs)
+    return (len(refs), len(unique), sum(store.object_size(d) for d in refs),
+            sum(store.object_size(d) for d in unique))
+
+def print_resample_cache_usage(usage):
+    kept, size, evicted = usage
+    print(f"  Resample cache on disk: {kept} entries, {size / 1e6:.1f} MB (cap {RESAMPLE_CACHE_MAX_BYTES / 1e6:.0f} MB)"
+          + (f", {evicted} least recently used evicted" if evicted else ""))
+
+def print_run_summary(species_report, wall_seconds, resample_usage=None):
+    print("\nTraining run summary:")
+    print(f"  {'Species':<10} {'Status':<10} {'Train time (s)':>14}")
+    saved = 0.0
+    for animal, info in sorted(species_report.items()):
+        secs = info.get('train_seconds') or 0.0
+        print(f"  {animal:<10} {info['status']:<10} {secs:>14.1f}")
+        if info['status'] == 'reused':
+            saved += secs
+    print(f"  Wall time: {wall_seconds:.1f}s, time saved by reusing unchanged species: {saved:.1f}s")
+    # only species trained in this run count; reused ones carry their original run's numbers
+    cache = [info['metrics']['resample_cache'] for info in species_report.values()
+             if info['status'] == 'retrained' and (info.get('metrics') or {}).get('resample_cache')]
+    if cache:
+        hits, misses = sum(c['hits'] for c in cache), sum(c['misses'] for c in cache)
+        print(f"  Resample cache: {hits} hits, {misses} misses, "
+              f"{sum(c['seconds_saved'] for c in cache):.1f}s of RUS+SMOTE saved")
+    if resample_usage:
+        print_resample_cache_usage(resample_usage)
+
+# Hyperparameter search: successive halving per (species, syndrome) on a process pool,
+# scored on validation Top-3 accuracy (Top-1 with 3 or fewer diseases, where Top-3 is
+# always 1.0) penalised by single-row latency and pickled size.
+def estimator_params(override=None):
+    """Base-estimator kwargs for one disease ensemble, with any tuned values layered on top"""
+    override = override or {}
+    return {
+        'rf': {**RF_PARAMS, **override.get('rf', {})},
+        'xgb': {**XGB_PARAMS, **override.get('xgb', {})},
+        'lgbm': {**LGBM_PARAMS, **override.get('lgbm', {})},
+    }
+
+def load_tuned_params(path=TUNED_PARAMS_PATH, tree_native=False):
+    """{animal: {syndrome: {'rf': {...}, 'xgb': {...}, 'lgbm': {...}, <search metrics>}}} written by --search.
+       Configs tuned in the other feature space (scaled vs --tree-native) are ignored."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        tuned = json.load(f)
+    if bool(tuned.get('tree_native', False)) != bool(tree_native):
+        print(f"Ignoring {path}: it was tuned {'with' if tuned.get('tree_native') else 'without'} --tree-native")
+        return {}
+    return tuned.get('species', {})
+
+def sample_search_candidates(n, rng):
+    """Current defaults first, then up to n-1 distinct random draws from SEARCH_SPACE"""
+    candidates = [{'rf': {}, 'xgb': {}, 'lgbm': {}}]
+    seen = {json.dumps(candidates[0], sort_keys=True)}
+    for _ in range(n * 20):
+        if len(candidates) >= n:
+            break
+        cand = {est: {p: values[rng.randint(len(values))] for p, values in space.items()}
+                for est, space in SEARCH_SPACE.items()}
+        key = json.dumps(cand, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(cand)
+    return candidates
+
+def ensemble_proba(models, X, n_classes):
+    """Average predict_proba over the ensemble, aligning each model's classes_ to 0..n_classes-1"""
+    total = np.zeros((len(X), n_classes))
+    used = 0
+    for m in models.values():
+        p = m.predict_proba(X)
+        classes = np.asarray(m.classes_, dtype=int)
+        if p.shape[1] != len(classes):
+            # a prefit calibrator can disagree with its base model when a fold saw a single class
+            continue
+        total[:, classes] += p
+        used += 1
+    return total / max(used, 1)
+
+def prepare_search_data(animal, synd, rows, feature_cols, tree_native=False):
+    """Same split/scale/resample as train_animal; the calibration split doubles as the validation set"""
+    y_local = rows['Disease_Merged'].astype(str)
+    if y_local.nunique() == 1:
+        return None
+    le_d = LabelEncoder()
+    y_local_enc = le_d.fit_transform(y_local)
+    Xtr, Xcal, Xte, ytr, ycal, yte = split_disease_rows(animal, synd, rows[feature_cols], y_local_enc)
+    if len(Xtr) == 0 or len(Xcal) == 0:
+        return None
+    cat_idx = categorical_indices(feature_cols, tree_native)
+    scaler = make_scaler(tree_native)
+    Xtr_sc = apply_scaler(scaler, Xtr, fit=True)
+    X_res, y_res = balance_training_set(animal, synd, Xtr_sc, ytr, cat_idx=cat_idx)
+    return {'X_res': np.asarray(X_res), 'y_res': np.asarray(y_res), 'X_val': apply_scaler(scaler, Xcal),
+            'y_val': np.asarray(ycal), 'n_classes': len(le_d.classes_), 'cat_idx': cat_idx}
+
+def evaluate_search_candidate(data, candidate, fraction):
+    """Fit one candidate ensemble on `fraction` of the resampled training rows (runs in a worker process)"""
+    warnings.filterwarnings('ignore')
+    X, y, n_classes = data['X_res'], data['y_res'], data['n_classes']
+    n_keep = max(int(round(len(y) * fraction)), 2 * n_classes)
+    if n_keep < len(y):
+        try:
+            X, _, y, _ = train_test_split(X, y, train_size=n_keep, stratify=y, random_state=RANDOM_STATE)
+        except ValueError:
+            X, _, y, _ = train_test_split(X, y, train_size=n_keep, random_state=RANDOM_STATE)
+
+    cfg = estimator_params(candidate)
+    xgb_native, lgbm_fit_native = native_categorical_kwargs(data['cat_idx'], X.shape[1])
+    estimators = {'rf': RandomForestClassifier(**cfg['rf'], random_state=RANDOM_STATE, n_jobs=1)}
+    if XGB_AVAILABLE:
+        estimators['xgb'] = XGBClassifier(**cfg['xgb'], **xgb_native, random_state=RANDOM_STATE, n_jobs=1)
+    if LGBM_AVAILABLE:
+        estimators['lgb'] = LGBMClassifier(**cfg['lgbm'], random_state=RANDOM_STATE, n_jobs=1)
+    models = {}
+    for name, est in estimators.items():
+        try:
+            est.fit(X, y, **(lgbm_fit_native if name == 'lgb' else {}))
+            models[name] = est
+        except Exception:
+            # e.g. XGBoost refuses non-contiguous labels on a small subsample; train_animal drops it the same way
+            pass
+    if not models:
+        return None
+
+    proba = ensemble_proba(models, data['X_val'], n_classes)
+    top3 = top_k_accuracy(data['y_val'], top_k_indices(proba, 3), k=3)
+    top1 = accuracy_score(data['y_val'], np.argmax(proba, axis=1))
+    latency_ms = median_latency_ms(lambda X: ensemble_proba(models, X, n_classes), data['X_val'][:1])
+    size_bytes = len(pickle.dumps(models, protocol=pickle.HIGHEST_PROTOCOL))
+    metric = 'top3' if n_classes > 3 else 'top1'
+    accuracy = top3 if metric == 'top3' else top1
+    score = accuracy - SEARCH_LATENCY_WEIGHT * latency_ms - SEARCH_SIZE_WEIGHT * size_bytes / 1e6
+    return {'score': float(score), 'metric': metric, 'top3': float(top3), 'top1': float(top1),
+            'latency_ms': latency_ms, 'size_bytes': size_bytes, 'estimators': sorted(models)}
+
+def run_hyperparameter_search(species_names, species_frame, feature_cols, budget_seconds, workers, tree_native=False):
+    """Successive halving over SEARCH_CANDIDATES configs for every (species, syndrome) bracket.
+       All brackets share one process pool; only brackets that finished the last rung (full data)
+       when the budget runs out replace their previous/default config."""
+    deadline = time.time() + budget_seconds
+    candidates = sample_search_candidates(SEARCH_CANDIDATES, np.random.RandomState(RANDOM_STATE))
+    fractions = [1.0 / SEARCH_ETA ** k for k in reversed(range(SEARCH_RUNGS))]
+
+    brackets = {}
+    for animal in species_names:
+        sub = species_frame(animal)
+        if len(sub) < 8:
+            continue
+        for synd, idxs in syndrome_row_groups(sub).items():
+            data = prepare_search_data(animal, synd, sub.loc[idxs], feature_cols, tree_native)
+            if data is not None:
+                brackets[(animal, synd)] = {'data': data, 'alive': list(range(len(candidates))),
+                                            'rung': 0, 'outstanding': 0, 'scores': {}, 'best': None}
+    print(f"\nHyperparameter search{' (tree-native)' if tree_native else ''}: {len(brackets)} (species, syndrome) "
+          f"brackets, {len(candidates)} candidates, rungs at {[round(f, 3) for f in fractions]} of the data, "
+          f"budget {budget_seconds:.0f}s, {workers} workers")
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker_threads, initargs=(1,))
+    pending = {}
+
+    def submit(key, cid):
+        state = brackets[key]
+        fut = pool.submit(evaluate_search_candidate, state['data'], candidates[cid], fractions[state['rung']])
+        pending[fut] = (key, cid)
+
+    def start_rung(key):
+        state = brackets[key]
+        state['scores'] = {}
+        state['outstanding'] = len(state['alive'])
+        for cid in state['alive']:
+            submit(key, cid)
+
+    try:
+        # first rung is queued round-robin so a short budget still covers every bracket
+        for key in brackets:
+            brackets[key]['outstanding'] = len(candidates)
+        for cid in range(len(candidates)):
+            for key in brackets:
+                submit(key, cid)
+        while pending:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                print("  Search budget exhausted; brackets still on an early rung keep their previous/default config.")
+                break
+            done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+            for fut in done:
+                key, cid = pending.pop(fut)
+                state = brackets[key]
+                state['outstanding'] -= 1
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    result = None
+                    if VERBOSE:
+                        print(f"  candidate {cid} failed for {key[0]}/{key[1]}: {e}")
+                if result is not None:
+                    state['scores'][cid] = result
+                    best = state['best']
+                    # later rungs (more data) always supersede earlier ones
+                    if best is None or best['rung'] < state['rung'] or best['score'] < result['score']:
+                        state['best'] = dict(result, rung=state['rung'], fraction=fractions[state['rung']], candidate=cid)
+                if state['outstanding'] == 0:
+                    ranked = sorted(state['scores'], key=lambda c: state['scores'][c]['score'], reverse=True)
+                    if state['rung'] + 1 < len(fractions) and len(ranked) > 1:
+                        state['alive'] = ranked[:max(1, len(ranked) // SEARCH_ETA)]
+                        state['rung'] += 1
+                        start_rung(key)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # configs from the other feature space are dropped: one file describes one training mode
+    tuned = {'species': load_tuned_params(tree_native=tree_native), 'tree_native': bool(tree_native)}
+    final_rung = len(fractions) - 1
+    updated = 0
+    print(f"\n  {'Species':<8} {'Syndrome':<15} {'Rung':>4} {'Scored':>6} {'Top-3':>6} {'Top-1':>6} {'Lat ms':>7} "
+          f"{'Size KB':>8}")
+    for (animal, synd), state in sorted(brackets.items()):
+        best = state['best']
+        if best is None:
+            print(f"  {animal:<8} {synd:<15} (no completed evaluations, keeping previous/default config)")
+            continue
+        row = (f"  {animal:<8} {synd:<15} {best['rung']:>4} {best['metric']:>6} {best['top3']:>6.3f} {best['top1']:>6.3f} "
+               f"{best['latency_ms']:>7.2f} {best['size_bytes'] / 1024:>8.0f}")
+        if best['rung'] < final_rung:
+            # a winner fit on a fraction of the rows says little about the full-data model
+            print(f"{row}  (not saved: stopped before rung {final_rung})")
+            continue
+        tuned['species'].setdefault(animal, {})[synd] = dict(candidates[best['candidate']], **{
+            k: best[k] for k in ('score', 'metric', 'top3', 'top1', 'latency_ms', 'size_bytes', 'rung', 'fraction')})
+        updated += 1
+        print(row)
+
+    if not updated:
+        print(f"\nNo bracket finished every rung within {budget_seconds:.0f}s; {TUNED_PARAMS_PATH} left unchanged. "
+              f"Raise --search-budget or --search-workers.")
+        return
+    ensure_dir(os.path.dirname(TUNED_PARAMS_PATH))
+    tuned['searched_at'] = datetime.now().isoformat(timespec='seconds')
+    tuned['objective'] = {'latency_weight_per_ms': SEARCH_LATENCY_WEIGHT, 'size_weight_per_mb': SEARCH_SIZE_WEIGHT}
+    with open(TUNED_PARAMS_PATH + '.tmp', 'w') as f:
+        json.dump(tuned, f, indent=2, sort_keys=True)
+    os.replace(TUNED_PARAMS_PATH + '.tmp', TUNED_PARAMS_PATH)
+    print(f"\nWinning configs for {updated} of {len(brackets)} brackets written to {TUNED_PARAMS_PATH}; "
+          f"the next training run will use them.")
+
+# Cross-validation: k stratified folds per (species, syndrome), evaluated concurrently on a
+# process pool; out-of-fold hits are pooled and reported with Wilson 95% intervals.
+def wilson_interval(hits, n, z=1.96):
+    """95% score interval for a binomial proportion; stays inside [0, 1] for tiny n"""
+    if n == 0:
+        return [None, None]
+    p = hits / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return [float(max(0.0, centre - half)), float(min(1.0, centre + half))]
+
+def cv_stat(hits, n, fold_scores):
+    return {'mean': float(hits / n) if n else None, 'ci95': wilson_interval(hits, n),
+            'fold_std': float(np.std(fold_scores)) if len(fold_scores) > 1 else None}
+
+def cv_splits(y, folds):
+    """Stratified k-fold index pairs; plain shuffled k-fold when no class has `folds` members"""
+    k = min(folds, len(y))
+    if k < 2:
+        return []
+    try:
+        return list(StratifiedKFold(n_splits=k, shuffle=True, random_state=RANDOM_STATE).split(np.zeros(len(y)), y))
+    except ValueError:
+        return list(KFold(n_splits=k, shuffle=True, random_state=RANDOM_STATE).split(np.zeros(len(y))))
+
+def evaluate_cv_fold(task):
+    """Train on one fold's training rows exactly as train_animal does and count hits on its test rows"""
+    warnings.filterwarnings('ignore')
+    X, y = task['X'], task['y']
+    Xtr, ytr = X[task['train_idx']], y[task['train_idx']]
+    Xte, yte = X[task['test_idx']], y[task['test_idx']]
+    result = {k: task[k] for k in ('kind', 'animal', 'synd', 'fold')}
+    result['n'] = int(len(yte))
+
+    cat_idx = task['cat_idx']
+    if task['kind'] == 'syndrome':
+        scaler = make_scaler(cat_idx is not None)
+        rf = RandomForestClassifier(**RF_PARAMS, random_state=RANDOM_STATE, n_jobs=task['n_threads'])
+        rf.fit(apply_scaler(scaler, Xtr, fit=True), ytr)
+        result['top1'] = int(np.sum(rf.predict(apply_scaler(scaler, Xte)) == yte))
+        return result
+
+    # carve the calibration split out of the training fold, same proportion as the hold-out pipeline
+    calib_rel = CALIB_SIZE / (1.0 - TEST_SIZE)
+    Xcal, ycal = Xtr[:0], ytr[:0]
+    if len(ytr) >= 3:
         try:
-            sample[c] = label_encoders[c].transform([str(sample[c])])[0]
-        except:
-            sample[c] = 0
+            Xtr, Xcal, ytr, ycal = train_test_split(Xtr, ytr, test_size=calib_rel, stratify=ytr, random_state=RANDOM_STATE)
+        except ValueError:
+            Xtr, Xcal, ytr, ycal = train_test_split(Xtr, ytr, test_size=calib_rel, random_state=RANDOM_STATE)
+    scaler = make_scaler(cat_idx is not None)
+    Xtr_sc = apply_scaler(scaler, Xtr, fit=True)
+    Xcal_sc = apply_scaler(scaler, Xcal)
+    X_res, y_res = balance_training_set(task['animal'], task['synd'], Xtr_sc, ytr, cat_idx=cat_idx)
+    models = fit_disease_ensemble(X_res, y_res, Xcal_sc, ycal, task['cfg'], n_threads=task['n_threads'],
+                                  verbose=False, cat_idx=cat_idx)
+    topk = top_k_indices(ensemble_proba(models, apply_scaler(scaler, Xte), task['n_classes']), 3)
+    result['top1'] = int(np.sum(topk[:, 0] == yte))
+    result['top3'] = int(np.sum(np.any(topk == yte[:, None], axis=1)))
+    return result
+
+def run_cross_validation(species_names, species_frame, feature_cols, folds, workers, n_threads, tuned_params,
+                         tree_native=False):
+    """Per-species syndrome accuracy and disease Top-1/Top-3, pooled over folds and per syndrome"""
+    cat_idx = categorical_indices(feature_cols, tree_native)
+    tasks = []
+    trivial = defaultdict(dict)
+    for animal in species_names:
+        sub = species_frame(animal)
+        if len(sub) < 8:
+            continue
+        X = sub[feature_cols].to_numpy(dtype=np.float64)
+        y_synd = LabelEncoder().fit_transform(sub['Syndrome_Label'].astype(str))
+        for fold, (tr, te) in enumerate(cv_splits(y_synd, folds)):
+            tasks.append({'kind': 'syndrome', 'animal': animal, 'synd': None, 'fold': fold, 'X': X, 'y': y_synd,
+                          'train_idx': tr, 'test_idx': te, 'n_threads': n_threads, 'cat_idx': cat_idx})
+        for synd, idxs in syndrome_row_groups(sub).items():
+            rows = sub.loc[idxs]
+            y_local = rows['Disease_Merged'].astype(str)
+            if y_local.nunique() == 1:
+                trivial[animal][synd] = int(len(rows))
+                continue
+            le_d = LabelEncoder()
+            y_enc = le_d.fit_transform(y_local)
+            Xs = rows[feature_cols].to_numpy(dtype=np.float64)
+            cfg = estimator_params((tuned_params.get(animal) or {}).get(synd))
+            for fold, (tr, te) in enumerate(cv_splits(y_enc, folds)):
+                tasks.append({'kind': 'disease', 'animal': animal, 'synd': synd, 'fold': fold, 'X': Xs, 'y': y_enc,
+                              'train_idx': tr, 'test_idx': te, 'n_classes': len(le_d.classes_),
+                              'cfg': cfg, 'n_threads': n_threads, 'cat_idx': cat_idx})
+
+    print(f"\nCross-validation: {folds} folds, {len(tasks)} fold fits on {workers} worker(s) x {n_threads} thread(s)")
+    t0 = time.time()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker_threads, initargs=(n_threads,)) as pool:
+        for fut in as_completed([pool.submit(evaluate_cv_fold, t) for t in tasks]):
+            results.append(fut.result())
+    print(f"  {len(results)} folds evaluated in {time.time() - t0:.1f}s")
+
+    cv = {}
+    for animal in sorted({r['animal'] for r in results}):
+        mine = [r for r in results if r['animal'] == animal]
+        synd_folds = [r for r in mine if r['kind'] == 'syndrome']
+        dis_folds = [r for r in mine if r['kind'] == 'disease']
+        entry = {'folds': folds, 'syndromes': {}, 'trivial_syndromes': trivial.get(animal, {})}
+        entry['syndrome_accuracy'] = cv_stat(sum(r['top1'] for r in synd_folds), sum(r['n'] for r in synd_folds),
+                                             [r['top1'] / r['n'] for r in synd_folds if r['n']])
+        for metric in ('top1', 'top3'):
+            entry[metric] = cv_stat(sum(r[metric] for r in dis_folds), sum(r['n'] for r in dis_folds), [])
+        for synd in sorted({r['synd'] for r in dis_folds}):
+            rs = [r for r in dis_folds if r['synd'] == synd]
+            n = sum(r['n'] for r in rs)
+            entry['syndromes'][synd] = {'samples': n, 'folds': len(rs), **{
+                metric: cv_stat(sum(r[metric] for r in rs), n, [r[metric] / r['n'] for r in rs if r['n']])
+                for metric in ('top1', 'top3')}}
+        cv[animal] = entry
+
+    def fmt(stat):
+        if stat['mean'] is None:
+            return f"{'n/a':>19}"
+        return f"{stat['mean']:.3f} [{stat['ci95'][0]:.2f},{stat['ci95'][1]:.2f}]"
+    print(f"\n  {'Species':<8} {'Syndrome':<12} {'Syndrome acc':>19} {'Top-1':>19} {'Top-3':>19}")
+    for animal, entry in cv.items():
+        print(f"  {animal:<8} {'(all)':<12} {fmt(entry['syndrome_accuracy'])} {fmt(entry['top1'])} {fmt(entry['top3'])}")
+        for synd, s in entry['syndromes'].items():
+            print(f"  {'':<8} {synd:<12} {'':>19} {fmt(s['top1'])} {fmt(s['top3'])}")
+    return cv
+
+# Serving cost report: every species bundle is loaded and timed in a fresh process after training
+def current_rss_mb():
+    """Resident set size of this process in MB (None without psutil)"""
+    if not PSUTIL_AVAILABLE:
+        return None
+    return psutil.Process().memory_info().rss / (1024.0 * 1024.0)
+
+def latency_percentiles_ms(fn, X, repeats):
+    """(p50, p99) wall time of fn(X) in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - t0)
+    p50, p99 = np.percentile(timings, [50, 99]) * 1000.0
+    return float(p50), float(p99)
+
+def profile_species_artifacts(entry, X_raw):
+    """Bytes on disk, load time, RSS delta and single-row / batch latency for one species' stored models.
+       X_raw holds unscaled feature rows in feature_columns order; runs in a fresh worker process."""
+    warnings.filterwarnings('ignore')
+    store = ArtifactStore(MODELS_DIR)
+    files = {'syndrome': store.object_size(entry['syndrome']),
+             'label_encoders_cat': store.object_size(entry['label_encoders_cat'])}
+    files.update({f'disease/{synd}': store.object_size(d) for synd, d in entry['disease_models'].items()})
+    rss_before = current_rss_mb()
+    t0 = time.perf_counter()
+    art, synd_bundle = store.load_entry(entry)
+    load_seconds = time.perf_counter() - t0
+    rss_after = current_rss_mb()
+
+    rng = np.random.RandomState(RANDOM_STATE)
+    row = X_raw[:1]
+    batch = X_raw[rng.randint(len(X_raw), size=PROFILE_BATCH_ROWS)]
+
+    def scaled(scaler, X):
+        return X if scaler is None else scaler.transform(X)
+
+    def measure(name, kind, size_bytes, fn):
+        p50, p99 = latency_percentiles_ms(fn, row, PROFILE_SINGLE_REPEATS)
+        b50, b99 = latency_percentiles_ms(fn, batch, PROFILE_BATCH_REPEATS)
+        return {'model': name, 'kind': kind, 'bytes': int(size_bytes), 'single_p50_ms': p50, 'single_p99_ms': p99,
+                'batch_p50_ms': b50, 'batch_p99_ms': b99}
+
+    clf, synd_scaler = synd_bundle['classifier'], synd_bundle['scaler']
+    models = [measure('syndrome', 'syndrome', files['syndrome'],
+                      lambda X: clf.predict_proba(scaled(synd_scaler, X)))]
+    for synd, info in sorted(art['disease_models'].items()):
+        if info.get('type') != 'ensemble' or not info.get('models'):
+            continue
+        n_classes = len(info['label_encoder'].classes_)
+        models.append(measure(synd, 'ensemble', files[f'disease/{synd}'],
+                              lambda X, info=info, n=n_classes: ensemble_proba(info['models'], scaled(info['scaler'], X), n)))
+        if info.get('student') is not None:
+            student = {'student': info['student']}
+            models.append(measure(synd, 'student', len(pickle.dumps(info['student'], protocol=pickle.HIGHEST_PROTOCOL)),
+                                  lambda X, s=student, info=info, n=n_classes: ensemble_proba(s, scaled(info['scaler'], X), n)))
+    return {
+        'artifact_bytes': int(sum(files.values())),
+        'files': files,
+        'load_seconds': load_seconds,
+        'rss_delta_mb': None if rss_before is None else rss_after - rss_before,
+        'batch_rows': PROFILE_BATCH_ROWS,
+        'models': models,
+    }
+
+def pareto_flags(points):
+    """For (accuracy, latency) pairs, True where no other point is at least as accurate and as fast, and better in one"""
+    flags = []
+    for i, (acc, lat) in enumerate(points):
+        if acc is None:
+            flags.append(False)
+            continue
+        dominated = any(a >= acc and l <= lat and (a > acc or l < lat)
+                        for j, (a, l) in enumerate(points) if j != i and a is not None)
+        flags.append(not dominated)
+    return flags
+
+def serving_report(species_report):
+    """Join each species' profile with its accuracy and flag the accuracy/latency Pareto front of each model"""
+    report = {}
+    for animal, info in sorted(species_report.items()):
+        profile = info.get('profile')
+        if not profile:
+            continue
+        metrics = info.get('metrics') or {}
+        rows = []
+        for m in profile['models']:
+            if m['kind'] == 'syndrome':
+                acc = metrics.get('syndrome_accuracy')
+            else:
+                synd_metrics = (metrics.get('syndromes') or {}).get(m['model'], {})
+                acc = synd_metrics.get('distill', {}).get('student_top3') if m['kind'] == 'student' else synd_metrics.get('top3')
+            rows.append(dict(m, accuracy=acc))
+        # variants of the same model (ensemble vs student) compete with each other
+        for name in {r['model'] for r in rows}:
+            group = [r for r in rows if r['model'] == name]
+            for r, flag in zip(group, pareto_flags([(r['accuracy'], r['single_p50_ms']) for r in group])):
+                r['pareto'] = flag
+        report[animal] = {k: profile[k] for k in ('artifact_bytes', 'load_seconds', 'rss_delta_mb', 'batch_rows')}
+        report[animal]['models'] = rows
+    return report
+
+def print_serving_report(report):
+    if not report:
+        return
+    print("\nServing cost per species (accuracy = syndrome acc / disease Top-3; * = Pareto-optimal):")
+    print(f"  {'Species':<8} {'Model':<22} {'Acc':>6} {'KB':>7} {'1-row p50/p99 ms':>17} {'1k-row p50/p99 ms':>18}")
+    for animal, entry in report.items():
+        rss = 'n/a' if entry['rss_delta_mb'] is None else f"{entry['rss_delta_mb']:.1f} MB"
+        print(f"  {animal:<8} bundle {entry['artifact_bytes'] / 1024:.0f} KB on disk, load {entry['load_seconds'] * 1000:.0f} ms, RSS +{rss}")
+        for r in entry['models']:
+            name = r['model'] if r['kind'] in ('syndrome', 'ensemble') else f"{r['model']} (student)"
+            acc = 'n/a' if r['accuracy'] is None else f"{r['accuracy']:.3f}"
+            print(f"  {'':<8} {name + ('*' if r['pareto'] else ''):<22} {acc:>6} {r['bytes'] / 1024:>7.0f} "
+                  f"{r['single_p50_ms']:>8.2f}/{r['single_p99_ms']:<8.2f} {r['batch_p50_ms']:>9.1f}/{r['batch_p99_ms']:<8.1f}")
+
+def load_species_source(args):
+    """Return (species_names, species_frame, feature_cols, label_encoders) for the chosen ingest mode"""
+    if args.chunked_ingest:
+        manifest = ingest_csv_chunked(args.data, chunksize=args.chunksize)
+        label_encoders = manifest['label_encoders']
+        feature_cols = manifest['feature_cols']
+        species_names = sorted(manifest['species'])
+        print("\nPer-species partitions (rare labels merged on load):")
+
+        def species_frame(animal):
+            return load_species_partition(manifest, animal)
+    else:
+        # Load data (preprocessed, from cache when the CSV and settings are unchanged)
+        df, label_encoders, merged_counts, feature_cols = load_training_frame(args.data)
+        print("\nAfter merging rare labels (per-animal):")
+        for animal, (samples, kept) in merged_counts.items():
+            print(f"  {animal}: samples {samples}, kept disease labels {kept}")
+        species_names = sorted(df['Animal_Type'].unique())
+
+        def species_frame(animal):
+            return df[df['Animal_Type'] == animal].copy()
+    return species_names, species_frame, feature_cols, label_encoders
+
+def main():
+    args = parse_args()
+    species_names, species_frame, feature_cols, label_encoders = load_species_source(args)
+    if args.search:
+        run_hyperparameter_search(species_names, species_frame, feature_cols, args.search_budget, args.search_workers,
+                                  args.tree_native)
+        if USE_RESAMPLE_CACHE:
+            print_resample_cache_usage(prune_resample_cache())
+        return
+
+    # Prepare model output directory
+    ensure_dir(MODELS_DIR)
+
+    run_start = time.time()
+    store = ArtifactStore(MODELS_DIR, fmt=args.artifact_format)
+    # held until garbage collection: no other writer may claim this version or collect our unpublished objects
+    writer_lock = store.lock_writers()
+    if writer_lock is None:
+        raise SystemExit(f"Another training run or online update is writing to {MODELS_DIR}; try again when it finishes.")
+    previous = load_model_manifest()
+    version = previous['version'] + 1
+    hyperparams = training_hyperparams(distill=args.distill, tree_native=args.tree_native)
+    tuned_params = load_tuned_params(tree_native=args.tree_native)
+    n_threads = thread_budget(args.cpu_budget, args.species_workers)
+    print(f"\nCPU budget {args.cpu_budget}: {args.species_workers} species worker(s) x {n_threads} thread(s)")
+    species_report = {}
+    to_train = {}
+    for animal in species_names:
+        sub = species_frame(animal)
+        fingerprint = species_fingerprint(sub, feature_cols, training_hyperparams(tuned_params.get(animal), args.distill,
+                                                                        args.tree_native))
+        prev = previous['species'].get(animal)
+        if (not args.full_retrain and prev and prev.get('fingerprint') == fingerprint
+                and prev.get('status') != 'skipped' and store.entry_complete(prev.get('artifacts'))):
+            species_report[animal] = dict(prev, status='reused',
+                                          artifacts=refresh_label_encoders(store, prev['artifacts'], label_encoders))
+            print(f"\n==> Animal: {animal} unchanged (fingerprint {fingerprint}), reusing artifacts from model version {prev['model_version']}")
+            continue
+
+        to_train[animal] = (sub, fingerprint)
+    # progress lines parsed by retrain_jobs.RetrainJob
+    print(f"\nSpecies to train: {len(to_train)} ({len(species_names) - len(to_train)} reused)")
+    finished = []
+
+    def record(animal, summary, entry, seconds):
+        finished.append(animal)
+        print(f"Species finished {len(finished)}/{len(to_train)}: {animal}")
+        species_report[animal] = {
+            'fingerprint': to_train[animal][1],
+            'status': 'retrained' if summary is not None else 'skipped',
+            'train_seconds': seconds,
+            'model_version': version,
+            'metrics': summary,
+            'artifacts': entry,
+        }
+
+    if args.species_workers > 1 and len(to_train) > 1:
+        with ProcessPoolExecutor(max_workers=args.species_workers, initializer=init_worker_threads,
+                                 initargs=(n_threads,)) as pool:
+            futures = {pool.submit(train_animal_timed, animal, sub, feature_cols, label_encoders,
+                                   tuned_params.get(animal), n_threads, args.distill, args.tree_native,
+                                   args.artifact_format): animal
+                       for animal, (sub, _) in to_train.items()}
+            for fut in as_completed(futures):
+                record(futures[fut], *fut.result())
+    else:
+        for animal, (sub, _) in to_train.items():
+            record(animal, *train_animal_timed(animal, sub, feature_cols, label_encoders,
+                                               tuned_params.get(animal), n_threads, args.distill,
+                                               args.tree_native, args.artifact_format))
+
+    if args.cv_folds:
+        # species keep their CV results while reused; evaluate the retrained ones and any missing this K
+        pending_cv = [a for a, info in species_report.items()
+                      if info['status'] != 'skipped' and (info.get('cv') or {}).get('folds') != args.cv_folds]
+        if pending_cv:
+            workers = max(1, min(args.cv_workers, args.cpu_budget))
+            cv = run_cross_validation(pending_cv, species_frame, feature_cols, args.cv_folds, workers,
+                                      thread_budget(args.cpu_budget, workers), tuned_params, args.tree_native)
+            for animal, metrics in cv.items():
+                species_report[animal]['cv'] = metrics
+
+    if not args.skip_profile:
+        # reused species keep the profile of the artifacts they still serve
+        pending_profile = [a for a, info in species_report.items() if info['status'] == 'retrained' or
+                           (info['status'] == 'reused' and 'profile' not in info)]
+        pending_profile = [a for a in pending_profile if species_report[a].get('artifacts')]
+        if pending_profile:
+            print(f"\nProfiling saved models for {len(pending_profile)} species...")
+        for animal in pending_profile:
+            X_raw = species_frame(animal)[feature_cols].to_numpy(dtype=np.float64)
+            # a fresh process per species so load time and RSS are not flattered by earlier loads
+            with ProcessPoolExecutor(max_workers=1, initializer=init_worker_threads, initargs=(1,)) as pool:
+                species_report[animal]['profile'] = pool.submit(profile_species_artifacts,
+                                                                species_report[animal]['artifacts'], X_raw).result()
+
+    # the version file must exist before manifest.json names it as current
+    entries = {a: info['artifacts'] for a, info in species_report.items() if info.get('artifacts')}
+    store.write_version(version, entries)
+    publish_model_manifest({
+        'version': version,
+        'published_at': datetime.now().isoformat(timespec='seconds'),
+        'hyperparams': hyperparams,
+        'species': species_report,
+    })
+
+    print("\n✅ Finished training for all animals.")
+    print(f"All artifacts saved to {MODELS_DIR} (model version {version})")
+    print_run_summary(species_report, time.time() - run_start,
+                      prune_resample_cache() if USE_RESAMPLE_CACHE else None)
+    refs, unique, referenced, stored = store_usage(store, entries.values())
+    freed = store.collect_garbage(KEEP_MODEL_VERSIONS)
+    writer_lock.close()
+    print(f"  Artifact store: {refs} components in version {version}, {unique} unique objects, "
+          f"{stored / 1e6:.1f} MB stored for {referenced / 1e6:.1f} MB referenced; "
+          f"{store.disk_usage() / 1e6:.1f} MB on disk across the last {KEEP_MODEL_VERSIONS} versions"
+          + (f", {freed / 1e6:.1f} MB of stale objects removed" if freed else ""))
+    print_distill_report(species_report)
+    if not args.skip_profile:
+        report = serving_report(species_report)
+        print_serving_report(report)
+        with open(SERVING_REPORT_PATH + '.tmp', 'w') as f:
+            json.dump({'model_version': version, 'generated_at': datetime.now().isoformat(timespec='seconds'),
+                       'species': report}, f, indent=2, sort_keys=True)
+        os.replace(SERVING_REPORT_PATH + '.tmp', SERVING_REPORT_PATH)
+        print(f"Serving cost report written to {SERVING_REPORT_PATH}")
+
+    # Example usage (sample)
+    sample = {
+        'Breed': 'Labrador', 'Age': 5, 'Gender': 'Male', 'Weight': 30,
+        'Symptom_1': 'Cough', 'Symptom_2': 'Lethargy', 'Symptom_3': 'Loss of appetite', 'Symptom_4': 'Nasal discharge',
+        'Duration_days': 7, 'Appetite_Loss': 1, 'Vomiting': 0, 'Diarrhea': 0, 'Coughing': 1, 'Labored_Breathing': 1,
+        'Lameness': 0, 'Skin_Lesions': 0, 'Nasal_Discharge': 1, 'Eye_Discharge': 0, 'Body_Temperature': 39.8, 'Heart_Rate': 110
+    }
+    # Ensure categorical fields transformed to encoded ints where possible
+    for c in ['Breed','Gender','Symptom_1','Symptom_2','Symptom_3','Symptom_4']:
+        if c in sample and c in label_encoders:
+            try:
+                sample[c] = label_encoders[c].transform([str(sample[c])])[0]
+            except:
+                sample[c] = 0
+
+    print("\nExample prediction (Dog):")
+    print(predict_animal('Dog', sample))
+
 
-print("\nExample prediction (Dog):")
-print(predict_animal('Dog', sample))
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Small thread-safe in-process cache with a per-entry TTL and an LRU size bound.
+
+Flask serves requests on several threads, so every operation takes one lock. Values
+are returned as stored: cache plain data (dicts, lists) and build request-scoped
+objects from it, so one request can never mutate what another one reads.
+
+With stale_ttl > 0, get_or_refresh() serves stale-while-revalidate: for stale_ttl
+seconds after an entry expires it is still returned immediately while one background
+thread reloads it, so readers only wait on the loader when there is nothing to serve.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=60.0, name='cache', stale_ttl=0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self._data = OrderedDict()     # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self._refreshing = set()       # keys with a background reload in flight
+        self._generation = 0           # bumped by invalidate/clear so in-flight reloads don't resurrect old data
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expired += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key, value, ttl=None):
+        # caller holds the lock
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            if self._data.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def get_or_load(self, key, loader):
+        """Cached value, or loader() stored under key; None results are not cached"""
+        with self._lock:
+            generation = self._generation
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            if value is not None:
+                self._store_if_current(key, value, generation)
+        return value
+
+    def _store_if_current(self, key, value, generation):
+        # an invalidate() while loader() ran means `value` may predate the write that caused it: don't cache it
+        with self._lock:
+            if generation == self._generation:
+                self._store(key, value)
+
+    def get_or_refresh(self, key, loader):
+        """Like get_or_load, but a recently expired value is returned at once and reloaded in the background"""
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generation
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expires_at, value = item
+                if now < expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now < expires_at + self.stale_ttl:
+                    self._data.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=self._refresh, args=(key, loader, self._generation), daemon=True,
+                                         name=f'{self.name}-refresh').start()
+                    return value
+                del self._data[key]
+                self.expired += 1
+            self.misses += 1
+        value = loader()
+        if value is not None:
+            self._store_if_current(key, value, generation)
+        return value
+
+    def _refresh(self, key, loader, generation):
+        try:
+            value = loader()
+        except Exception as e:
+            value = None
+            print(f"Cache {self.name}: refreshing {key!r} failed: {e}")
+        with self._lock:
+            self._refreshing.discard(key)
+            if value is None:
+                # keep serving the stale value until its window closes; the next read retries
+                self.refresh_failures += 1
+            elif generation == self._generation:
+                self.refreshes += 1
+                self._store(key, value)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'stale_ttl_seconds': self.stale_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.stale_hits) / lookups, 4) if lookups else None,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'stale_hits': self.stale_hits,
+                'refreshes': self.refreshes,
+                'refresh_failures': self.refresh_failures,
+            }
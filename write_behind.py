@@ -0,0 +1,252 @@
+"""
+Write-behind queue: rows are journaled locally and inserted into the database in the background.
+
+enqueue() appends the row to an append-only JSON-lines journal and returns, so request
+latency includes one local append instead of a database round trip. A writer thread
+takes rows in order, hands them to `writer` in batches of up to `batch_size`, and
+appends an ack line for every batch that was stored. On startup, rows journaled but
+never acked (the process died, the database was unreachable) are replayed.
+
+Failures:
+
+- transient errors (network, timeouts) retry the batch with exponential backoff
+- errors that `is_permanent(exc)` recognises (retrying cannot help: rejected data, a
+  permission error, a bug) split the batch into single rows; a row that still fails on
+  its own goes to `<journal>.failed` instead of blocking the rows behind it
+
+close() stops the thread after one last flush; anything still unwritten stays in the
+journal for the next start. Only one process may own a journal (flock): a second one,
+e.g. the Flask reloader's parent, writes synchronously instead. If the journal cannot be
+opened or appended to (disk full, read-only directory), the row is written synchronously
+too: enqueue() never raises.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    import fcntl
+    FLOCK_AVAILABLE = True
+except ImportError:                # Windows
+    FLOCK_AVAILABLE = False
+
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 1.0               # seconds a partial batch waits for more rows
+RETRY_BASE = 1.0                   # first retry delay (seconds), doubled per failure
+RETRY_MAX = 60.0
+COMPACT_BYTES = 1 << 20            # rewrite the journal once it is this large and fully acked
+
+
+class WriteBehindQueue:
+    def __init__(self, path, writer, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 is_permanent=lambda exc: False, fsync=True, name='write-behind'):
+        self.path = path
+        self.writer = writer
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.is_permanent = is_permanent
+        self.fsync = fsync
+        self.name = name
+        self.pending = deque()         # (seq, row), oldest first
+        self.seq = 0
+        self.queued = 0
+        self.written = 0
+        self.dead_lettered = 0
+        self.retries = 0
+        self.last_error = None
+        self.synchronous = False
+        self._journal = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._single_rows = 0          # after a rejected batch, its rows are retried (and acked) one at a time
+
+    # --- journal -----------------------------------------------------------
+    def _open(self):
+        """Claim and replay the journal; falls back to synchronous writes if another process owns it"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        journal = open(self.path, 'a+', encoding='utf-8')
+        if FLOCK_AVAILABLE:
+            try:
+                fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                journal.close()
+                self.synchronous = True
+                print(f"{self.name}: {self.path} is owned by another process; writing synchronously")
+                return
+        journal.seek(0)
+        rows, acked = {}, 0
+        for line in journal:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue               # torn final line from a crash mid-append
+            if 'ack' in entry:
+                acked = max(acked, entry['ack'])
+            else:
+                rows[entry['seq']] = entry['row']
+        self.seq = max([acked, *rows])
+        self.pending.extend((seq, row) for seq, row in sorted(rows.items()) if seq > acked)
+        self._journal = journal
+        self._compact()
+        if self.pending:
+            print(f"{self.name}: replaying {len(self.pending)} unwritten row(s) from {self.path}")
+
+    def _append(self, entry):
+        # caller holds the lock
+        self._journal.write(json.dumps(entry, default=str) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _compact(self):
+        # caller holds the lock (or is _open): keep only unacked rows
+        if self.pending and os.path.getsize(self.path) < COMPACT_BYTES:
+            return
+        self._journal.seek(0)
+        self._journal.truncate()
+        for seq, row in self.pending:
+            self._append({'seq': seq, 'row': row})
+
+    def _dead_letter(self, row, exc):
+        try:
+            with open(self.path + '.failed', 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'row': row, 'error': str(exc), 'at': time.time()}, default=str) + '\n')
+        except OSError as e:
+            print(f"{self.name}: row rejected ({exc}) and could not be saved to {self.path}.failed: {e}")
+            return
+        self.dead_lettered += 1
+        print(f"{self.name}: row rejected, moved to {self.path}.failed: {exc}")
+
+    # --- producer side -----------------------------------------------------
+    def start(self):
+        with self._lock:
+            if self._thread is not None or self.synchronous:
+                return
+            try:
+                self._open()
+            except OSError as e:
+                self.synchronous = True
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"{self.name}: cannot use journal {self.path}, writing synchronously: {e}")
+                return
+            if self.synchronous:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+            self._thread.start()
+
+    def enqueue(self, row):
+        """Journal one row for background insertion (starts the writer on first use); never raises"""
+        if self._thread is None:
+            self.start()
+        if self.synchronous:
+            self._write_now(row)
+            return
+        with self._lock:
+            try:
+                self._append({'seq': self.seq + 1, 'row': row})
+            except OSError as e:
+                journal_error = e
+            else:
+                journal_error = None
+                self.seq += 1
+                self.pending.append((self.seq, row))
+                self.queued += 1
+                if len(self.pending) >= self.batch_size:
+                    self._wakeup.set()
+        if journal_error is not None:
+            self.last_error = f"{type(journal_error).__name__}: {journal_error}"
+            print(f"{self.name}: journal append failed, writing the row synchronously: {journal_error}")
+            self._write_now(row)
+
+    def _write_now(self, row):
+        try:
+            self.writer([row])
+            self.written += 1
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            if self.is_permanent(e):
+                self._dead_letter(row, e)
+            else:
+                print(f"{self.name}: Error: {e}")
+
+    # --- writer thread -----------------------------------------------------
+    def _run(self):
+        delay = 0.0
+        while True:
+            self._wakeup.wait(delay or self.flush_interval)
+            self._wakeup.clear()
+            with self._lock:
+                size = 1 if self._single_rows else self.batch_size
+                batch = [self.pending[i] for i in range(min(size, len(self.pending)))]
+                stopping = self._stopping
+            if batch:
+                try:
+                    self.writer([row for _, row in batch])
+                    self.written += len(batch)
+                except Exception as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    if self.is_permanent(e) and len(batch) > 1:
+                        # find the bad row(s) without re-inserting the good ones twice
+                        self._single_rows = len(batch)
+                        self._wakeup.set()
+                        continue
+                    if self.is_permanent(e):
+                        self._dead_letter(batch[0][1], e)
+                    else:
+                        self.retries += 1
+                        delay = min(RETRY_MAX, max(RETRY_BASE, delay * 2))
+                        print(f"{self.name}: writing {len(batch)} row(s) failed, retrying in {delay:.0f}s: {e}")
+                        if stopping:
+                            return
+                        continue
+                delay = 0.0
+                if self._single_rows:
+                    self._single_rows -= 1
+                with self._lock:
+                    for _ in batch:
+                        self.pending.popleft()
+                    try:
+                        self._append({'ack': batch[-1][0]})
+                        if not self.pending:
+                            self._compact()
+                    except OSError as e:
+                        # the rows are stored; at worst they are replayed (written twice) after a restart
+                        self.last_error = f"{type(e).__name__}: {e}"
+                        print(f"{self.name}: could not ack written rows in {self.path}: {e}")
+                    more = bool(self.pending)
+                if more:
+                    self._wakeup.set()     # drain a backlog without waiting for the interval
+                    continue
+            if stopping:
+                return
+
+    def close(self, timeout=10.0):
+        """Flush what can be written within `timeout`; the rest stays journaled for the next start"""
+        if self._thread is None:
+            return
+        with self._lock:
+            self._stopping = True
+        self._wakeup.set()
+        self._thread.join(timeout)
+        with self._lock:
+            if self.pending:
+                print(f"{self.name}: {len(self.pending)} row(s) left in {self.path} for the next start")
+            if not self._thread.is_alive():
+                self._journal.close()      # also releases the flock
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'mode': 'synchronous' if self.synchronous else 'write-behind',
+                'pending': len(self.pending),
+                'queued': self.queued,
+                'written': self.written,
+                'dead_lettered': self.dead_lettered,
+                'retries': self.retries,
+                'last_error': self.last_error,
+            }